@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException, Request, status
+from fastapi import FastAPI, HTTPException, Request, Depends, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
@@ -9,18 +9,37 @@ import traceback
 # Importar configuración y base de datos
 from config.settings import settings
 from config.database import connect_to_mongo, close_mongo_connection
+from services.hashing_service import hashing_service
+from services.auth_service import auth_service
+from services.session_tracker import session_tracker
+from services.audit_writer import audit_writer
+from services.audit_service import audit_service
+from services.catalog_cache import catalog_cache
+from services.low_stock_feed import low_stock_feed
+from services.product_service import product_service
+from services.account_service import account_service
+from services.user_service import user_service
+from services.stock_reservation_service import stock_reservation_service
+from utils.security import token_cache
+from utils.rate_limiter import rate_limiter
+from utils.rate_limit_policies import rate_limit_policies
+from utils.admission import admission_controller
+from utils.count_cache import count_cache
 
 # Importar routers
-from routers import auth, users, products, accounts
+from routers import auth, users, products, accounts, audit
 
 # Importar middleware
+from middleware.auth_middleware import require_admin
 from middleware.audit_middleware import AuditMiddleware
 from middleware.security_middleware import SecurityMiddleware, RateLimitMiddleware
+from middleware.admission_middleware import AdmissionControlMiddleware
 
 # Importar excepciones personalizadas
 from utils.exceptions import (
     CustomException, AuthenticationException, AuthorizationException,
-    NotFoundException, ValidationException, DatabaseException
+    NotFoundException, ValidationException, DatabaseException,
+    ServiceUnavailableException
 )
 
 
@@ -30,9 +49,33 @@ async def lifespan(app: FastAPI):
     # Startup
     print("Iniciando aplicación...")
     await connect_to_mongo()
+    try:
+        await audit_service.ensure_indexes()
+    except Exception as e:
+        print(f"Error creando índices de auditoría: {e}")
+    for service in (product_service, account_service, user_service, stock_reservation_service):
+        try:
+            await service.ensure_indexes()
+        except Exception as e:
+            print(f"Error creando índices de {service.collection}: {e}")
+    try:
+        await rate_limiter.ensure_indexes()
+    except Exception as e:
+        print(f"Error creando índices de rate limiting: {e}")
+    await catalog_cache.load()
+    catalog_cache.start()
+    session_tracker.start()
+    audit_writer.start()
+    stock_reservation_service.start()
     yield
     # Shutdown
     print("Cerrando aplicación...")
+    await catalog_cache.stop()
+    await session_tracker.stop()
+    await audit_writer.stop()
+    await stock_reservation_service.stop()
+    hashing_service.shutdown()
+    rate_limiter.close()
     await close_mongo_connection()
 
 
@@ -51,11 +94,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 # Agregar middleware de seguridad
 app.add_middleware(SecurityMiddleware)
-app.add_middleware(RateLimitMiddleware, max_requests=100, time_window=60)
+if settings.admission_enabled:
+    app.add_middleware(AdmissionControlMiddleware, controller=admission_controller)
+app.add_middleware(RateLimitMiddleware, limiter=rate_limiter, policies=rate_limit_policies)
 app.add_middleware(AuditMiddleware)
 
 
@@ -109,6 +155,15 @@ async def database_exception_handler(request: Request, exc: DatabaseException):
     )
 
 
+@app.exception_handler(ServiceUnavailableException)
+async def service_unavailable_exception_handler(request: Request, exc: ServiceUnavailableException):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": exc.message, "type": "service_unavailable_error"},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
 @app.exception_handler(Exception)
 async def general_exception_handler(request: Request, exc: Exception):
     """Manejador para excepciones no capturadas"""
@@ -133,6 +188,7 @@ app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(products.router)
 app.include_router(accounts.router)
+app.include_router(audit.router)
 
 
 # Endpoints básicos
@@ -178,6 +234,25 @@ async def api_info():
     }
 
 
+# Endpoint de métricas internas
+@app.get("/metrics")
+async def metrics(current_user = Depends(require_admin)):
+    """Métricas de rendimiento de los subsistemas internos (solo administradores)"""
+    return {
+        "hashing": hashing_service.get_stats(),
+        "principal_cache": auth_service.principal_cache.get_stats(),
+        "token_cache": token_cache.get_stats(),
+        "session_activity": session_tracker.get_stats(),
+        "audit_writer": audit_writer.get_stats(),
+        "rate_limit": rate_limiter.get_stats(),
+        "admission": admission_controller.get_stats(),
+        "catalog_cache": catalog_cache.get_stats(),
+        "count_cache": count_cache.get_stats(),
+        "stock_reservations": stock_reservation_service.get_stats(),
+        "low_stock_feed": low_stock_feed.get_stats()
+    }
+
+
 if __name__ == "__main__":
     uvicorn.run(
         "app:app",
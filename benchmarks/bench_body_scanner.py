@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark: SecurityMiddleware con payloads grandes de AccountCreate
+
+Compara el escaneo anterior ("legacy": json.loads, un recorrido por patrón
+bloqueado en cada string, nueve str.replace, json.dumps y un segundo parseo
+en FastAPI) contra el actual ("single-pass": búsqueda de patrones y
+sanitización sobre los bytes crudos, un único json.loads y el objeto
+entregado a la ruta mediante SanitizedJSONRoute). Se sirve en proceso con httpx.
+
+Uso:
+    python -m benchmarks.bench_body_scanner --items 2000 --requests 200
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+
+import httpx
+from fastapi import APIRouter, FastAPI, HTTPException, Request, status
+
+from middleware.security_middleware import SecurityMiddleware
+from schemas.account import AccountCreate
+from utils.routing import SanitizedJSONRoute
+
+
+class LegacySecurityMiddleware(SecurityMiddleware):
+    """Reproduce el escaneo anterior del body"""
+
+    async def _sanitize_request_data(self, request: Request):
+        body = await request.body()
+        try:
+            data = json.loads(body.decode("utf-8"))
+            return json.dumps(self._legacy_sanitize(data)).encode("utf-8")
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return body
+
+    def _legacy_sanitize(self, data):
+        if isinstance(data, dict):
+            return {key: self._legacy_sanitize(value) for key, value in data.items()}
+        elif isinstance(data, list):
+            return [self._legacy_sanitize(item) for item in data]
+        elif isinstance(data, str):
+            data_lower = data.lower()
+            for pattern in self.blocked_patterns:
+                if pattern in data_lower:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail="Contenido bloqueado por medidas de seguridad"
+                    )
+            for char in ['<', '>', '"', "'", '&', '$', '`', '|', ';']:
+                data = data.replace(char, '')
+            return data.strip()
+        return data
+
+
+def build_app(mode: str) -> FastAPI:
+    """Crea una app con un endpoint que valida AccountCreate"""
+    app = FastAPI()
+    router = APIRouter(route_class=SanitizedJSONRoute) if mode == "single-pass" else APIRouter()
+
+    @router.post("/accounts")
+    async def create_account(account_data: AccountCreate):
+        return {"items": len(account_data.items)}
+
+    app.include_router(router)
+    app.add_middleware(SecurityMiddleware if mode == "single-pass" else LegacySecurityMiddleware)
+    return app
+
+
+def build_payload(items: int) -> bytes:
+    """AccountCreate con muchos items y notas largas"""
+    return json.dumps({
+        "client_id": "64f7b1c2d8e9f0a1b2c3d4e5",
+        "items": [
+            {"product_id": f"64f7b1c2d8e9f0a1b2c{i:05d}", "quantity": (i % 9) + 1}
+            for i in range(items)
+        ],
+        "due_date": (datetime.utcnow() + timedelta(days=30)).isoformat(),
+        "discount": 0.0,
+        "tax": 19.0,
+        "notes": "Pedido mensual del cliente, entregar en bodega principal. " * 50
+    }).encode("utf-8")
+
+
+async def run_scenario(mode: str, payload: bytes, requests: int) -> dict:
+    app = build_app(mode)
+    transport = httpx.ASGITransport(app=app)
+    headers = {"content-type": "application/json"}
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.post("/accounts", content=payload, headers=headers)
+        response.raise_for_status()
+
+        start_time = time.perf_counter()
+        for _ in range(requests):
+            await client.post("/accounts", content=payload, headers=headers)
+        elapsed = time.perf_counter() - start_time
+
+    return {
+        "mode": mode,
+        "ms_per_request": round(elapsed / requests * 1000, 3),
+        "rps": round(requests / elapsed, 1)
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    payload = build_payload(args.items)
+
+    print(f"🔧 BENCHMARK: AccountCreate con {args.items} items ({len(payload) // 1024} KB)")
+    print("=" * 60)
+    for mode in ("legacy", "single-pass"):
+        result = await run_scenario(mode, payload, args.requests)
+        print(f"{result['mode']:>12}: {result['ms_per_request']:>8} ms/req  {result['rps']:>8} req/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
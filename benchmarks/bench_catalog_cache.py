@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark: costo de servir /products/active
+
+Compara el camino anterior ("legacy": documento -> Product -> ProductResponse
+-> JSONResponse por cada producto) contra services.catalog_cache.CatalogCache
+(bytes pre-serializados por versión del catálogo). No necesita MongoDB: los
+documentos se generan en memoria.
+
+Uso:
+    python -m benchmarks.bench_catalog_cache --products 5000 --requests 200
+"""
+
+import argparse
+import time
+from datetime import datetime
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from models.product import ProductStatus
+from schemas.product import ProductResponse
+from services.catalog_cache import CatalogCache
+from services.product_service import ProductService
+
+
+def make_docs(count: int) -> list:
+    now = datetime.utcnow()
+    return [
+        {
+            "_id": ObjectId(),
+            "name": f"Producto {i:06d}",
+            "description": "Descripción de prueba",
+            "price": 100.0 + i % 50,
+            "category": "food",
+            "brand": "Marca",
+            "barcode": f"779{i:010d}",
+            "stock": i % 100,
+            "min_stock": 5,
+            "status": ProductStatus.ACTIVE.value if i % 10 else ProductStatus.INACTIVE.value,
+            "created_at": now,
+            "updated_at": now,
+            "created_by": "admin"
+        }
+        for i in range(count)
+    ]
+
+
+def legacy_active(service: ProductService, docs: list) -> bytes:
+    """Reproduce get_active_products + serialización de FastAPI"""
+    products = []
+    for product_doc in sorted((d for d in docs if d["status"] == ProductStatus.ACTIVE.value), key=lambda d: d["name"]):
+        product = service._prepare_product_from_doc(product_doc)
+        products.append(ProductResponse(
+            id=str(product.id),
+            name=product.name,
+            description=product.description,
+            price=product.price,
+            category=product.category,
+            brand=product.brand,
+            barcode=product.barcode,
+            stock=product.stock,
+            min_stock=product.min_stock,
+            status=product.status,
+            created_at=product.created_at,
+            updated_at=product.updated_at
+        ))
+    return JSONResponse(jsonable_encoder(products)).body
+
+
+def measure(func, requests: int) -> float:
+    start_time = time.perf_counter()
+    for _ in range(requests):
+        func()
+    return (time.perf_counter() - start_time) / requests * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--legacy-requests", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"🔧 BENCHMARK: /products/active con {args.products} productos")
+    print("=" * 60)
+
+    docs = make_docs(args.products)
+    service = ProductService()
+    cache = CatalogCache()
+    for product_doc in docs:
+        cache.upsert(product_doc)
+    cache.loaded = True
+
+    assert legacy_active(service, docs) == cache.get_active_json(), "la caché no produce el mismo JSON"
+
+    legacy_ms = measure(lambda: legacy_active(service, docs), args.legacy_requests)
+    print(f"         legacy: {legacy_ms:>10.4f} ms/req")
+
+    cached_ms = measure(cache.get_active_json, args.requests)
+    print(f"    caché (hit): {cached_ms:>10.4f} ms/req")
+
+    # Peor caso: una mutación entre cada request obliga a reconstruir el buffer
+    def rebuild():
+        cache.upsert(docs[0])
+        cache.get_active_json()
+
+    rebuild_ms = measure(rebuild, args.legacy_requests)
+    print(f"caché (rebuild): {rebuild_ms:>10.4f} ms/req")
+    print(f"📈 Speedup (hit): {legacy_ms / cached_ms:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark: latencia p99 de /products/active durante una tormenta de logins
+
+Compara bcrypt ejecutado directamente en el event loop ("inline") contra el
+pool acotado de services.hashing_service ("pool"). Usa una app FastAPI mínima
+servida en proceso con httpx, por lo que no requiere MongoDB.
+
+Uso:
+    python -m benchmarks.bench_login_storm --logins 40 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime
+
+import httpx
+from fastapi import FastAPI
+
+from services.hashing_service import HashingService
+from utils.security import get_password_hash, verify_password
+
+
+PASSWORD = "Admin123!"
+
+
+def build_app(mode: str, hashing_service: HashingService, hashed_password: str) -> FastAPI:
+    """Crea una app con un endpoint de lectura y uno de login"""
+    app = FastAPI()
+    catalog = [
+        {
+            "id": str(i),
+            "name": f"Producto {i}",
+            "price": 1000.0 + i,
+            "stock": i,
+            "status": "active",
+            "updated_at": datetime.utcnow().isoformat()
+        }
+        for i in range(200)
+    ]
+
+    @app.get("/products/active")
+    async def active_products():
+        return catalog
+
+    @app.post("/auth/login")
+    async def login():
+        if mode == "inline":
+            ok = verify_password(PASSWORD, hashed_password)
+        else:
+            ok = await hashing_service.verify_password(PASSWORD, hashed_password)
+        return {"ok": ok}
+
+    return app
+
+
+def percentile(samples: list, p: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_scenario(mode: str, logins: int, concurrency: int, hashed_password: str) -> dict:
+    """Lanza la tormenta de logins mientras sondea /products/active"""
+    hashing_service = HashingService(max_workers=concurrency, max_queue=logins)
+    app = build_app(mode, hashing_service, hashed_password)
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        semaphore = asyncio.Semaphore(concurrency)
+        storm_done = asyncio.Event()
+
+        async def login_once():
+            async with semaphore:
+                await client.post("/auth/login")
+
+        async def storm():
+            await asyncio.gather(*(login_once() for _ in range(logins)))
+            storm_done.set()
+
+        async def probe():
+            # La latencia se mide desde el instante programado de cada sondeo
+            # para no ocultar el tiempo que el event loop pasó bloqueado
+            interval = 0.01
+            scheduled = time.perf_counter()
+            while not storm_done.is_set():
+                await client.get("/products/active")
+                latencies.append((time.perf_counter() - scheduled) * 1000)
+                scheduled = max(scheduled + interval, time.perf_counter())
+                await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+
+        start_time = time.perf_counter()
+        await asyncio.gather(storm(), probe())
+        elapsed = time.perf_counter() - start_time
+
+    hashing_service.shutdown()
+    return {
+        "mode": mode,
+        "probes": len(latencies),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "max_ms": round(max(latencies), 2),
+        "storm_seconds": round(elapsed, 2)
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    hashed_password = get_password_hash(PASSWORD)
+
+    print("🔧 BENCHMARK: /products/active durante tormenta de logins")
+    print("=" * 60)
+    for mode in ("inline", "pool"):
+        result = await run_scenario(mode, args.logins, args.concurrency, hashed_password)
+        print(
+            f"{result['mode']:>7}: probes={result['probes']:<5} "
+            f"p50={result['p50_ms']:>8} ms  p99={result['p99_ms']:>8} ms  "
+            f"max={result['max_ms']:>8} ms  tormenta={result['storm_seconds']} s"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark: sobrecarga por request de la pila de middleware
+
+Mide requests por segundo contra un endpoint vacío en tres configuraciones:
+sin middleware ("bare"), con la pila ASGI de la aplicación
+(Audit + RateLimit + Security) y con tres capas BaseHTTPMiddleware de paso
+("basehttp x3"), que es el costo fijo que tenía la pila anterior. Se sirve
+en proceso con httpx, por lo que no requiere MongoDB.
+
+Uso:
+    python -m benchmarks.bench_middleware_stack --requests 3000
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from middleware.audit_middleware import AuditMiddleware
+from middleware.security_middleware import SecurityMiddleware, RateLimitMiddleware
+
+
+class PassthroughMiddleware(BaseHTTPMiddleware):
+    """Capa BaseHTTPMiddleware que no hace nada"""
+
+    async def dispatch(self, request, call_next):
+        return await call_next(request)
+
+
+def build_app(mode: str, requests: int) -> FastAPI:
+    """Crea una app con un endpoint vacío y la pila indicada"""
+    app = FastAPI()
+
+    @app.get("/noop")
+    async def noop():
+        return {"ok": True}
+
+    if mode == "asgi":
+        app.add_middleware(SecurityMiddleware)
+        app.add_middleware(RateLimitMiddleware, max_requests=requests * 2, time_window=60)
+        app.add_middleware(AuditMiddleware)
+    elif mode == "basehttp x3":
+        for _ in range(3):
+            app.add_middleware(PassthroughMiddleware)
+    return app
+
+
+async def run_scenario(mode: str, requests: int, concurrency: int) -> dict:
+    """Lanza los requests con concurrencia acotada y mide el throughput"""
+    app = build_app(mode, requests)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Calentamiento
+        for _ in range(50):
+            await client.get("/noop")
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def request_once():
+            async with semaphore:
+                response = await client.get("/noop")
+                response.raise_for_status()
+
+        start_time = time.perf_counter()
+        await asyncio.gather(*(request_once() for _ in range(requests)))
+        elapsed = time.perf_counter() - start_time
+
+    return {
+        "mode": mode,
+        "rps": round(requests / elapsed, 1),
+        "us_per_request": round(elapsed / requests * 1_000_000, 1)
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    print("🔧 BENCHMARK: sobrecarga de la pila de middleware")
+    print("=" * 60)
+    baseline = None
+    for mode in ("bare", "asgi", "basehttp x3"):
+        result = await run_scenario(mode, args.requests, args.concurrency)
+        if baseline is None:
+            baseline = result["us_per_request"]
+        overhead = round(result["us_per_request"] - baseline, 1)
+        print(
+            f"{result['mode']:>12}: {result['rps']:>9} req/s  "
+            f"{result['us_per_request']:>8} µs/req  sobrecarga={overhead:>7} µs"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
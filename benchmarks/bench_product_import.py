@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Benchmark: carga masiva de productos
+
+Compara crear los productos de a uno ("legacy": un create_product por fila,
+con find_one del código de barras + insert_one por producto) contra
+ProductService.import_products (stream CSV, una consulta $in y un
+insert_many por lote). No necesita MongoDB: se usa una colección en memoria
+que simula la latencia de ida y vuelta (--rtt-ms) de cada operación.
+
+Uso:
+    python -m benchmarks.bench_product_import --rows 20000 --rtt-ms 0.5
+"""
+
+import argparse
+import asyncio
+import time
+
+from bson import ObjectId
+
+from schemas.product import ProductCreate
+from services.product_service import ProductService
+
+
+class SimulatedCollection:
+    """Colección en memoria; cada operación espera un round-trip simulado"""
+
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.docs = []
+        self.barcodes = set()
+        self.round_trips = 0
+
+    async def _round_trip(self):
+        self.round_trips += 1
+        await asyncio.sleep(self.rtt)
+
+    async def find_one(self, query, *args, **kwargs):
+        await self._round_trip()
+        return {"_id": ObjectId()} if query.get("barcode") in self.barcodes else None
+
+    def find(self, query, *args, **kwargs):
+        collection = self
+
+        async def cursor():
+            await collection._round_trip()
+            for barcode in query["barcode"]["$in"]:
+                if barcode in collection.barcodes:
+                    yield {"barcode": barcode}
+
+        return cursor()
+
+    def _store(self, doc):
+        doc["_id"] = ObjectId()
+        self.docs.append(doc)
+        if doc.get("barcode"):
+            self.barcodes.add(doc["barcode"])
+
+    async def insert_one(self, doc):
+        await self._round_trip()
+        self._store(doc)
+
+        class Result:
+            inserted_id = doc["_id"]
+        return Result()
+
+    async def insert_many(self, docs, ordered=True):
+        await self._round_trip()
+        for doc in docs:
+            self._store(doc)
+
+
+class SimulatedDatabase:
+    def __init__(self, collection: SimulatedCollection):
+        self.collection = collection
+
+    def __getitem__(self, name):
+        return self.collection
+
+
+class NullAuditService:
+    async def log_action(self, **kwargs):
+        pass
+
+
+def make_csv(rows: int) -> bytes:
+    lines = ["name,description,price,category,brand,barcode,stock,min_stock"]
+    for i in range(rows):
+        lines.append(f'Producto {i:06d},"Descripción, con coma",{100 + i % 50}.5,food,Marca,779{i:010d},{i % 100},5')
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def make_service(rtt: float):
+    collection = SimulatedCollection(rtt)
+    service = ProductService()
+    database = SimulatedDatabase(collection)
+    audit_service = NullAuditService()
+
+    async def get_database():
+        return database
+
+    async def get_audit_service():
+        return audit_service
+
+    service.get_database = get_database
+    service.get_audit_service = get_audit_service
+    return service, collection
+
+
+async def chunked(data: bytes, size: int = 64 * 1024):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def run_legacy(rows: int, rtt: float):
+    service, collection = make_service(rtt)
+    for i in range(rows):
+        await service.create_product(
+            ProductCreate(
+                name=f"Producto {i:06d}",
+                description="Descripción, con coma",
+                price=100 + i % 50 + 0.5,
+                category="food",
+                brand="Marca",
+                barcode=f"779{i:010d}",
+                stock=i % 100,
+                min_stock=5
+            ),
+            "admin",
+            "127.0.0.1"
+        )
+    return collection
+
+
+async def run_import(data: bytes, rtt: float, batch_size: int):
+    service, collection = make_service(rtt)
+    report = await service.import_products(chunked(data), "csv", "admin", "127.0.0.1", batch_size=batch_size)
+    return collection, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--rtt-ms", type=float, default=0.5)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    rtt = args.rtt_ms / 1000
+
+    print(f"🔧 BENCHMARK: importación de {args.rows} productos (round-trip simulado {args.rtt_ms} ms)")
+    print("=" * 60)
+
+    data = make_csv(args.rows)
+    print(f"📄 CSV: {len(data) / 1024 / 1024:.1f} MB")
+
+    start_time = time.perf_counter()
+    collection = asyncio.run(run_legacy(args.rows, rtt))
+    legacy_seconds = time.perf_counter() - start_time
+    print(f"🐢 Legacy (un create por fila): {legacy_seconds:.2f} s, "
+          f"{args.rows / legacy_seconds:,.0f} filas/s, {collection.round_trips} round-trips")
+
+    start_time = time.perf_counter()
+    collection, report = asyncio.run(run_import(data, rtt, args.batch_size))
+    import_seconds = time.perf_counter() - start_time
+    print(f"🚀 import_products (lotes de {args.batch_size}): {import_seconds:.2f} s, "
+          f"{args.rows / import_seconds:,.0f} filas/s, {collection.round_trips} round-trips")
+    print(f"   insertados: {report['inserted']}, con error: {report['failed']}")
+
+    print()
+    print(f"📈 Speedup: {legacy_seconds / import_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark: latencia de búsqueda de productos con 100k productos sintéticos
+
+Compara el filtro anterior ("legacy": regex sin anclar e insensible a
+mayúsculas sobre nombre y marca, equivalente al recorrido completo que hace
+MongoDB con $regex/$options "i") contra services.product_search.ProductSearchIndex.
+No necesita MongoDB.
+
+Uso:
+    python -m benchmarks.bench_product_search --products 100000
+"""
+
+import argparse
+import random
+import re
+import statistics
+import time
+
+from services.product_search import ProductSearchIndex
+
+
+WORDS = [
+    "leche", "entera", "descremada", "pan", "integral", "arroz", "fideos", "café",
+    "té", "azúcar", "aceite", "girasol", "oliva", "jabón", "líquido", "detergente",
+    "galletas", "chocolate", "yogur", "frutilla", "manzana", "queso", "rallado",
+    "jamón", "cocido", "agua", "mineral", "gaseosa", "naranja", "limón", "papel",
+    "higiénico", "shampoo", "acondicionador", "atún", "lomitos", "harina", "leudante"
+]
+BRANDS = ["La Serenísima", "Arcor", "Molinos", "Unilever", "Nestlé", "Coca-Cola", "Marolio", "Ledesma"]
+QUERIES = ["leche", "cafe", "choc", "aceite oliva", "jabon liq", "nestle", "ser", "atun lomitos", "queso ral", "xyz"]
+
+
+def make_products(count: int, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    return [
+        (
+            f"p{i}",
+            " ".join(rng.sample(WORDS, 3)) + f" {rng.choice(['500g', '1kg', '1L', '2L'])}",
+            rng.choice(BRANDS),
+            i % 10 != 0
+        )
+        for i in range(count)
+    ]
+
+
+def legacy_search(products: list, query: str, limit: int) -> list:
+    pattern = re.compile(re.escape(query), re.IGNORECASE)
+    matches = [
+        product_id for product_id, name, brand, active in products
+        if active and (pattern.search(name) or pattern.search(brand))
+    ]
+    return matches[:limit]
+
+
+def measure(func, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start_time) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"🔧 BENCHMARK: búsqueda de productos con {args.products} productos")
+    print("=" * 60)
+
+    products = make_products(args.products)
+
+    index = ProductSearchIndex()
+    start_time = time.perf_counter()
+    for product_id, name, brand, active in products:
+        index.add(product_id, name, brand, active)
+    build_seconds = time.perf_counter() - start_time
+    print(f"🏗️  Construcción del índice: {build_seconds:.2f} s ({len(index._tokens)} tokens distintos)")
+
+    update_ms = measure(lambda: index.add("p0", "leche chocolatada 1L", "Nestlé", True), args.repeat)
+    print(f"🔁 Reindexar un producto: {update_ms:.4f} ms")
+    print()
+    print(f"{'consulta':<16}{'legacy ms':>12}{'índice ms':>12}{'resultados':>12}")
+
+    legacy_total = 0.0
+    index_total = 0.0
+    for query in QUERIES:
+        legacy_ms = measure(lambda: legacy_search(products, query, args.limit), max(1, args.repeat // 5))
+        index_ms = measure(lambda: index.search(query, limit=args.limit), args.repeat)
+        results = len(index.search(query, limit=args.limit))
+        legacy_total += legacy_ms
+        index_total += index_ms
+        print(f"{query:<16}{legacy_ms:>12.3f}{index_ms:>12.3f}{results:>12}")
+
+    print()
+    print(f"📈 Speedup promedio: {legacy_total / index_total:.1f}x")
+    print("   (legacy no encuentra 'cafe' en 'café' ni 'jabon' en 'jabón')")
+
+
+if __name__ == "__main__":
+    main()
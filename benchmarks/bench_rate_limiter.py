@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark: costo por request del rate limiter con 10k IPs distintas
+
+Compara el algoritmo anterior ("legacy": listas de timestamps por IP con
+barrido completo en cada request) contra utils.rate_limiter.TokenBucketLimiter.
+También muestra cuántas claves quedan en memoria durante una inundación de
+IPs distintas con el límite max_keys.
+
+Uso:
+    python -m benchmarks.bench_rate_limiter --ips 10000 --requests 50000
+"""
+
+import argparse
+import time
+
+from utils.rate_limiter import TokenBucketLimiter
+
+
+class LegacyLimiter:
+    """Reproduce RateLimitMiddleware anterior (_cleanup_old_entries + _is_rate_limited)"""
+
+    def __init__(self, max_requests: int = 100, time_window: int = 60):
+        self.max_requests = max_requests
+        self.time_window = time_window
+        self.request_counts = {}
+
+    def try_acquire(self, client_ip: str):
+        current_time = int(time.time())
+        window_start = current_time - self.time_window
+
+        for ip in list(self.request_counts.keys()):
+            recent_requests = [t for t in self.request_counts[ip] if t > window_start]
+            if recent_requests:
+                self.request_counts[ip] = recent_requests
+            else:
+                del self.request_counts[ip]
+
+        self.request_counts.setdefault(client_ip, []).append(current_time)
+        recent_requests = [t for t in self.request_counts[client_ip] if t > window_start]
+        self.request_counts[client_ip] = recent_requests
+        return len(recent_requests) <= self.max_requests, 0.0
+
+    def __len__(self):
+        return len(self.request_counts)
+
+
+def run(limiter, ips: int, requests: int) -> dict:
+    keys = [f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}" for i in range(ips)]
+    start_time = time.perf_counter()
+    for i in range(requests):
+        limiter.try_acquire(keys[i % ips])
+    elapsed = time.perf_counter() - start_time
+    return {
+        "us_per_request": round(elapsed / requests * 1_000_000, 2),
+        "tracked_keys": len(limiter)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ips", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=50000)
+    parser.add_argument("--legacy-requests", type=int, default=2000,
+                        help="el algoritmo anterior es O(n) por request; usar menos requests")
+    parser.add_argument("--max-keys", type=int, default=10000)
+    args = parser.parse_args()
+
+    print(f"🔧 BENCHMARK: rate limiter con {args.ips} IPs distintas")
+    print("=" * 60)
+
+    legacy = LegacyLimiter()
+    # Llenar el estado con todas las IPs antes de medir
+    run(legacy, args.ips, args.ips)
+    result = run(legacy, args.ips, args.legacy_requests)
+    print(f"      legacy: {result['us_per_request']:>10} µs/req  claves={result['tracked_keys']}")
+
+    bucket = TokenBucketLimiter(max_keys=args.max_keys * 10)
+    run(bucket, args.ips, args.ips)
+    result = run(bucket, args.ips, args.requests)
+    print(f"token_bucket: {result['us_per_request']:>10} µs/req  claves={result['tracked_keys']}")
+
+    flood = TokenBucketLimiter(max_keys=args.max_keys)
+    result = run(flood, args.ips * 10, args.ips * 10)
+    print(
+        f"inundación de {args.ips * 10} IPs con max_keys={args.max_keys}: "
+        f"{result['us_per_request']} µs/req  claves={result['tracked_keys']}  "
+        f"desalojadas={flood.evictions}"
+    )
+
+
+if __name__ == "__main__":
+    main()
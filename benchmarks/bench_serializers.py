@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Benchmark: serialización de páginas de listado (GET /products, GET /accounts)
+
+Compara, para una página de N documentos:
+  - legacy: documento -> modelo -> *Response -> *ListResponse, revalidación
+    del response_model y jsonable_encoder + JSONResponse (camino de FastAPI)
+  - TypeAdapter: mismos modelos pero serializados con pydantic-core
+    (dump_json), sin jsonable_encoder
+  - directo: utils.serializers (documento -> bytes JSON, sin modelos)
+
+Verifica que el camino directo produce exactamente los mismos bytes que el
+legacy. No necesita MongoDB: los documentos se generan en memoria.
+
+Uso:
+    python -m benchmarks.bench_serializers --rows 1000 --requests 50
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from models.account import Account
+from schemas.account import AccountListResponse, AccountResponse
+from schemas.product import ProductListResponse, ProductResponse
+from services.product_service import ProductService
+from utils.serializers import page_json, serialize_account, serialize_product
+
+
+def make_product_docs(count: int) -> list:
+    now = datetime.utcnow()
+    return [
+        {
+            "_id": ObjectId(),
+            "name": f"Producto {i:06d}",
+            "description": "Descripción de prueba",
+            "price": 100.0 + i % 50,
+            "category": "food",
+            "brand": "Marca",
+            "barcode": f"779{i:010d}",
+            "stock": i % 100,
+            "min_stock": 5,
+            "status": "active",
+            "created_at": now,
+            "updated_at": now,
+            "created_by": "admin"
+        }
+        for i in range(count)
+    ]
+
+
+def make_account_docs(count: int) -> list:
+    now = datetime.utcnow()
+    return [
+        {
+            "_id": ObjectId(),
+            "account_number": f"ACC-{i:08d}",
+            "client_id": str(ObjectId()),
+            "client_name": "Cliente de prueba",
+            "client_email": "cliente@example.com",
+            "items": [
+                {"product_id": str(ObjectId()), "product_name": f"Producto {j}", "quantity": j + 1,
+                 "unit_price": 10.5, "total_price": 10.5 * (j + 1)}
+                for j in range(3)
+            ],
+            "subtotal": 63.0,
+            "tax": 11.97,
+            "discount": 0.0,
+            "total_amount": 74.97,
+            "status": "pending",
+            "due_date": now + timedelta(days=30),
+            "created_at": now,
+            "updated_at": now,
+            "created_by": "admin",
+            "payments": [
+                {"payment_date": now, "amount": 20.0, "payment_method": "cash", "reference": None, "processed_by": "admin"}
+            ],
+            "notes": None
+        }
+        for i in range(count)
+    ]
+
+
+def legacy_products(service: ProductService, docs: list) -> ProductListResponse:
+    """Reproduce get_products anterior (modelos por documento)"""
+    products = []
+    for product_doc in docs:
+        product = service._prepare_product_from_doc(product_doc)
+        products.append(ProductResponse(
+            id=str(product.id),
+            name=product.name,
+            description=product.description,
+            price=product.price,
+            category=product.category,
+            brand=product.brand,
+            barcode=product.barcode,
+            stock=product.stock,
+            min_stock=product.min_stock,
+            status=product.status,
+            created_at=product.created_at,
+            updated_at=product.updated_at
+        ))
+    return ProductListResponse(
+        products=products, total=len(docs), total_estimated=False, page=1, size=len(docs), next_cursor=None
+    )
+
+
+def legacy_accounts(docs: list) -> AccountListResponse:
+    """Reproduce get_accounts anterior (modelos por documento)"""
+    accounts = []
+    for account_doc in docs:
+        account = Account(**account_doc)
+        accounts.append(AccountResponse(
+            id=str(account.id),
+            account_number=account.account_number,
+            client_id=account.client_id,
+            client_name=account.client_name,
+            client_email=account.client_email,
+            items=account.items,
+            subtotal=account.subtotal,
+            tax=account.tax,
+            discount=account.discount,
+            total_amount=account.total_amount,
+            status=account.status,
+            due_date=account.due_date,
+            created_at=account.created_at,
+            updated_at=account.updated_at,
+            payments=account.payments,
+            notes=account.notes
+        ))
+    return AccountListResponse(
+        accounts=accounts, total=len(docs), total_estimated=False, page=1, size=len(docs), next_cursor=None
+    )
+
+
+def fastapi_body(response_model, value) -> bytes:
+    """Revalidación del response_model + jsonable_encoder + JSONResponse"""
+    validated = response_model.model_validate(value.model_dump())
+    return JSONResponse(jsonable_encoder(validated)).body
+
+
+def measure(func, requests: int) -> float:
+    start_time = time.perf_counter()
+    for _ in range(requests):
+        func()
+    return (time.perf_counter() - start_time) / requests * 1000
+
+
+def run(name: str, requests: int, legacy, adapter, direct):
+    assert legacy() == direct(), f"{name}: el camino directo no produce el mismo JSON"
+
+    legacy_ms = measure(legacy, requests)
+    adapter_ms = measure(adapter, requests)
+    direct_ms = measure(direct, requests)
+    print(f"{name}")
+    print(f"         legacy: {legacy_ms:>10.3f} ms/página")
+    print(f"    TypeAdapter: {adapter_ms:>10.3f} ms/página")
+    print(f"        directo: {direct_ms:>10.3f} ms/página")
+    print(f"📈 Speedup (directo vs legacy): {legacy_ms / direct_ms:.1f}x")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"🔧 BENCHMARK: serialización de páginas de {args.rows} documentos")
+    print("=" * 60)
+
+    service = ProductService()
+    product_docs = make_product_docs(args.rows)
+    product_adapter = TypeAdapter(ProductListResponse)
+    run(
+        "GET /products",
+        args.requests,
+        lambda: fastapi_body(ProductListResponse, legacy_products(service, product_docs)),
+        lambda: product_adapter.dump_json(legacy_products(service, product_docs)),
+        lambda: page_json("products", [serialize_product(d) for d in product_docs], args.rows, False, 1, args.rows, None)
+    )
+
+    account_docs = make_account_docs(args.rows)
+    account_adapter = TypeAdapter(AccountListResponse)
+    run(
+        "GET /accounts",
+        args.requests,
+        lambda: fastapi_body(AccountListResponse, legacy_accounts(account_docs)),
+        lambda: account_adapter.dump_json(legacy_accounts(account_docs)),
+        lambda: page_json("accounts", [serialize_account(d) for d in account_docs], args.rows, False, 1, args.rows, None)
+    )
+
+
+if __name__ == "__main__":
+    main()
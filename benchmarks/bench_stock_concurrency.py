@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Benchmark: ajustes de stock concurrentes (updates perdidos y throughput)
+
+Lanza muchos ajustes de stock en paralelo sobre pocos productos y compara:
+  - legacy: find_one + cálculo en Python + $set (el update_stock anterior)
+  - update_stock: find_one_and_update con $inc condicionado
+  - bulk_update_stock: bulk_write no ordenado de $inc condicionados
+
+Al final verifica que stock final == stock inicial + suma de los ajustes que
+cada camino reportó como aplicados. Sin --mongo-url usa una colección en
+memoria que aplica cada operación de forma atómica por documento (como
+MongoDB) con un round-trip simulado (--rtt-ms) entre operaciones.
+
+Uso:
+    python -m benchmarks.bench_stock_concurrency --products 20 --adjustments 5000 --concurrency 200
+    python -m benchmarks.bench_stock_concurrency --mongo-url mongodb://localhost:27017
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime
+
+from bson import ObjectId
+
+from services.product_service import ProductService
+
+
+class SimulatedCollection:
+    """Colección en memoria con las operaciones que usan los ajustes de stock"""
+
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.docs = {}
+
+    async def _round_trip(self):
+        await asyncio.sleep(self.rtt * random.random() * 2)
+
+    @staticmethod
+    def _matches(doc, query) -> bool:
+        for field, condition in query.items():
+            value = doc.get(field)
+            if isinstance(condition, dict):
+                if "$gte" in condition and not value >= condition["$gte"]:
+                    return False
+                if "$in" in condition and value not in condition["$in"]:
+                    return False
+            elif isinstance(value, list):
+                if condition not in value:
+                    return False
+            elif value != condition:
+                return False
+        return True
+
+    @staticmethod
+    def _apply(doc, update):
+        for field, amount in update.get("$inc", {}).items():
+            doc[field] = doc.get(field, 0) + amount
+        doc.update(update.get("$set", {}))
+        for field, push in update.get("$push", {}).items():
+            doc[field] = doc.get(field, []) + [push]
+        for field, value in update.get("$pull", {}).items():
+            doc[field] = [item for item in doc.get(field, []) if item != value]
+
+    async def insert_many(self, docs):
+        for doc in docs:
+            self.docs[doc["_id"]] = dict(doc)
+
+    async def find_one(self, query, projection=None):
+        await self._round_trip()
+        for doc in self.docs.values():
+            if self._matches(doc, query):
+                return dict(doc)
+        return None
+
+    def find(self, query):
+        collection = self
+
+        async def cursor():
+            await collection._round_trip()
+            for doc in list(collection.docs.values()):
+                if collection._matches(doc, query):
+                    yield dict(doc)
+
+        return cursor()
+
+    async def update_one(self, query, update):
+        await self._round_trip()
+        doc = self.docs.get(query["_id"])
+        if doc is not None and self._matches(doc, query):
+            self._apply(doc, update)
+
+    async def update_many(self, query, update):
+        await self._round_trip()
+        for doc in self.docs.values():
+            if self._matches(doc, query):
+                self._apply(doc, update)
+
+    async def find_one_and_update(self, query, update, return_document=None):
+        await self._round_trip()
+        doc = self.docs.get(query["_id"])
+        if doc is None or not self._matches(doc, query):
+            return None
+        self._apply(doc, update)
+        return dict(doc)
+
+    async def bulk_write(self, operations, ordered=True):
+        await self._round_trip()
+        for operation in operations:
+            query, update = operation._filter, operation._doc
+            doc = self.docs.get(query["_id"])
+            if doc is not None and self._matches(doc, query):
+                self._apply(doc, update)
+
+
+class SimulatedDatabase:
+    def __init__(self, collection: SimulatedCollection):
+        self.collection = collection
+
+    def __getitem__(self, name):
+        return self.collection
+
+
+class NullAuditService:
+    async def log_action(self, **kwargs):
+        pass
+
+
+async def legacy_update_stock(collection, product_id: str, delta: int) -> bool:
+    """update_stock anterior: lectura, cálculo en Python y $set"""
+    product_doc = await collection.find_one({"_id": ObjectId(product_id)})
+    new_stock = product_doc["stock"] + delta
+    if new_stock < 0:
+        return False
+    await collection.update_one(
+        {"_id": ObjectId(product_id)},
+        {"$set": {"stock": new_stock, "updated_at": datetime.utcnow()}}
+    )
+    return True
+
+
+async def open_collection(args):
+    if args.mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(args.mongo_url)
+        database = client["bench_stock_concurrency"]
+        await database["products"].drop()
+        return database, database["products"]
+    collection = SimulatedCollection(args.rtt_ms / 1000)
+    return SimulatedDatabase(collection), collection
+
+
+async def reset_products(collection, count: int, initial_stock: int) -> list:
+    if hasattr(collection, "delete_many"):
+        await collection.delete_many({})
+    else:
+        collection.docs.clear()
+    now = datetime.utcnow()
+    docs = [
+        {
+            "_id": ObjectId(), "name": f"Producto {i}", "price": 10.0, "category": "food",
+            "stock": initial_stock, "min_stock": 0, "status": "active",
+            "created_at": now, "updated_at": now
+        }
+        for i in range(count)
+    ]
+    await collection.insert_many(docs)
+    return [str(doc["_id"]) for doc in docs]
+
+
+async def final_stock(collection, product_ids: list) -> dict:
+    return {
+        str(doc["_id"]): doc["stock"]
+        async for doc in collection.find({"_id": {"$in": [ObjectId(product_id) for product_id in product_ids]}})
+    }
+
+
+async def run_case(name, args, database, collection, adjust_batch):
+    """Ejecuta todos los ajustes con `concurrency` tareas y verifica el resultado"""
+    product_ids = await reset_products(collection, args.products, args.initial_stock)
+    rng = random.Random(7)
+    adjustments = [(rng.choice(product_ids), rng.choice([-3, -2, -1, 1, 2])) for _ in range(args.adjustments)]
+    applied = {product_id: 0 for product_id in product_ids}
+    queue = [adjustments[i:i + args.batch] for i in range(0, len(adjustments), args.batch)]
+
+    async def worker():
+        while queue:
+            batch = queue.pop()
+            for product_id, delta, ok in await adjust_batch(batch):
+                if ok:
+                    applied[product_id] += delta
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    seconds = time.perf_counter() - start_time
+
+    stock = await final_stock(collection, product_ids)
+    lost = sum(abs(stock[product_id] - (args.initial_stock + applied[product_id])) for product_id in product_ids)
+    negative = sum(1 for value in stock.values() if value < 0)
+    status = "✅" if lost == 0 and negative == 0 else "❌"
+    print(f"{status} {name:<20}{seconds:>9.2f} s{args.adjustments / seconds:>12,.0f} ajustes/s"
+          f"   desvío total: {lost:>6}   stock negativo: {negative}")
+
+
+async def main_async(args):
+    database, collection = await open_collection(args)
+    service = ProductService()
+    audit_service = NullAuditService()
+
+    async def get_database():
+        return database
+
+    async def get_audit_service():
+        return audit_service
+
+    service.get_database = get_database
+    service.get_audit_service = get_audit_service
+
+    async def legacy(batch):
+        return [(product_id, delta, await legacy_update_stock(collection, product_id, delta)) for product_id, delta in batch]
+
+    async def single(batch):
+        results = []
+        for product_id, delta in batch:
+            try:
+                await service.update_stock(product_id, delta, "bench", "127.0.0.1")
+                results.append((product_id, delta, True))
+            except Exception:
+                results.append((product_id, delta, False))
+        return results
+
+    async def bulk(batch):
+        report = await service.bulk_update_stock(
+            [{"product_id": product_id, "delta": delta} for product_id, delta in batch], "bench", "127.0.0.1"
+        )
+        # Los repetidos dentro de un lote se reintentan como ajustes individuales
+        retries = [(r["product_id"], r["delta"]) for r in report["results"] if r["error"] == "Producto repetido en la solicitud"]
+        return [(r["product_id"], r["delta"], r["success"]) for r in report["results"]] + await single(retries)
+
+    print(f"🔧 BENCHMARK: {args.adjustments} ajustes de stock sobre {args.products} productos, "
+          f"concurrencia {args.concurrency} ({'MongoDB' if args.mongo_url else f'simulado, rtt {args.rtt_ms} ms'})")
+    print("=" * 60)
+    await run_case("legacy", args, database, collection, legacy)
+    await run_case("update_stock", args, database, collection, single)
+    await run_case(f"bulk (lotes de {args.batch})", args, database, collection, bulk)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=20)
+    parser.add_argument("--adjustments", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=50)
+    parser.add_argument("--initial-stock", type=int, default=100)
+    parser.add_argument("--rtt-ms", type=float, default=0.5)
+    parser.add_argument("--mongo-url", default=None, help="usar un MongoDB real (base bench_stock_concurrency)")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Clases de admisión (control de concurrencia y load shedding)
+
+Cada clase define:
+    priority -- menor número = se atiende antes cuando hay cupo global libre
+    limit    -- requests simultáneos máximos de la clase
+    queue    -- requests en espera máximos; el resto recibe 503 inmediato
+    timeout  -- segundos máximos de espera en cola antes de recibir 503
+
+Las rutas se asignan a una clase por prefijo ("*" acepta cualquier segmento,
+gana el prefijo más largo). Las rutas sin política usan ADMISSION_DEFAULT_CLASS;
+"exempt" deja la ruta fuera del control (health checks, documentación y
+streams de larga duración que retendrían un cupo indefinidamente).
+"""
+
+ADMISSION_CLASSES = {
+    # Pagos y login: no deben quedar detrás de consultas pesadas
+    "critical": {"priority": 0, "limit": 32, "queue": 256, "timeout": 2.0},
+    # CRUD general
+    "standard": {"priority": 1, "limit": 24, "queue": 128, "timeout": 1.0},
+    # Reportes y consultas costosas: cupo chico y se descartan primero
+    "reporting": {"priority": 2, "limit": 8, "queue": 16, "timeout": 0.5},
+}
+
+ADMISSION_DEFAULT_CLASS = "standard"
+
+ADMISSION_ROUTES = [
+    {"prefix": "/docs", "exempt": True},
+    {"prefix": "/redoc", "exempt": True},
+    {"prefix": "/openapi.json", "exempt": True},
+    {"prefix": "/health", "exempt": True},
+    # Stream SSE de larga duración
+    {"prefix": "/products/low-stock/stream", "exempt": True},
+
+    {"prefix": "/auth/login", "class": "critical"},
+    {"prefix": "/accounts/*/payment", "class": "critical"},
+
+    {"prefix": "/accounts/summary", "class": "reporting"},
+    {"prefix": "/accounts/mark-overdue", "class": "reporting"},
+    {"prefix": "/audit", "class": "reporting"},
+    {"prefix": "/metrics", "class": "reporting"},
+    {"prefix": "/products/import", "class": "reporting"},
+]
@@ -0,0 +1,42 @@
+"""Tabla declarativa de políticas de rate limiting
+
+Cada política es un dict y se compila al arrancar (utils.rate_limit_policies).
+
+Políticas de ruta (clave "prefix"):
+    prefix  -- prefijo por segmentos; "*" acepta cualquier segmento (ej. "/accounts/*/payment")
+    cost    -- tokens que consume cada request del presupuesto del principal (default 1)
+    limit   -- si se define, la ruta tiene además su propio bucket por principal
+    window  -- ventana en segundos del bucket propio (default rate_limit_time_window)
+    exempt  -- True para no aplicar rate limiting
+
+Políticas de principal (clave "role" o "user_id"):
+    limit   -- requests (tokens) permitidos por ventana
+    window  -- ventana en segundos
+
+Gana el prefijo más largo; para el principal, user_id tiene prioridad sobre role.
+Los requests anónimos se identifican por IP y usan el presupuesto por defecto.
+"""
+
+RATE_LIMIT_POLICIES = [
+    # Rutas exentas
+    {"prefix": "/docs", "exempt": True},
+    {"prefix": "/redoc", "exempt": True},
+    {"prefix": "/openapi.json", "exempt": True},
+    {"prefix": "/health", "exempt": True},
+
+    # Endpoints de autenticación con bucket propio (protección contra fuerza bruta)
+    {"prefix": "/auth/login", "limit": 10, "window": 60},
+    {"prefix": "/auth/register", "limit": 5, "window": 60},
+
+    # Endpoints costosos
+    {"prefix": "/accounts/summary/payments", "cost": 10},
+    {"prefix": "/accounts/mark-overdue", "cost": 20},
+    {"prefix": "/audit/logs", "cost": 5},
+    {"prefix": "/metrics", "cost": 5},
+    {"prefix": "/products/import", "cost": 20},
+    {"prefix": "/products/stock/bulk", "cost": 10},
+
+    # Presupuestos por rol
+    {"role": "admin", "limit": 1000, "window": 60},
+    {"role": "client", "limit": 200, "window": 60},
+]
@@ -21,6 +21,72 @@ class Settings(BaseSettings):
     app_name: str = "Supermarket Payment System"
     version: str = "1.0.0"
     
+    # Hashing de contraseñas (bcrypt fuera del event loop)
+    hashing_pool_type: str = "thread"  # "thread" o "process"
+    hashing_max_workers: int = 4
+    hashing_max_queue: int = 64
+    
+    # Caché de usuarios autenticados
+    principal_cache_ttl_seconds: int = 30
+    principal_cache_max_size: int = 1024
+    
+    # Caché de tokens JWT ya verificados (vigente hasta el exp de cada token)
+    token_cache_max_size: int = 4096
+    
+    # Persistencia diferida de actividad de sesiones
+    session_flush_interval_seconds: float = 5.0
+    
+    # Escritura asíncrona del log de auditoría
+    audit_queue_max_size: int = 10000
+    audit_batch_size: int = 500
+    audit_flush_interval_seconds: float = 1.0
+    audit_fsync_policy: str = "interval"  # "always", "interval" o "never"
+    audit_fsync_interval_seconds: float = 5.0
+    audit_overflow_policy: str = "drop"  # "drop" o "block"
+    
+    # Segmentos del log de auditoría
+    audit_log_dir: str = "audit_logs"
+    audit_segment_max_bytes: int = 64 * 1024 * 1024
+    audit_segment_rotate_hourly: bool = True
+    audit_segment_compress: bool = True
+    
+    # Colección de auditoría en MongoDB
+    audit_mongo_enabled: bool = True
+    
+    # Rate limiting
+    rate_limit_backend: str = "memory"  # "memory", "shared_memory" o "mongo"
+    rate_limit_max_requests: int = 100
+    rate_limit_time_window: int = 60
+    rate_limit_max_keys: int = 100000
+    rate_limit_lease_size: int = 10  # tokens que cada worker toma por acceso al almacén compartido
+    rate_limit_lease_seconds: float = 1.0
+    rate_limit_shared_name: str = "supermarket_rate_limit"
+    rate_limit_shared_slots: int = 65536
+    
+    # Control de admisión (clases en config/admission_policies.py)
+    admission_enabled: bool = True
+    admission_max_in_flight: int = 64  # por debajo del pool de conexiones de MongoDB (100)
+    
+    # Caché del catálogo de productos
+    catalog_cache_refresh_seconds: float = 30.0  # recarga para ver cambios de otros procesos
+    
+    # Caché de totales de listados
+    count_cache_ttl_seconds: float = 30.0
+    count_cache_max_size: int = 1024
+    count_sample_size: int = 1000  # documentos muestreados para totales estimados con filtro
+    
+    # Reservas de stock de cuentas pendientes
+    stock_reservation_hold_seconds: float = 86400.0  # vencimiento de la reserva si la cuenta no se paga
+    stock_reservation_retention_seconds: float = 604800.0  # purga (TTL) de reservas cerradas
+    stock_reservation_sweep_seconds: float = 60.0
+    
+    # Alertas de stock bajo (stream SSE)
+    low_stock_feed_queue_size: int = 100  # eventos en espera por cliente conectado
+    low_stock_heartbeat_seconds: float = 15.0
+    
+    # Cache HTTP (ETag / Cache-Control) de lecturas de productos y cuentas
+    http_cache_max_age_seconds: int = 10  # tope de max-age; 0 = revalidar siempre
+    
     class Config:
         env_file = ".env"
         env_file_encoding = 'utf-8'
@@ -59,6 +125,44 @@ except Exception as e:
         debug = True
         app_name = "Supermarket Payment System"
         version = "1.0.0"
+        hashing_pool_type = "thread"
+        hashing_max_workers = 4
+        hashing_max_queue = 64
+        principal_cache_ttl_seconds = 30
+        principal_cache_max_size = 1024
+        token_cache_max_size = 4096
+        session_flush_interval_seconds = 5.0
+        audit_queue_max_size = 10000
+        audit_batch_size = 500
+        audit_flush_interval_seconds = 1.0
+        audit_fsync_policy = "interval"
+        audit_fsync_interval_seconds = 5.0
+        audit_overflow_policy = "drop"
+        audit_log_dir = "audit_logs"
+        audit_segment_max_bytes = 64 * 1024 * 1024
+        audit_segment_rotate_hourly = True
+        audit_segment_compress = True
+        audit_mongo_enabled = True
+        rate_limit_backend = "memory"
+        rate_limit_max_requests = 100
+        rate_limit_time_window = 60
+        rate_limit_max_keys = 100000
+        rate_limit_lease_size = 10
+        rate_limit_lease_seconds = 1.0
+        rate_limit_shared_name = "supermarket_rate_limit"
+        rate_limit_shared_slots = 65536
+        admission_enabled = True
+        admission_max_in_flight = 64
+        catalog_cache_refresh_seconds = 30.0
+        count_cache_ttl_seconds = 30.0
+        count_cache_max_size = 1024
+        count_sample_size = 1000
+        stock_reservation_hold_seconds = 86400.0
+        stock_reservation_retention_seconds = 604800.0
+        stock_reservation_sweep_seconds = 60.0
+        low_stock_feed_queue_size = 100
+        low_stock_heartbeat_seconds = 15.0
+        http_cache_max_age_seconds = 10
     
     settings = DefaultSettings()
     print("⚠️  Usando configuración de emergencia - revisa tu archivo .env")
\ No newline at end of file
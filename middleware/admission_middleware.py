@@ -0,0 +1,44 @@
+from fastapi import status
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from utils.admission import AdmissionController, admission_controller
+
+
+class AdmissionControlMiddleware:
+    """Middleware ASGI de control de concurrencia y load shedding
+
+    Cada request ocupa un cupo de su clase de ruta mientras se procesa (incluido
+    el envío de la respuesta). Si no obtiene cupo se responde 503 con
+    Retry-After sin tocar la aplicación.
+    """
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController = None):
+        self.app = app
+        self.controller = controller or admission_controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        admission_class = self.controller.classify(scope["path"])
+        if admission_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await self.controller.acquire(admission_class):
+            response = JSONResponse(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                content={
+                    "detail": "Servidor saturado. Intenta de nuevo en unos segundos.",
+                    "type": "service_unavailable_error"
+                },
+                headers={"Retry-After": str(admission_class.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(admission_class)
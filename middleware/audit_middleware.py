@@ -1,85 +1,102 @@
 import time
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from typing import Callable, Optional
+from fastapi import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Optional
 from utils.security import get_client_ip
+from utils.audit_context import begin_audit_context, end_audit_context
+from middleware.auth_context import get_auth_user_info
 
 
 async def get_optional_current_user_from_request(request: Request) -> Optional[dict]:
     """Obtiene el usuario actual si está autenticado, sin requerir autenticación"""
     try:
-        from utils.security import verify_token
-        
-        auth_header = request.headers.get("Authorization")
-        if not auth_header or not auth_header.startswith("Bearer "):
-            return None
-        
-        token = auth_header.split(" ")[1]
-        payload = verify_token(token)
-        
-        if payload is None:
-            return None
-        
-        return {
-            "user_id": payload.get("sub"),
-            "username": payload.get("username"),
-            "role": payload.get("role"),
-            "session_id": payload.get("session_id")
-        }
+        return get_auth_user_info(request)
     except Exception:
         return None
 
 
-class AuditMiddleware(BaseHTTPMiddleware):
-    """Middleware para registrar automáticamente acciones de auditoría"""
+class AuditMiddleware:
+    """Middleware ASGI para registrar automáticamente acciones de auditoría"""
     
-    def __init__(self, app, skip_paths: list = None):
-        super().__init__(app)
-        self.skip_paths = skip_paths or [
+    def __init__(self, app: ASGIApp, skip_paths: list = None):
+        self.app = app
+        self.skip_paths = tuple(skip_paths or [
             "/docs",
             "/redoc", 
             "/openapi.json",
             "/favicon.ico",
             "/health"
-        ]
+        ])
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         # Saltar paths que no necesitan auditoría
-        if any(request.url.path.startswith(path) for path in self.skip_paths):
-            return await call_next(request)
+        if scope["type"] != "http" or scope["path"].startswith(self.skip_paths):
+            await self.app(scope, receive, send)
+            return
         
         # Obtener información del request
+        request = Request(scope)
         start_time = time.time()
         ip_address = get_client_ip(request)
         user_agent = request.headers.get("user-agent")
         method = request.method
-        path = request.url.path
+        path = scope["path"]
         
         # Obtener información del usuario si está autenticado
         user_info = await get_optional_current_user_from_request(request)
         
-        # Procesar request
-        response = await call_next(request)
+        # El tiempo de procesamiento se mide hasta el inicio de la respuesta
+        response_start = {}
+        
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                response_start["status_code"] = message["status"]
+                response_start["time"] = time.time()
+            await send(message)
+        
+        # Procesar request; los servicios adjuntan sus eventos al contexto
+        audit_context, context_token = begin_audit_context()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            # Un request fallido también se audita, con los eventos ya acumulados
+            await self._log_request(
+                user_info=user_info,
+                method=method,
+                path=path,
+                ip_address=ip_address,
+                user_agent=user_agent,
+                status_code=500,
+                success=False,
+                process_time=time.time() - start_time,
+                events=audit_context.events
+            )
+            raise
+        finally:
+            end_audit_context(context_token)
+        
+        if "status_code" not in response_start:
+            return
         
         # Calcular tiempo de procesamiento
-        process_time = time.time() - start_time
+        process_time = response_start["time"] - start_time
+        status_code = response_start["status_code"]
         
         # Determinar si fue exitoso
-        success = 200 <= response.status_code < 400
+        success = 200 <= status_code < 400
         
-        # Registrar en auditoría para ciertos endpoints
+        # Registrar un único registro por request
         await self._log_request(
             user_info=user_info,
             method=method,
             path=path,
             ip_address=ip_address,
             user_agent=user_agent,
-            status_code=response.status_code,
+            status_code=status_code,
             success=success,
-            process_time=process_time
+            process_time=process_time,
+            events=audit_context.events
         )
-        
-        return response
     
     async def _log_request(
         self,
@@ -90,9 +107,10 @@ class AuditMiddleware(BaseHTTPMiddleware):
         user_agent: str,
         status_code: int,
         success: bool,
-        process_time: float
+        process_time: float,
+        events: list = None
     ):
-        """Registra el request en el log de auditoría"""
+        """Registra el request en el log de auditoría combinando los eventos de dominio"""
         
         # Solo auditar ciertos tipos de requests
         audit_paths = {
@@ -126,31 +144,80 @@ class AuditMiddleware(BaseHTTPMiddleware):
             elif method == "DELETE":
                 action = "delete"
         
-        if should_audit:
-            try:
-                # Importación diferida para evitar circular imports
-                from services.audit_service import audit_service
-                
-                await audit_service.log_action(
+        if not should_audit and not events:
+            return
+        
+        try:
+            # Importación diferida para evitar circular imports
+            from services.audit_service import audit_service
+            
+            request_details = {
+                "method": method,
+                "path": path,
+                "status_code": status_code,
+                "process_time": round(process_time, 3),
+                "user_agent": user_agent[:100] if user_agent else None  # Limitar longitud
+            }
+            
+            if not events:
+                record = audit_service.build_record(
                     user_id=user_info.get("user_id") if user_info else None,
                     username=user_info.get("username") if user_info else "anonymous",
                     action=action,  # Usar solo acciones válidas del enum
                     resource=resource,
-                    details={
-                        "method": method,
-                        "path": path,
-                        "status_code": status_code,
-                        "process_time": round(process_time, 3),
-                        "user_agent": user_agent[:100] if user_agent else None  # Limitar longitud
-                    },
+                    details=request_details,
                     ip_address=ip_address,
                     user_agent=user_agent,
                     success=success,
                     session_id=user_info.get("session_id") if user_info else None
                 )
-            except Exception as e:
-                # No fallar si hay error en auditoría
-                print(f"Error en auditoría: {e}")
+            else:
+                record = self._merge_events(events, request_details, user_info, ip_address, user_agent, success)
+            
+            await audit_service.log_to_file(record)
+        except Exception as e:
+            # No fallar si hay error en auditoría
+            print(f"Error en auditoría: {e}")
+    
+    def _merge_events(
+        self,
+        events: list,
+        request_details: dict,
+        user_info: Optional[dict],
+        ip_address: str,
+        user_agent: Optional[str],
+        success: bool
+    ) -> dict:
+        """Combina los eventos de dominio con los datos del request en un solo registro"""
+        record = dict(events[0])
+        
+        # Los campos de dominio tienen prioridad; el request completa lo que falta
+        record["details"] = {**request_details, **(record.get("details") or {})}
+        if len(events) > 1:
+            record["details"]["related"] = [
+                {
+                    "action": event.get("action"),
+                    "resource": event.get("resource"),
+                    "resource_id": event.get("resource_id"),
+                    "success": event.get("success"),
+                    "details": event.get("details")
+                }
+                for event in events[1:]
+            ]
+        
+        if record.get("ip_address") in (None, "unknown"):
+            record["ip_address"] = ip_address
+        if not record.get("user_agent"):
+            record["user_agent"] = user_agent
+        if user_info:
+            if record.get("user_id") in (None, user_info.get("user_id")):
+                record["user_id"] = user_info.get("user_id")
+                record["username"] = user_info.get("username")
+            if not record.get("session_id"):
+                record["session_id"] = user_info.get("session_id")
+        
+        record["success"] = bool(record.get("success", True)) and success
+        return record
     
     def _extract_resource_id(self, path: str) -> str:
         """Extrae el ID del recurso de la URL"""
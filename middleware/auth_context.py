@@ -0,0 +1,44 @@
+from typing import Optional
+from fastapi import Request
+from utils.security import verify_token
+
+
+_MISSING = object()
+
+
+def get_bearer_token(request: Request) -> Optional[str]:
+    """Extrae el token Bearer del header Authorization"""
+    auth_header = request.headers.get("Authorization")
+    if not auth_header:
+        return None
+    
+    scheme, _, token = auth_header.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    return token
+
+
+def get_token_claims(request: Request) -> Optional[dict]:
+    """Decodifica el token una sola vez por request y comparte los claims en request.state"""
+    claims = getattr(request.state, "auth_claims", _MISSING)
+    if claims is not _MISSING:
+        return claims
+    
+    token = get_bearer_token(request)
+    claims = verify_token(token) if token else None
+    request.state.auth_claims = claims
+    return claims
+
+
+def get_auth_user_info(request: Request) -> Optional[dict]:
+    """Obtiene la identidad del token sin requerir autenticación"""
+    claims = get_token_claims(request)
+    if claims is None:
+        return None
+    
+    return {
+        "user_id": claims.get("sub"),
+        "username": claims.get("username"),
+        "role": claims.get("role"),
+        "session_id": claims.get("session_id")
+    }
@@ -1,7 +1,7 @@
 from fastapi import Request, HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional
-from utils.security import verify_token
+from middleware.auth_context import get_token_claims, get_auth_user_info
 from utils.exceptions import AuthenticationException, AuthorizationException
 from models.user import UserRole
 
@@ -9,11 +9,11 @@ from models.user import UserRole
 security = HTTPBearer()
 
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_current_user(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Obtiene el usuario actual desde el token JWT"""
     try:
-        token = credentials.credentials
-        payload = verify_token(token)
+        # Reutiliza los claims ya decodificados en este request
+        payload = get_token_claims(request)
         
         if payload is None:
             raise AuthenticationException("Token inválido")
@@ -73,21 +73,6 @@ async def require_admin_or_client(current_user = Depends(require_role([UserRole.
 async def get_optional_current_user(request: Request) -> Optional[dict]:
     """Obtiene el usuario actual si está autenticado, sin requerir autenticación"""
     try:
-        auth_header = request.headers.get("Authorization")
-        if not auth_header or not auth_header.startswith("Bearer "):
-            return None
-        
-        token = auth_header.split(" ")[1]
-        payload = verify_token(token)
-        
-        if payload is None:
-            return None
-        
-        return {
-            "user_id": payload.get("sub"),
-            "username": payload.get("username"),
-            "role": payload.get("role"),
-            "session_id": payload.get("session_id")
-        }
+        return get_auth_user_info(request)
     except Exception:
         return None
\ No newline at end of file
@@ -1,45 +1,118 @@
 import json
-import time
-from fastapi import Request, Response, HTTPException, status
-from starlette.middleware.base import BaseHTTPMiddleware
-from typing import Callable
-from utils.validators import sanitize_string
+import math
+from typing import Optional
+from fastapi import Request, HTTPException, status
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from utils.validators import DANGEROUS_CHARS_TABLE, BLOCKED_PATTERNS, contains_blocked_pattern
+from utils.routing import SANITIZED_BODY_STATE_KEY
+from utils.rate_limiter import TokenBucketLimiter
+from utils.rate_limit_policies import RateLimitPolicyTable
+from middleware.auth_context import get_auth_user_info
 
 
-class SecurityMiddleware(BaseHTTPMiddleware):
-    """Middleware para aplicar medidas de seguridad"""
+# Secuencias que obligan a trabajar sobre los strings decodificados: escapes
+# JSON (\u003c), NUL y los únicos caracteres no ASCII cuyo lower() produce
+# letras ASCII (İ y K). Sin ellas los strings del body crudo son idénticos a
+# los decodificados.
+_DECODE_SENSITIVE_BYTES = (b"\\", b"\x00", "\u0130".encode(), "\u212a".encode())
+
+# Caracteres que sanitize_string elimina (nunca son sintaxis JSON)
+_DANGEROUS_BYTES = b"<>'&$`|;"
+
+# Espacios no ASCII que str.strip() quitaría y pueden aparecer sin escapar
+_UNICODE_SPACE_BYTES = tuple(
+    chr(code).encode() for code in range(0x80, 0x3001) if chr(code).isspace()
+)
+
+
+def _error_response(exc: HTTPException) -> JSONResponse:
+    """Respuesta JSON equivalente a la de FastAPI para un HTTPException"""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers=getattr(exc, "headers", None)
+    )
+
+
+def _replay_receive(body, receive: Receive) -> Receive:
+    """Entrega el body ya leído una vez y luego delega en el receive original
+
+    `body` puede ser una función que construye los bytes solo si alguien los lee.
+    """
+    sent = False
+
+    async def replay() -> Message:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body() if callable(body) else body, "more_body": False}
+        return await receive()
+
+    return replay
+
+
+class SecurityMiddleware:
+    """Middleware ASGI para aplicar medidas de seguridad"""
     
-    def __init__(self, app):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp):
+        self.app = app
         self.max_request_size = 10 * 1024 * 1024  # 10MB
-        self.blocked_patterns = [
-            "script>", "<script", "javascript:", "vbscript:",
-            "onload=", "onerror=", "onclick=", "eval(",
-            "document.cookie", "document.write"
-        ]
+        # Rutas que leen el body como stream y admiten archivos más grandes
+        self.large_body_paths = {"/products/import": 256 * 1024 * 1024}  # 256MB
+        self.blocked_patterns = list(BLOCKED_PATTERNS)
+        # Patrones precalculados en bytes para el body crudo
+        self._blocked_bytes = tuple(p.encode() for p in self.blocked_patterns)
+        self._default_headers = self._build_security_headers(docs=False)
+        self._docs_headers = self._build_security_headers(docs=True)
+        self._header_names = {name for name, _ in self._default_headers}
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # Verificar tamaño del request
-        content_length = request.headers.get("content-length")
-        if content_length and int(content_length) > self.max_request_size:
-            raise HTTPException(
-                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                detail="Request demasiado grande"
-            )
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        # Validar headers de seguridad
-        self._validate_security_headers(request)
+        request = Request(scope, receive)
+        security_headers = self._security_headers_for(scope["path"])
         
-        # Sanitizar datos del request si es necesario
-        await self._sanitize_request_data(request)
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                # Los headers de seguridad reemplazan a los que haya puesto la ruta
+                message["headers"] = [
+                    (name, value) for name, value in message.get("headers", [])
+                    if name.lower() not in self._header_names
+                ] + security_headers
+            await send(message)
         
-        # Procesar request
-        response = await call_next(request)
+        try:
+            # Verificar tamaño del request
+            content_length = request.headers.get("content-length")
+            max_size = self.large_body_paths.get(scope["path"].rstrip("/"), self.max_request_size)
+            if content_length and int(content_length) > max_size:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail="Request demasiado grande"
+                )
+            
+            # Validar headers de seguridad
+            self._validate_security_headers(request)
+            
+            # Sanitizar datos del request si es necesario
+            body = await self._sanitize_request_data(request)
+        except HTTPException as exc:
+            await _error_response(exc)(scope, receive, send_with_headers)
+            return
         
-        # Agregar headers de seguridad a la respuesta
-        self._add_security_headers(response, request)
+        parsed = getattr(request.state, SANITIZED_BODY_STATE_KEY, None)
+        if parsed is not None:
+            # Las rutas SanitizedJSONRoute usan el objeto ya parseado; el body
+            # sanitizado solo se serializa si otra aplicación lee el stream
+            receive = _replay_receive(lambda: json.dumps(parsed[1]).encode('utf-8'), receive)
+        elif body is not None:
+            receive = _replay_receive(body, receive)
         
-        return response
+        # Procesar request
+        await self.app(scope, receive, send_with_headers)
     
     def _validate_security_headers(self, request: Request):
         """Valida headers de seguridad del request"""
@@ -59,7 +132,7 @@ class SecurityMiddleware(BaseHTTPMiddleware):
             content_type = request.headers.get("content-type", "")
             if content_type and not any(ct in content_type.lower() for ct in [
                 "application/json", "application/x-www-form-urlencoded", 
-                "multipart/form-data", "text/plain"
+                "multipart/form-data", "text/plain", "text/csv", "application/x-ndjson"
             ]):
                 raise HTTPException(
                     status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
@@ -67,69 +140,134 @@ class SecurityMiddleware(BaseHTTPMiddleware):
                 )
     
     async def _sanitize_request_data(self, request: Request):
-        """Sanitiza datos del request para prevenir inyecciones"""
+        """Sanitiza datos del request para prevenir inyecciones
+
+        El body se decodifica una sola vez: el objeto sanitizado queda en
+        request.state para SanitizedJSONRoute. Retorna los bytes que debe
+        recibir la aplicación cuando no hubo objeto parseado, o None.
+        """
         
         # Solo sanitizar para ciertos content-types
         content_type = request.headers.get("content-type", "")
         
         if "application/json" in content_type:
+            # Leer el body
+            body = await request.body()
+            if not body:
+                return body
+            
+            # Búsqueda de los patrones sobre los bytes crudos (bytes.find en C).
+            # Si hay coincidencia o bytes que cambian al decodificar se revisa
+            # cada string decodificado, que es lo que realmente llega a la ruta.
+            lowered = body.lower()
+            scan_strings = (
+                any(sequence in body for sequence in _DECODE_SENSITIVE_BYTES)
+                or any(pattern in lowered for pattern in self._blocked_bytes)
+            )
+            
+            # Sin escapes se sanitiza directamente el body crudo y se parsea una vez
+            sanitized_body = None if scan_strings else self._sanitize_raw_body(body)
+            
             try:
-                # Leer el body
-                body = await request.body()
-                if body:
-                    # Parsear JSON
-                    data = json.loads(body.decode('utf-8'))
-                    
-                    # Sanitizar recursivamente
-                    sanitized_data = self._sanitize_json_data(data)
-                    
-                    # Reemplazar el body con datos sanitizados
-                    request._body = json.dumps(sanitized_data).encode('utf-8')
-                    
+                # Parsear JSON
+                if sanitized_body is not None:
+                    data = json.loads(sanitized_body.decode('utf-8'))
+                else:
+                    data = self._sanitize_json_data(json.loads(body.decode('utf-8')), scan_strings)
             except (json.JSONDecodeError, UnicodeDecodeError):
                 # Si no se puede parsear, dejar como está
-                pass
+                return body
+            
+            setattr(request.state, SANITIZED_BODY_STATE_KEY, (sanitized_body or body, data))
+        
+        return None
+    
+    @staticmethod
+    def _sanitize_raw_body(body: bytes):
+        """Aplica sanitize_string a todos los strings del body crudo
+
+        Solo es válido sin escapes: en ese caso las comillas alternan entre
+        apertura y cierre y los strings son los segmentos impares. Retorna
+        None si el body no tiene esa forma o si habría que modificar una clave
+        (las claves no se sanitizan).
+        """
+        segments = body.split(b'"')
+        if len(segments) % 2 == 0:
+            return None
+        
+        # Fuera de los strings esos caracteres harían inválido el JSON original
+        structure = b"".join(segments[0::2])
+        if len(structure.translate(None, _DANGEROUS_BYTES)) != len(structure):
+            return None
+        
+        strings = b"\x00".join(segments[1::2])
+        if not strings.isascii() and any(space in strings for space in _UNICODE_SPACE_BYTES):
+            return None
+        
+        sanitized = strings.translate(None, _DANGEROUS_BYTES)
+        padded = b" \x00" in sanitized or b"\x00 " in sanitized or sanitized.startswith(b" ") or sanitized.endswith(b" ")
+        if not padded and len(sanitized) == len(strings):
+            return body
+        
+        original = segments[1::2]
+        replaced = sanitized.split(b"\x00")
+        if padded:
+            replaced = [value.strip(b" ") for value in replaced]
+        for position, (before, after) in enumerate(zip(original, replaced)):
+            # Una clave es un string seguido (tras espacios) por ':'
+            if before != after and segments[2 * position + 2].lstrip().startswith(b":"):
+                return None
+        
+        segments[1::2] = replaced
+        return b'"'.join(segments)
     
-    def _sanitize_json_data(self, data):
+    def _sanitize_json_data(self, data, scan_strings: bool = True):
         """Sanitiza datos JSON recursivamente"""
         if isinstance(data, dict):
-            return {key: self._sanitize_json_data(value) for key, value in data.items()}
+            return {key: self._sanitize_json_value(value, scan_strings) for key, value in data.items()}
         elif isinstance(data, list):
-            return [self._sanitize_json_data(item) for item in data]
-        elif isinstance(data, str):
+            return [self._sanitize_json_value(item, scan_strings) for item in data]
+        return self._sanitize_json_value(data, scan_strings)
+    
+    def _sanitize_json_value(self, value, scan_strings: bool):
+        """Sanitiza un valor; los strings en línea para evitar una llamada por hoja"""
+        if type(value) is str:
             # Verificar patrones maliciosos
-            data_lower = data.lower()
-            for pattern in self.blocked_patterns:
-                if pattern in data_lower:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail="Contenido bloqueado por medidas de seguridad"
-                    )
+            if scan_strings and contains_blocked_pattern(value):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Contenido bloqueado por medidas de seguridad"
+                )
             
-            # Sanitizar string
-            return sanitize_string(data)
-        else:
-            return data
+            # Sanitizar string (equivalente a sanitize_string)
+            return value.translate(DANGEROUS_CHARS_TABLE).strip()
+        elif isinstance(value, (dict, list)):
+            return self._sanitize_json_data(value, scan_strings)
+        return value
     
-    def _add_security_headers(self, response: Response, request: Request):
-        """Agrega headers de seguridad a la respuesta"""
-        
-        # Obtener la ruta del request
-        path = request.url.path
+    def _security_headers_for(self, path: str) -> list:
+        """Headers de seguridad precalculados según la ruta"""
+        if path in ["/docs", "/redoc"] or path.startswith("/openapi"):
+            return self._docs_headers
+        return self._default_headers
+    
+    def _build_security_headers(self, docs: bool) -> list:
+        """Construye una vez los headers de seguridad de la respuesta"""
+        headers = {}
         
         # Prevenir clickjacking
-        response.headers["X-Frame-Options"] = "DENY"
+        headers["X-Frame-Options"] = "DENY"
         
         # Prevenir MIME type sniffing
-        response.headers["X-Content-Type-Options"] = "nosniff"
+        headers["X-Content-Type-Options"] = "nosniff"
         
         # Activar XSS protection
-        response.headers["X-XSS-Protection"] = "1; mode=block"
+        headers["X-XSS-Protection"] = "1; mode=block"
         
         # Content Security Policy - Más permisivo para docs de Swagger
-        if path in ["/docs", "/redoc"] or path.startswith("/openapi"):
+        if docs:
             # CSP permisivo para documentación de API
-            response.headers["Content-Security-Policy"] = (
+            headers["Content-Security-Policy"] = (
                 "default-src 'self'; "
                 "script-src 'self' 'unsafe-inline' 'unsafe-eval' https://cdn.jsdelivr.net; "
                 "style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; "
@@ -140,7 +278,7 @@ class SecurityMiddleware(BaseHTTPMiddleware):
             )
         else:
             # CSP estricto para el resto de la aplicación
-            response.headers["Content-Security-Policy"] = (
+            headers["Content-Security-Policy"] = (
                 "default-src 'self'; "
                 "script-src 'self' 'unsafe-inline'; "
                 "style-src 'self' 'unsafe-inline'; "
@@ -151,86 +289,71 @@ class SecurityMiddleware(BaseHTTPMiddleware):
             )
         
         # Forzar HTTPS (en producción)
-        response.headers["Strict-Transport-Security"] = (
+        headers["Strict-Transport-Security"] = (
             "max-age=31536000; includeSubDomains"
         )
         
         # Política de referrer
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+        headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
         
         # Política de permisos
-        response.headers["Permissions-Policy"] = (
+        headers["Permissions-Policy"] = (
             "geolocation=(), microphone=(), camera=(), "
             "payment=(), usb=(), magnetometer=(), gyroscope=()"
         )
+        
+        return [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers.items()]
+
 
+class RateLimitMiddleware:
+    """Middleware ASGI de rate limiting sobre un backend de utils.rate_limiter
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Middleware simple para rate limiting"""
+    Los límites de cada request salen de una RateLimitPolicyTable: presupuesto
+    por usuario/rol/IP, costo por ruta y buckets propios de rutas sensibles.
+    """
     
-    def __init__(self, app, max_requests: int = 100, time_window: int = 60):
-        super().__init__(app)
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_requests: int = 100,
+        time_window: int = 60,
+        limiter = None,
+        policies: Optional[RateLimitPolicyTable] = None
+    ):
+        self.app = app
         self.max_requests = max_requests
         self.time_window = time_window
-        self.request_counts = {}
+        self.limiter = limiter or TokenBucketLimiter(capacity=max_requests, period=time_window)
+        # Sin tabla explícita: un único presupuesto y la documentación exenta
+        self.policies = policies or RateLimitPolicyTable(
+            [{"prefix": path, "exempt": True} for path in ("/docs", "/redoc", "/openapi.json")],
+            default_limit=max_requests,
+            default_window=time_window
+        )
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # No aplicar rate limiting a documentación
-        if request.url.path in ["/docs", "/redoc", "/openapi.json"]:
-            return await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        # Obtener IP del cliente
-        client_ip = request.client.host if request.client else "unknown"
+        request = Request(scope)
+        client_host = request.client.host if request.client else "unknown"
         
-        # Limpiar contadores antiguos
-        current_time = int(time.time())
-        self._cleanup_old_entries(current_time)
+        # Las rutas exentas no decodifican el token
+        route = self.policies.match_route(scope["path"])
+        user_info = None if route is not None and route["exempt"] else get_auth_user_info(request)
         
-        # Verificar límite de rate
-        if self._is_rate_limited(client_ip, current_time):
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail="Demasiadas solicitudes. Intenta de nuevo más tarde."
-            )
+        # Verificar cada bucket que aplica al request
+        for key, cost, capacity, period in self.policies.checks_for(route, user_info, client_host):
+            allowed, retry_after = await self.limiter.acquire(key, cost, capacity, period)
+            if not allowed:
+                response = _error_response(HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Demasiadas solicitudes. Intenta de nuevo más tarde.",
+                    headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+                ))
+                await response(scope, receive, send)
+                return
         
         # Procesar request
-        return await call_next(request)
-    
-    def _is_rate_limited(self, client_ip: str, current_time: int) -> bool:
-        """Verifica si la IP está limitada por rate limiting"""
-        
-        if client_ip not in self.request_counts:
-            self.request_counts[client_ip] = []
-        
-        # Agregar timestamp actual
-        self.request_counts[client_ip].append(current_time)
-        
-        # Filtrar requests en la ventana de tiempo
-        window_start = current_time - self.time_window
-        recent_requests = [
-            timestamp for timestamp in self.request_counts[client_ip]
-            if timestamp > window_start
-        ]
-        
-        # Actualizar contador
-        self.request_counts[client_ip] = recent_requests
-        
-        # Verificar si excede el límite
-        return len(recent_requests) > self.max_requests
-    
-    def _cleanup_old_entries(self, current_time: int):
-        """Limpia entradas antiguas para liberar memoria"""
-        window_start = current_time - self.time_window
-        
-        for ip in list(self.request_counts.keys()):
-            # Filtrar requests recientes
-            recent_requests = [
-                timestamp for timestamp in self.request_counts[ip]
-                if timestamp > window_start
-            ]
-            
-            if recent_requests:
-                self.request_counts[ip] = recent_requests
-            else:
-                # Eliminar IP si no tiene requests recientes
-                del self.request_counts[ip]
\ No newline at end of file
+        await self.app(scope, receive, send)
@@ -1,6 +1,7 @@
 from typing import Optional
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, Request, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Query, status
+from starlette.status import HTTP_400_BAD_REQUEST
 from schemas.account import (
     AccountCreate, AccountUpdate, PaymentRequest, AccountResponse,
     AccountListResponse, AccountSearchFilters
@@ -11,9 +12,12 @@ from models.user import UserRole
 from models.account import AccountStatus
 from utils.security import get_client_ip
 from utils.exceptions import ValidationException, NotFoundException
+from utils.routing import SanitizedJSONRoute
+from utils.serializers import page_json, serialize_account
+from utils.http_cache import etag_matches, document_etag, not_modified, cached_json
 
 
-router = APIRouter(prefix="/accounts", tags=["Accounts"])
+router = APIRouter(prefix="/accounts", tags=["Accounts"], route_class=SanitizedJSONRoute)
 
 
 @router.post("/", response_model=AccountResponse)
@@ -72,6 +76,8 @@ async def create_account(
 async def get_accounts(
     page: int = Query(1, ge=1),
     size: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    estimated: bool = Query(False, description="Total aproximado (más rápido en colecciones grandes)"),
     client_id: Optional[str] = None,
     status: Optional[AccountStatus] = None,
     due_date_from: Optional[datetime] = None,
@@ -80,7 +86,10 @@ async def get_accounts(
     max_amount: Optional[float] = None,
     current_user = Depends(get_current_active_user)
 ):
-    """Obtiene lista de cuentas con paginación y filtros"""
+    """Obtiene lista de cuentas con paginación y filtros
+
+    Para páginas profundas usar `cursor` con el `next_cursor` de la respuesta anterior.
+    """
     try:
         # Los clientes solo pueden ver sus propias cuentas
         if current_user.role == UserRole.CLIENT:
@@ -99,16 +108,25 @@ async def get_accounts(
         result = await account_service.get_accounts(
             page=page,
             size=size,
-            filters=filters
+            filters=filters,
+            cursor=cursor,
+            estimated=estimated
         )
         
-        return AccountListResponse(
-            accounts=result["accounts"],
-            total=result["total"],
-            page=result["page"],
-            size=result["size"]
+        return Response(
+            content=page_json(
+                "accounts", result["accounts"], result["total"], result["total_estimated"],
+                result["page"], result["size"], result["next_cursor"]
+            ),
+            media_type="application/json"
         )
         
+    except ValidationException as e:
+        # Cursor inválido (`status` es un parámetro aquí: se usa la constante importada)
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -120,6 +138,8 @@ async def get_accounts(
 async def get_my_accounts(
     page: int = Query(1, ge=1),
     size: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    estimated: bool = Query(False, description="Total aproximado (más rápido en colecciones grandes)"),
     status: Optional[AccountStatus] = None,
     current_user = Depends(get_current_active_user)
 ):
@@ -135,16 +155,25 @@ async def get_my_accounts(
             str(current_user.id),
             page=page,
             size=size,
-            status=status
+            status=status,
+            cursor=cursor,
+            estimated=estimated
         )
         
-        return AccountListResponse(
-            accounts=result["accounts"],
-            total=result["total"],
-            page=result["page"],
-            size=result["size"]
+        return Response(
+            content=page_json(
+                "accounts", result["accounts"], result["total"], result["total_estimated"],
+                result["page"], result["size"], result["next_cursor"]
+            ),
+            media_type="application/json"
         )
         
+    except ValidationException as e:
+        # Cursor inválido (`status` es un parámetro aquí: se usa la constante importada)
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -152,41 +181,41 @@ async def get_my_accounts(
         )
 
 
+def _check_account_access(current_user, account_doc: dict):
+    """Los clientes solo pueden ver sus propias cuentas"""
+    if current_user.role == UserRole.CLIENT and account_doc["client_id"] != str(current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tienes permisos para ver esta cuenta"
+        )
+
+
 @router.get("/{account_id}", response_model=AccountResponse)
 async def get_account(
+    request: Request,
     account_id: str,
     current_user = Depends(get_current_active_user)
 ):
-    """Obtiene una cuenta por ID"""
+    """Obtiene una cuenta por ID (admite If-None-Match)"""
     try:
-        account = await account_service.get_account_by_id(account_id)
+        if request.headers.get("if-none-match"):
+            # Validar el ETag con una lectura mínima antes de traer la cuenta completa
+            stamp = await account_service.get_account_doc(account_id, {"client_id": 1, "updated_at": 1})
+            _check_account_access(current_user, stamp)
+            etag = document_etag(account_id, stamp["updated_at"])
+            if etag_matches(request, etag):
+                return not_modified(etag, stamp["updated_at"])
         
-        # Los clientes solo pueden ver sus propias cuentas
-        if current_user.role == UserRole.CLIENT and account.client_id != str(current_user.id):
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="No tienes permisos para ver esta cuenta"
-            )
-        
-        return AccountResponse(
-            id=str(account.id),
-            account_number=account.account_number,
-            client_id=account.client_id,
-            client_name=account.client_name,
-            client_email=account.client_email,
-            items=account.items,
-            subtotal=account.subtotal,
-            tax=account.tax,
-            discount=account.discount,
-            total_amount=account.total_amount,
-            status=account.status,
-            due_date=account.due_date,
-            created_at=account.created_at,
-            updated_at=account.updated_at,
-            payments=account.payments,
-            notes=account.notes
+        account_doc = await account_service.get_account_doc(account_id)
+        _check_account_access(current_user, account_doc)
+        return cached_json(
+            serialize_account(account_doc),
+            document_etag(account_id, account_doc["updated_at"]),
+            account_doc["updated_at"]
         )
         
+    except HTTPException:
+        raise
     except NotFoundException as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
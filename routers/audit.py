@@ -0,0 +1,86 @@
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from schemas.audit import AuditLogResponse, AuditLogListResponse, AuditSearchFilters
+from services.audit_service import audit_service
+from middleware.auth_middleware import require_admin
+from models.audit import AuditAction, AuditLevel
+from utils.exceptions import ValidationException
+from utils.routing import SanitizedJSONRoute
+
+
+router = APIRouter(prefix="/audit", tags=["Audit"], route_class=SanitizedJSONRoute)
+
+
+@router.get("/logs", response_model=AuditLogListResponse)
+async def get_audit_logs(
+    page: int = Query(1, ge=1),
+    size: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    estimated: bool = Query(False, description="Total aproximado (más rápido en colecciones grandes)"),
+    user_id: Optional[str] = None,
+    action: Optional[AuditAction] = None,
+    resource: Optional[str] = None,
+    level: Optional[AuditLevel] = None,
+    success: Optional[bool] = None,
+    ip_address: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    current_user = Depends(require_admin)
+):
+    """Obtiene logs de auditoría con filtros (solo administradores)
+
+    Para recorrer rangos grandes usar `cursor` con el `next_cursor` de la respuesta anterior.
+    """
+    try:
+        filters = AuditSearchFilters(
+            user_id=user_id,
+            action=action,
+            resource=resource,
+            level=level,
+            success=success,
+            ip_address=ip_address,
+            date_from=date_from,
+            date_to=date_to
+        )
+
+        result = await audit_service.get_audit_logs(filters, page=page, size=size, cursor=cursor, estimated=estimated)
+
+        logs = [
+            AuditLogResponse(
+                id=str(log["_id"]),
+                user_id=log.get("user_id"),
+                username=log.get("username"),
+                action=log["action"],
+                resource=log["resource"],
+                resource_id=log.get("resource_id"),
+                details=log.get("details") or {},
+                ip_address=log.get("ip_address") or "unknown",
+                user_agent=log.get("user_agent"),
+                timestamp=log["timestamp"],
+                level=log.get("level", AuditLevel.INFO),
+                success=log.get("success", True),
+                error_message=log.get("error_message")
+            )
+            for log in result["logs"]
+        ]
+
+        return AuditLogListResponse(
+            logs=logs,
+            total=result["total"],
+            total_estimated=result["total_estimated"],
+            page=result["page"],
+            size=result["size"],
+            next_cursor=result["next_cursor"]
+        )
+
+    except ValidationException as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor"
+        )
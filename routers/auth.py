@@ -8,12 +8,14 @@ from schemas.auth import (
 from services.auth_service import auth_service
 from services.audit_service import audit_service
 from middleware.auth_middleware import get_current_active_user, security
+from middleware.auth_context import get_token_claims
 from utils.security import get_client_ip
-from utils.exceptions import AuthenticationException, ValidationException
+from utils.exceptions import AuthenticationException, ValidationException, ServiceUnavailableException
+from utils.routing import SanitizedJSONRoute
 from config.settings import settings
 
 
-router = APIRouter(prefix="/auth", tags=["Authentication"])
+router = APIRouter(prefix="/auth", tags=["Authentication"], route_class=SanitizedJSONRoute)
 
 
 @router.post("/login", response_model=LoginResponse)
@@ -42,6 +44,12 @@ async def login(request: Request, login_data: LoginRequest):
             detail=str(e),
             headers={"WWW-Authenticate": "Bearer"}
         )
+    except ServiceUnavailableException as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -69,6 +77,12 @@ async def register(request: Request, register_data: RegisterRequest):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
+    except ServiceUnavailableException as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -84,11 +98,8 @@ async def logout(
 ):
     """Cierra la sesión del usuario"""
     try:
-        from utils.security import verify_token
-        
         ip_address = get_client_ip(request)
-        token = credentials.credentials
-        payload = verify_token(token)
+        payload = get_token_claims(request)
         session_id = payload.get("session_id") if payload else None
         
         if session_id:
@@ -142,6 +153,12 @@ async def change_password(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
+    except ServiceUnavailableException as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
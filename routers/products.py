@@ -1,17 +1,27 @@
+import asyncio
+import json
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Request, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Query, status
+from fastapi.responses import StreamingResponse
+from config.settings import settings
 from schemas.product import (
     ProductCreate, ProductUpdate, ProductResponse, 
-    ProductListResponse, ProductSearchFilters
+    ProductListResponse, ProductSearchFilters,
+    BarcodeLookupRequest, BarcodeLookupResponse, ProductImportResponse,
+    StockBulkUpdateRequest, StockBulkUpdateResponse
 )
 from services.product_service import product_service
+from services.low_stock_feed import low_stock_feed, format_sse
 from middleware.auth_middleware import require_admin, get_current_active_user
 from models.product import ProductStatus, ProductCategory
 from utils.security import get_client_ip
 from utils.exceptions import ValidationException, NotFoundException
+from utils.routing import SanitizedJSONRoute
+from utils.serializers import page_json
+from utils.http_cache import etag_matches, document_etag, not_modified, cached_json
 
 
-router = APIRouter(prefix="/products", tags=["Products"])
+router = APIRouter(prefix="/products", tags=["Products"], route_class=SanitizedJSONRoute)
 
 
 @router.post("/", response_model=ProductResponse)
@@ -62,6 +72,8 @@ async def create_product(
 async def get_products(
     page: int = Query(1, ge=1),
     size: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    estimated: bool = Query(False, description="Total aproximado (más rápido en colecciones grandes)"),
     name: Optional[str] = None,
     category: Optional[ProductCategory] = None,
     brand: Optional[str] = None,
@@ -70,7 +82,10 @@ async def get_products(
     max_price: Optional[float] = None,
     current_user = Depends(get_current_active_user)
 ):
-    """Obtiene lista de productos con paginación y filtros"""
+    """Obtiene lista de productos con paginación y filtros
+
+    Para páginas profundas usar `cursor` con el `next_cursor` de la respuesta anterior.
+    """
     try:
         # Crear filtros
         filters = ProductSearchFilters(
@@ -85,16 +100,24 @@ async def get_products(
         result = await product_service.get_products(
             page=page,
             size=size,
-            filters=filters
+            filters=filters,
+            cursor=cursor,
+            estimated=estimated
         )
         
-        return ProductListResponse(
-            products=result["products"],
-            total=result["total"],
-            page=result["page"],
-            size=result["size"]
+        return Response(
+            content=page_json(
+                "products", result["products"], result["total"], result["total_estimated"],
+                result["page"], result["size"], result["next_cursor"]
+            ),
+            media_type="application/json"
         )
         
+    except ValidationException as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         print(f"Error en get_products: {e}")
         import traceback
@@ -106,11 +129,14 @@ async def get_products(
 
 
 @router.get("/active", response_model=list[ProductResponse])
-async def get_active_products(current_user = Depends(get_current_active_user)):
-    """Obtiene todos los productos activos"""
+async def get_active_products(request: Request, current_user = Depends(get_current_active_user)):
+    """Obtiene todos los productos activos (admite If-None-Match)"""
     try:
-        products = await product_service.get_active_products()
-        return products
+        # JSON pre-serializado por la caché del catálogo
+        content, etag, changed_at = await product_service.get_active_products_tagged()
+        if etag_matches(request, etag):
+            return not_modified(etag, changed_at)
+        return cached_json(content, etag, changed_at)
         
     except Exception as e:
         print(f"Error en get_active_products: {e}")
@@ -120,29 +146,215 @@ async def get_active_products(current_user = Depends(get_current_active_user)):
         )
 
 
+@router.get("/low-stock", response_model=list[ProductResponse])
+async def get_low_stock_products(current_user = Depends(require_admin)):
+    """Productos con stock en o por debajo del mínimo (solo administradores)"""
+    try:
+        return Response(
+            content=await product_service.get_low_stock_products_json(),
+            media_type="application/json"
+        )
+        
+    except Exception as e:
+        print(f"Error en get_low_stock_products: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor"
+        )
+
+
+@router.get("/low-stock/stream")
+async def stream_low_stock(request: Request, current_user = Depends(require_admin)):
+    """Stream server-sent events con los cruces del umbral de stock (solo administradores)
+
+    Envía primero un evento `snapshot` con la lista actual y luego `low_stock`
+    o `restocked` por cada producto que cruza el mínimo.
+    """
+    queue = low_stock_feed.subscribe()
+    try:
+        snapshot = await product_service.get_low_stock_products_json()
+    except Exception as e:
+        low_stock_feed.unsubscribe(queue)
+        print(f"Error en stream_low_stock: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor"
+        )
+    
+    async def events():
+        try:
+            yield format_sse("snapshot", snapshot)
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=settings.low_stock_heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    # Comentario SSE: mantiene viva la conexión a través de proxies
+                    yield b": keep-alive\n\n"
+        finally:
+            low_stock_feed.unsubscribe(queue)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/search", response_model=list[ProductResponse])
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=100, description="Texto a buscar en nombre y marca"),
+    limit: int = Query(20, ge=1, le=100),
+    include_inactive: bool = Query(False),
+    current_user = Depends(get_current_active_user)
+):
+    """Busca productos por nombre y marca ordenados por relevancia"""
+    try:
+        return Response(
+            content=await product_service.search_products_json(q, limit=limit, include_inactive=include_inactive),
+            media_type="application/json"
+        )
+        
+    except Exception as e:
+        print(f"Error en search_products: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor"
+        )
+
+
+@router.get("/by-barcode/{code}", response_model=ProductResponse)
+async def get_product_by_barcode(
+    code: str,
+    current_user = Depends(get_current_active_user)
+):
+    """Obtiene un producto por código de barras (escaneo en caja)"""
+    try:
+        return Response(
+            content=await product_service.get_product_by_barcode_json(code),
+            media_type="application/json"
+        )
+        
+    except NotFoundException as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except Exception as e:
+        print(f"Error en get_product_by_barcode: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor"
+        )
+
+
+@router.post("/by-barcodes", response_model=BarcodeLookupResponse)
+async def get_products_by_barcodes(
+    lookup: BarcodeLookupRequest,
+    current_user = Depends(get_current_active_user)
+):
+    """Obtiene varios productos por código de barras en una sola llamada"""
+    try:
+        found, not_found = await product_service.get_products_by_barcodes_json(lookup.barcodes)
+        content = (
+            b'{"products":[' + b",".join(found) + b'],"not_found":'
+            + json.dumps(not_found, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            + b"}"
+        )
+        return Response(content=content, media_type="application/json")
+        
+    except Exception as e:
+        print(f"Error en get_products_by_barcodes: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor"
+        )
+
+
+@router.post("/import", response_model=ProductImportResponse)
+async def import_products(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$", description="csv o ndjson; por defecto según Content-Type"),
+    current_user = Depends(require_admin)
+):
+    """Importa productos desde un archivo CSV o NDJSON enviado como body (solo administradores)
+
+    El archivo se procesa como stream en lotes; las filas inválidas o con código
+    de barras repetido se reportan sin abortar la importación.
+    """
+    file_format = format
+    if file_format is None:
+        content_type = request.headers.get("content-type", "").lower()
+        if "csv" in content_type:
+            file_format = "csv"
+        elif "ndjson" in content_type or "jsonl" in content_type:
+            file_format = "ndjson"
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail="Use Content-Type text/csv o application/x-ndjson, o el parámetro format"
+            )
+    
+    try:
+        return await product_service.import_products(
+            request.stream(),
+            file_format,
+            imported_by_id=str(current_user.id),
+            ip_address=get_client_ip(request)
+        )
+        
+    except Exception as e:
+        print(f"Error en import_products: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor"
+        )
+
+
+@router.patch("/stock/bulk", response_model=StockBulkUpdateResponse)
+async def bulk_update_stock(
+    request: Request,
+    adjustments: StockBulkUpdateRequest,
+    current_user = Depends(require_admin)
+):
+    """Aplica muchos ajustes de stock en una sola operación (solo administradores)
+
+    Los ajustes que dejarían el stock negativo o apuntan a productos
+    inexistentes se informan por ítem sin afectar al resto.
+    """
+    try:
+        return await product_service.bulk_update_stock(
+            [item.dict() for item in adjustments.items],
+            str(current_user.id),
+            get_client_ip(request)
+        )
+        
+    except Exception as e:
+        print(f"Error en bulk_update_stock: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor"
+        )
+
+
 @router.get("/{product_id}", response_model=ProductResponse)
 async def get_product(
+    request: Request,
     product_id: str,
     current_user = Depends(get_current_active_user)
 ):
-    """Obtiene un producto por ID"""
+    """Obtiene un producto por ID (admite If-None-Match)"""
     try:
-        product = await product_service.get_product_by_id(product_id)
+        if request.headers.get("if-none-match"):
+            # Validar el ETag con una lectura mínima antes de traer el producto completo
+            updated_at = await product_service.get_product_updated_at(product_id)
+            etag = document_etag(product_id, updated_at)
+            if etag_matches(request, etag):
+                return not_modified(etag, updated_at)
         
-        return ProductResponse(
-            id=str(product.id),
-            name=product.name,
-            description=product.description,
-            price=product.price,
-            category=product.category,
-            brand=product.brand,
-            barcode=product.barcode,
-            stock=product.stock,
-            min_stock=product.min_stock,
-            status=product.status,
-            created_at=product.created_at,
-            updated_at=product.updated_at
-        )
+        content, updated_at = await product_service.get_product_json(product_id)
+        return cached_json(content, document_etag(product_id, updated_at), updated_at)
         
     except NotFoundException as e:
         raise HTTPException(
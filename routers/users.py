@@ -1,14 +1,16 @@
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, Request, Query, status
+from starlette.status import HTTP_400_BAD_REQUEST
 from schemas.user import UserCreate, UserUpdate, UserResponse, UserListResponse
 from services.user_service import user_service
 from middleware.auth_middleware import require_admin, get_current_active_user
 from models.user import UserRole, UserStatus
 from utils.security import get_client_ip
-from utils.exceptions import ValidationException, NotFoundException
+from utils.exceptions import ValidationException, NotFoundException, ServiceUnavailableException
+from utils.routing import SanitizedJSONRoute
 
 
-router = APIRouter(prefix="/users", tags=["Users"])
+router = APIRouter(prefix="/users", tags=["Users"], route_class=SanitizedJSONRoute)
 
 
 @router.post("/", response_model=UserResponse)
@@ -45,6 +47,12 @@ async def create_user(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
+    except ServiceUnavailableException as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -56,28 +64,43 @@ async def create_user(
 async def get_users(
     page: int = Query(1, ge=1),
     size: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    estimated: bool = Query(False, description="Total aproximado (más rápido en colecciones grandes)"),
     role: Optional[UserRole] = None,
     status: Optional[UserStatus] = None,
     search: Optional[str] = None,
     current_user = Depends(require_admin)
 ):
-    """Obtiene lista de usuarios con paginación y filtros (solo administradores)"""
+    """Obtiene lista de usuarios con paginación y filtros (solo administradores)
+
+    Para páginas profundas usar `cursor` con el `next_cursor` de la respuesta anterior.
+    """
     try:
         result = await user_service.get_users(
             page=page,
             size=size,
             role=role,
             status=status,
-            search=search
+            search=search,
+            cursor=cursor,
+            estimated=estimated
         )
         
         return UserListResponse(
             users=result["users"],
             total=result["total"],
+            total_estimated=result["total_estimated"],
             page=result["page"],
-            size=result["size"]
+            size=result["size"],
+            next_cursor=result["next_cursor"]
         )
         
+    except ValidationException as e:
+        # Cursor inválido (`status` es un parámetro aquí: se usa la constante importada)
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
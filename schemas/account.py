@@ -55,8 +55,10 @@ class AccountResponse(BaseModel):
 class AccountListResponse(BaseModel):
     accounts: List[AccountResponse]
     total: int
+    total_estimated: bool = False
     page: int
     size: int
+    next_cursor: Optional[str] = None
 
 
 class AccountSearchFilters(BaseModel):
@@ -23,8 +23,10 @@ class AuditLogResponse(BaseModel):
 class AuditLogListResponse(BaseModel):
     logs: List[AuditLogResponse]
     total: int
+    total_estimated: bool = False
     page: int
     size: int
+    next_cursor: Optional[str] = None
 
 
 class SessionLogResponse(BaseModel):
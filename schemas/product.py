@@ -45,8 +45,56 @@ class ProductResponse(BaseModel):
 class ProductListResponse(BaseModel):
     products: list[ProductResponse]
     total: int
+    total_estimated: bool = False
     page: int
     size: int
+    next_cursor: Optional[str] = None
+
+
+class BarcodeLookupRequest(BaseModel):
+    barcodes: list[str] = Field(..., min_length=1, max_length=500)
+
+
+class BarcodeLookupResponse(BaseModel):
+    products: list[ProductResponse]
+    not_found: list[str]
+
+
+class ProductImportError(BaseModel):
+    row: int
+    barcode: Optional[str] = None
+    error: str
+
+
+class ProductImportResponse(BaseModel):
+    total_rows: int
+    inserted: int
+    failed: int
+    errors: list[ProductImportError]
+    errors_truncated: bool = False
+
+
+class StockAdjustment(BaseModel):
+    product_id: str
+    delta: int
+
+
+class StockBulkUpdateRequest(BaseModel):
+    items: list[StockAdjustment] = Field(..., min_length=1, max_length=1000)
+
+
+class StockAdjustmentResult(BaseModel):
+    product_id: str
+    delta: int
+    success: bool
+    new_stock: Optional[int] = None
+    error: Optional[str] = None
+
+
+class StockBulkUpdateResponse(BaseModel):
+    updated: int
+    failed: int
+    results: list[StockAdjustmentResult]
 
 
 class ProductSearchFilters(BaseModel):
@@ -40,5 +40,7 @@ class UserResponse(BaseModel):
 class UserListResponse(BaseModel):
     users: list[UserResponse]
     total: int
+    total_estimated: bool = False
     page: int
-    size: int
\ No newline at end of file
+    size: int
+    next_cursor: Optional[str] = None
\ No newline at end of file
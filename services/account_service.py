@@ -1,3 +1,4 @@
+import asyncio
 import uuid
 from datetime import datetime
 from typing import List, Optional, Dict, Any
@@ -6,9 +7,13 @@ from bson import ObjectId
 from models.account import Account, AccountStatus, PaymentMethod, AccountItem, PaymentRecord
 from models.user import User
 from models.product import Product
-from schemas.account import AccountCreate, AccountUpdate, PaymentRequest, AccountResponse, AccountSearchFilters
+from schemas.account import AccountCreate, AccountUpdate, PaymentRequest, AccountSearchFilters
 from utils.validators import validate_positive_number
 from utils.exceptions import ValidationException, NotFoundException
+from utils.pagination import apply_keyset, keyset_sort, next_cursor
+from utils.count_cache import count_cache
+from utils.collection_versions import collection_versions
+from utils.serializers import serialize_account
 
 
 class AccountService:
@@ -20,6 +25,12 @@ class AccountService:
         from config.database import get_database
         return await get_database()
     
+    async def ensure_indexes(self):
+        """Crea los índices de paginación por fecha de creación"""
+        db: AsyncIOMotorDatabase = await self.get_database()
+        await db[self.collection].create_index([("created_at", -1), ("_id", -1)])
+        await db[self.collection].create_index([("client_id", 1), ("created_at", -1), ("_id", -1)])
+    
     async def get_audit_service(self):
         """Obtiene el servicio de auditoría - importación diferida"""
         from services.audit_service import audit_service
@@ -35,6 +46,45 @@ class AccountService:
         from services.product_service import product_service
         return product_service
     
+    async def get_reservation_service(self):
+        """Obtiene el servicio de reservas de stock - importación diferida"""
+        from services.stock_reservation_service import stock_reservation_service
+        return stock_reservation_service
+    
+    async def _build_items(self, items_data) -> tuple:
+        """Valida y precia los items con una sola consulta de productos"""
+        product_service = await self.get_product_service()
+        
+        for item_data in items_data:
+            validate_positive_number(item_data.quantity, "quantity")
+        products = await product_service.get_products_by_ids([item_data.product_id for item_data in items_data])
+        
+        items = []
+        subtotal = 0.0
+        for item_data in items_data:
+            product = products[item_data.product_id]
+            
+            # Calcular precio total del item
+            total_price = product.price * item_data.quantity
+            subtotal += total_price
+            
+            items.append(AccountItem(
+                product_id=str(product.id),
+                product_name=product.name,
+                quantity=item_data.quantity,
+                unit_price=product.price,
+                total_price=total_price
+            ))
+        return items, subtotal
+    
+    @staticmethod
+    def _reservation_items(items: List[AccountItem]) -> List[tuple]:
+        return [(item.product_id, item.quantity) for item in items]
+    
+    @staticmethod
+    def _product_names(items: List[AccountItem]) -> Dict[str, str]:
+        return {item.product_id: item.product_name for item in items}
+    
     def _generate_account_number(self) -> str:
         """Genera un número único de cuenta"""
         timestamp = datetime.now().strftime("%Y%m%d")
@@ -51,35 +101,12 @@ class AccountService:
         db: AsyncIOMotorDatabase = await self.get_database()
         audit_service = await self.get_audit_service()
         user_service = await self.get_user_service()
-        product_service = await self.get_product_service()
         
         # Validar que el cliente existe
         client = await user_service.get_user_by_id(account_data.client_id)
         
         # Validar y procesar items
-        items = []
-        subtotal = 0.0
-        
-        for item_data in account_data.items:
-            # Obtener producto
-            product = await product_service.get_product_by_id(item_data.product_id)
-            
-            # Validar cantidad
-            validate_positive_number(item_data.quantity, "quantity")
-            
-            # Calcular precio total del item
-            total_price = product.price * item_data.quantity
-            subtotal += total_price
-            
-            # Crear item de cuenta
-            account_item = AccountItem(
-                product_id=str(product.id),
-                product_name=product.name,
-                quantity=item_data.quantity,
-                unit_price=product.price,
-                total_price=total_price
-            )
-            items.append(account_item)
+        items, subtotal = await self._build_items(account_data.items)
         
         # Calcular totales
         tax_amount = subtotal * (account_data.tax / 100) if account_data.tax > 0 else 0.0
@@ -102,10 +129,21 @@ class AccountService:
             notes=account_data.notes
         )
         
+        # Reservar el stock de todos los items antes de crear la cuenta
+        account_id = ObjectId()
+        reservation_service = await self.get_reservation_service()
+        await reservation_service.reserve(str(account_id), self._reservation_items(items), self._product_names(items))
+        
         # Insertar en base de datos
         account_doc = account.dict(by_alias=True, exclude={"id"})
-        result = await db[self.collection].insert_one(account_doc)
-        account.id = str(result.inserted_id)
+        account_doc["_id"] = account_id
+        try:
+            await db[self.collection].insert_one(account_doc)
+        except Exception:
+            await reservation_service.release(str(account_id), reason="create_failed")
+            raise
+        account.id = str(account_id)
+        collection_versions.bump(self.collection)
         
         # Log de auditoría
         await audit_service.log_action(
@@ -129,16 +167,24 @@ class AccountService:
     
     async def get_account_by_id(self, account_id: str) -> Account:
         """Obtiene una cuenta por ID"""
+        return Account(**await self.get_account_doc(account_id))
+    
+    async def get_account_doc(self, account_id: str, projection: Optional[Dict[str, int]] = None) -> dict:
+        """Documento de la cuenta tal como está en MongoDB
+
+        Con `projection` (ej. client_id y updated_at) sirve para validar un
+        ETag sin traer ni serializar la cuenta completa.
+        """
         db: AsyncIOMotorDatabase = await self.get_database()
         
         if not ObjectId.is_valid(account_id):
             raise ValidationException("ID de cuenta inválido")
         
-        account_doc = await db[self.collection].find_one({"_id": ObjectId(account_id)})
+        account_doc = await db[self.collection].find_one({"_id": ObjectId(account_id)}, projection)
         if not account_doc:
             raise NotFoundException("Cuenta no encontrada")
         
-        return Account(**account_doc)
+        return account_doc
     
     async def update_account(
         self,
@@ -150,7 +196,6 @@ class AccountService:
         """Actualiza una cuenta"""
         db: AsyncIOMotorDatabase = await self.get_database()
         audit_service = await self.get_audit_service()
-        product_service = await self.get_product_service()
         
         if not ObjectId.is_valid(account_id):
             raise ValidationException("ID de cuenta inválido")
@@ -172,29 +217,7 @@ class AccountService:
         
         # Actualizar items si se proporcionan
         if account_data.items is not None:
-            items = []
-            subtotal = 0.0
-            
-            for item_data in account_data.items:
-                # Obtener producto
-                product = await product_service.get_product_by_id(item_data.product_id)
-                
-                # Validar cantidad
-                validate_positive_number(item_data.quantity, "quantity")
-                
-                # Calcular precio total del item
-                total_price = product.price * item_data.quantity
-                subtotal += total_price
-                
-                # Crear item de cuenta
-                account_item = AccountItem(
-                    product_id=str(product.id),
-                    product_name=product.name,
-                    quantity=item_data.quantity,
-                    unit_price=product.price,
-                    total_price=total_price
-                )
-                items.append(account_item)
+            items, subtotal = await self._build_items(account_data.items)
             
             # Recalcular totales
             tax_rate = account_data.tax if account_data.tax is not None else (account.tax / account.subtotal * 100 if account.subtotal > 0 else 0)
@@ -232,11 +255,23 @@ class AccountService:
         
         update_data["updated_at"] = datetime.utcnow()
         
+        # Ajustar la reserva de stock a los nuevos items
+        reservation_service = await self.get_reservation_service()
+        reserved_items = self._reservation_items(items if account_data.items is not None else account.items)
+        if account_data.items is not None and account_data.status != AccountStatus.CANCELLED:
+            await reservation_service.replace(account_id, reserved_items, self._product_names(items))
+        
         # Actualizar en base de datos
         await db[self.collection].update_one(
             {"_id": ObjectId(account_id)},
             {"$set": update_data}
         )
+        collection_versions.bump(self.collection)
+        
+        if account_data.status == AccountStatus.CANCELLED:
+            await reservation_service.release(account_id, reason="cancelled")
+        elif account_data.status == AccountStatus.PAID:
+            await reservation_service.consume(account_id, reserved_items)
         
         # Log de auditoría
         await audit_service.log_action(
@@ -312,6 +347,17 @@ class AccountService:
                 }
             }
         )
+        collection_versions.bump(self.collection)
+        
+        # Pago completo: la reserva pasa a ser un descuento definitivo de stock
+        reservation_service = await self.get_reservation_service()
+        stock_shortfall = []
+        if new_status == AccountStatus.PAID:
+            stock_shortfall = await reservation_service.consume(account_id, self._reservation_items(account.items))
+            if stock_shortfall:
+                print(f"Cuenta {account.account_number} pagada sin stock suficiente para: {stock_shortfall}")
+        else:
+            await reservation_service.extend(account_id)
         
         # Log de auditoría
         await audit_service.log_action(
@@ -329,6 +375,7 @@ class AccountService:
                 "total_paid": new_total_paid,
                 "remaining_amount": account.total_amount - new_total_paid,
                 "new_status": new_status,
+                "stock_shortfall": stock_shortfall,
                 "processed_by": processed_by_id
             },
             ip_address=ip_address
@@ -342,9 +389,15 @@ class AccountService:
         page: int = 1,
         size: int = 50,
         filters: Optional[AccountSearchFilters] = None,
-        client_id: Optional[str] = None  # Para filtrar por cliente específico
+        client_id: Optional[str] = None,  # Para filtrar por cliente específico
+        cursor: Optional[str] = None,
+        estimated: bool = False
     ) -> Dict[str, Any]:
-        """Obtiene lista de cuentas con paginación y filtros"""
+        """Obtiene lista de cuentas con paginación y filtros
+
+        Con `cursor` continúa después de la última cuenta de la página anterior
+        sin recorrer los documentos saltados. Con `estimated` el total es aproximado.
+        """
         db: AsyncIOMotorDatabase = await self.get_database()
         
         # Construir query
@@ -377,42 +430,23 @@ class AccountService:
                     amount_query["$lte"] = filters.max_amount
                 query["total_amount"] = amount_query
         
-        # Contar total
-        total = await db[self.collection].count_documents(query)
-        
-        # Obtener cuentas paginadas
-        skip = (page - 1) * size
-        cursor = db[self.collection].find(query).sort("created_at", -1).skip(skip).limit(size)
-        accounts_docs = await cursor.to_list(length=size)
-        
-        # Convertir a response
-        accounts = []
-        for account_doc in accounts_docs:
-            account = Account(**account_doc)
-            accounts.append(AccountResponse(
-                id=str(account.id),
-                account_number=account.account_number,
-                client_id=account.client_id,
-                client_name=account.client_name,
-                client_email=account.client_email,
-                items=account.items,
-                subtotal=account.subtotal,
-                tax=account.tax,
-                discount=account.discount,
-                total_amount=account.total_amount,
-                status=account.status,
-                due_date=account.due_date,
-                created_at=account.created_at,
-                updated_at=account.updated_at,
-                payments=account.payments,
-                notes=account.notes
-            ))
+        # Obtener cuentas paginadas y el total (en caché) en paralelo
+        results = db[self.collection].find(apply_keyset(query, "created_at", cursor)).sort(keyset_sort("created_at"))
+        if not cursor:
+            results = results.skip((page - 1) * size)
+        (total, total_estimated), accounts_docs = await asyncio.gather(
+            count_cache.count(db[self.collection], query, estimated=estimated),
+            results.limit(size).to_list(length=size)
+        )
         
+        # Documentos de confianza: directo a JSON (forma de AccountResponse) sin modelos intermedios
         return {
-            "accounts": accounts,
+            "accounts": [serialize_account(account_doc) for account_doc in accounts_docs],
             "total": total,
+            "total_estimated": total_estimated,
             "page": page,
-            "size": size
+            "size": size,
+            "next_cursor": next_cursor(accounts_docs, "created_at", size)
         }
     
     async def get_client_accounts(
@@ -420,7 +454,9 @@ class AccountService:
         client_id: str,
         page: int = 1,
         size: int = 50,
-        status: Optional[AccountStatus] = None
+        status: Optional[AccountStatus] = None,
+        cursor: Optional[str] = None,
+        estimated: bool = False
     ) -> Dict[str, Any]:
         """Obtiene las cuentas de un cliente específico"""
         user_service = await self.get_user_service()
@@ -432,7 +468,7 @@ class AccountService:
         from schemas.account import AccountSearchFilters
         filters = AccountSearchFilters(client_id=client_id, status=status)
         
-        return await self.get_accounts(page, size, filters, client_id)
+        return await self.get_accounts(page, size, filters, client_id, cursor=cursor, estimated=estimated)
     
     async def delete_account(
         self,
@@ -467,6 +503,11 @@ class AccountService:
                 }
             }
         )
+        collection_versions.bump(self.collection)
+        
+        # Devolver el stock reservado
+        reservation_service = await self.get_reservation_service()
+        await reservation_service.release(account_id, reason="cancelled")
         
         # Log de auditoría
         await audit_service.log_action(
@@ -572,6 +613,8 @@ class AccountService:
                 }
             }
         )
+        if result.modified_count > 0:
+            collection_versions.bump(self.collection)
         
         # Log de auditoría si se actualizaron cuentas
         if result.modified_count > 0:
@@ -1,26 +1,93 @@
+import asyncio
 import uuid
 from datetime import datetime
 from typing import Optional, Dict, Any, List
 import os
+from motor.motor_asyncio import AsyncIOMotorDatabase
 
 # Asegúrate de que estas importaciones sean correctas para tu modelo
 from models.audit import AuditLog, SessionLog, AuditAction, AuditLevel  # Importar correctamente AuditLevel
 from schemas.audit import AuditSearchFilters
+from services.session_tracker import session_tracker
+from services.audit_writer import audit_writer
+from utils.audit_context import get_audit_context
+from utils.exceptions import ValidationException
+from utils.pagination import apply_keyset, keyset_sort, next_cursor
+from utils.count_cache import count_cache
 
 
 class AuditService:
     def __init__(self):
-        self.audit_log_file = "audit_log.txt"  # Archivo para guardar los logs
+        self.audit_log_dir = audit_writer.store.directory  # Segmentos del log de auditoría
+        self.audit_collection = audit_writer.collection or "audit_logs"
         self.session_collection = "session_logs"
 
-    def log_to_file(self, log_message: str):
-        """Función que guarda el mensaje en un archivo de texto"""
+    async def get_database(self):
+        """Obtiene la base de datos - importación diferida para evitar circular imports"""
+        from config.database import get_database
+        return await get_database()
+
+    async def ensure_indexes(self):
+        """Crea los índices compuestos de la colección de auditoría"""
+        db: AsyncIOMotorDatabase = await self.get_database()
+        if db is None:
+            return
+
+        collection = db[self.audit_collection]
+        # _id al final permite ordenar y paginar por (timestamp, _id) desde el índice
+        await collection.create_index([("timestamp", -1), ("_id", -1)])
+        await collection.create_index([("user_id", 1), ("timestamp", -1), ("_id", -1)])
+        await collection.create_index([("resource", 1), ("action", 1), ("timestamp", -1), ("_id", -1)])
+        await collection.create_index([("ip_address", 1), ("timestamp", -1), ("_id", -1)])
+
+    async def log_to_file(self, record: Dict[str, Any]):
+        """Encola el registro para el escritor en segundo plano (segmentos y MongoDB)"""
         try:
-            with open(self.audit_log_file, "a") as file:
-                file.write(log_message + "\n")
+            await audit_writer.write(record)
         except Exception as e:
             print(f"Error escribiendo el log en archivo: {e}")
 
+    def build_record(
+            self,
+            user_id: Optional[str],
+            username: Optional[str],
+            action: AuditAction,
+            resource: str,
+            resource_id: Optional[str] = None,
+            details: Dict[str, Any] = None,
+            ip_address: str = "unknown",
+            user_agent: Optional[str] = None,
+            level: AuditLevel = AuditLevel.INFO,
+            success: bool = True,
+            error_message: Optional[str] = None,
+            session_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Arma un registro de auditoría"""
+        return {
+            "timestamp": datetime.utcnow().isoformat(),
+            "action": action,
+            "user_id": user_id,
+            "username": username,
+            "resource": resource,
+            "resource_id": resource_id,
+            "success": success,
+            "level": level,
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+            "session_id": session_id,
+            "details": details or {},
+            "error_message": error_message
+        }
+
+    async def _emit(self, record: Dict[str, Any]):
+        """Adjunta el registro al request en curso o lo escribe si no hay uno"""
+        context = get_audit_context()
+        if context is not None:
+            # AuditMiddleware emite un único registro combinado al terminar el request
+            context.add(record)
+        else:
+            await self.log_to_file(record)
+
     async def log_action(
             self,
             user_id: Optional[str],
@@ -36,17 +103,23 @@ class AuditService:
             error_message: Optional[str] = None,
             session_id: Optional[str] = None
     ):
-        print("Entro al log de auditoria")
         """Registra una acción en el log de auditoría"""
         try:
-            log_message = f"{datetime.utcnow()} - ACTION: {action} - USER: {username} - RESOURCE: {resource} - " \
-                          f"RESOURCE_ID: {resource_id} - SUCCESS: {success} - IP: {ip_address} - SESSION_ID: {session_id} - " \
-                          f"DETAILS: {details or {} } - ERROR: {error_message if error_message else 'None'}"
-
-            # Log en archivo de texto
-            self.log_to_file(log_message)
-
-            print("Log registrado en archivo:", log_message)
+            record = self.build_record(
+                user_id=user_id,
+                username=username,
+                action=action,
+                resource=resource,
+                resource_id=resource_id,
+                details=details,
+                ip_address=ip_address,
+                user_agent=user_agent,
+                level=level,
+                success=success,
+                error_message=error_message,
+                session_id=session_id
+            )
+            await self._emit(record)
 
         except Exception as e:
             print(f"Error en auditoría: {e}")
@@ -92,40 +165,52 @@ class AuditService:
     ):
         """Registra logout y cierra sesión"""
         try:
-            log_message = f"{datetime.utcnow()} - LOGOUT - USER: {username} - SESSION_ID: {session_id} - IP: {ip_address}"
-
-            # Log en archivo de texto
-            self.log_to_file(log_message)
-
-            print("Log de logout registrado:", log_message)
+            record = self.build_record(
+                user_id=user_id,
+                username=username,
+                action=AuditAction.LOGOUT,
+                resource="auth",
+                ip_address=ip_address,
+                session_id=session_id
+            )
+            await self._emit(record)
 
         except Exception as e:
             print(f"Error en log_logout: {e}")
 
     async def update_session_activity(self, session_id: str):
-        """Actualiza la última actividad de la sesión"""
+        """Actualiza la última actividad de la sesión (se persiste en lotes)"""
         try:
-            db: AsyncIOMotorDatabase = await self.get_database()
-
-            if db is None:
-                print("Error: Database is None in audit_service.update_session_activity")
-                return
-
-            await db[self.session_collection].update_one(
-                {"session_id": session_id, "is_active": True},
-                {"$set": {"last_activity": datetime.utcnow()}}
-            )
-
+            session_tracker.touch(session_id)
         except Exception as e:
             print(f"Error actualizando actividad de sesión: {e}")
 
+    async def search_file_logs(
+            self,
+            date_from: Optional[datetime] = None,
+            date_to: Optional[datetime] = None,
+            limit: int = 1000
+    ) -> List[Dict[str, Any]]:
+        """Busca registros en los segmentos de archivo dentro de una ventana de tiempo"""
+        try:
+            return await asyncio.to_thread(audit_writer.store.query, date_from, date_to, limit)
+        except Exception as e:
+            print(f"Error consultando segmentos de auditoría: {e}")
+            return []
+
     async def get_audit_logs(
             self,
             filters: AuditSearchFilters,
             page: int = 1,
-            size: int = 50
+            size: int = 50,
+            cursor: Optional[str] = None,
+            estimated: bool = False
     ) -> Dict[str, Any]:
-        """Obtiene logs de auditoría con filtros"""
+        """Obtiene logs de auditoría con filtros
+
+        Con `cursor` continúa después del último registro de la página anterior
+        sin recorrer los documentos saltados. Con `estimated` el total es aproximado.
+        """
         try:
             db: AsyncIOMotorDatabase = await self.get_database()
 
@@ -134,8 +219,10 @@ class AuditService:
                 return {
                     "logs": [],
                     "total": 0,
+                    "total_estimated": False,
                     "page": page,
-                    "size": size
+                    "size": size,
+                    "next_cursor": None
                 }
 
             # Construir query
@@ -162,28 +249,36 @@ class AuditService:
                     date_query["$lte"] = filters.date_to
                 query["timestamp"] = date_query
 
-            # Contar total
-            total = await db[self.audit_collection].count_documents(query)
-
-            # Obtener logs paginados
-            skip = (page - 1) * size
-            cursor = db[self.audit_collection].find(query).sort("timestamp", -1).skip(skip).limit(size)
-            logs = await cursor.to_list(length=size)
+            # Obtener logs paginados y el total (en caché) en paralelo
+            find_query = apply_keyset(query, "timestamp", cursor)
+            results = db[self.audit_collection].find(find_query).sort(keyset_sort("timestamp"))
+            if not cursor:
+                results = results.skip((page - 1) * size)
+            (total, total_estimated), logs = await asyncio.gather(
+                count_cache.count(db[self.audit_collection], query, estimated=estimated),
+                results.limit(size).to_list(length=size)
+            )
 
             return {
                 "logs": logs,
                 "total": total,
+                "total_estimated": total_estimated,
                 "page": page,
-                "size": size
+                "size": size,
+                "next_cursor": next_cursor(logs, "timestamp", size)
             }
 
+        except ValidationException:
+            raise
         except Exception as e:
             print(f"Error obteniendo audit logs: {e}")
             return {
                 "logs": [],
                 "total": 0,
+                "total_estimated": False,
                 "page": page,
-                "size": size
+                "size": size,
+                "next_cursor": None
             }
 
     async def get_active_sessions(self, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
@@ -0,0 +1,368 @@
+import gzip
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+
+class AuditSegmentStore:
+    """Almacén de auditoría en segmentos JSON-lines rotados, comprimidos e indexados
+
+    Cada segmento cerrado se guarda como `<nombre>.jsonl.gz` compuesto por un
+    miembro gzip independiente por bloque de registros, junto a un índice
+    `<nombre>.idx.json` que mapea el timestamp inicial de cada bloque a su
+    offset comprimido. Una consulta por ventana de tiempo solo abre los
+    segmentos que se solapan con ella y salta directamente al bloque inicial.
+
+    El escritor y las consultas corren en hilos distintos: el estado del
+    segmento actual se protege con un lock y las consultas leen los archivos
+    sobre una copia tomada bajo él.
+    """
+
+    MANIFEST_FILE = "manifest.json"
+
+    def __init__(
+        self,
+        directory: str = "audit_logs",
+        max_segment_bytes: int = 64 * 1024 * 1024,
+        rotate_hourly: bool = True,
+        index_every: int = 256,
+        compress: bool = True
+    ):
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.rotate_hourly = rotate_hourly
+        self.index_every = index_every
+        self.compress = compress
+
+        self._file = None
+        self._segment: Optional[Dict[str, Any]] = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Manifest y recuperación
+    # ------------------------------------------------------------------
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @staticmethod
+    def _try_lock(file, blocking: bool = False) -> bool:
+        """Bloqueo exclusivo del archivo; evita que otro worker lo recupere"""
+        if fcntl is None:
+            return True
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.flock(file.fileno(), flags)
+            return True
+        except OSError:
+            return False
+
+    @contextmanager
+    def _manifest_lock(self):
+        """Serializa las actualizaciones del manifest entre procesos"""
+        with open(self._path(self.MANIFEST_FILE + ".lock"), "a") as lock_file:
+            self._try_lock(lock_file, blocking=True)
+            yield
+
+    def _read_manifest(self) -> List[Dict[str, Any]]:
+        manifest_path = self._path(self.MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return []
+        with open(manifest_path, "r", encoding="utf-8") as file:
+            return json.load(file).get("segments", [])
+
+    def _publish_segment(self, entry: Dict[str, Any]):
+        """Agrega un segmento cerrado al manifest"""
+        with self._manifest_lock():
+            segments = self._read_manifest()
+            segments.append(entry)
+            segments.sort(key=lambda segment: segment["start"])
+
+            manifest_path = self._path(self.MANIFEST_FILE)
+            temp_path = f"{manifest_path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump({"segments": segments}, file)
+            os.replace(temp_path, manifest_path)
+
+    def _load(self):
+        """Prepara el directorio y cierra segmentos que quedaron abiertos (con el lock tomado)"""
+        if self._loaded:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Segmentos sin cerrar de una ejecución anterior (p. ej. tras un crash)
+        for file_name in sorted(os.listdir(self.directory)):
+            if file_name.endswith(".jsonl"):
+                self._recover_segment(file_name[:-len(".jsonl")])
+
+        self._loaded = True
+
+    def _recover_segment(self, name: str):
+        """Reconstruye el índice de un segmento huérfano recorriéndolo una vez"""
+        segment = self._new_segment_state(name)
+        with open(self._path(f"{name}.jsonl"), "rb") as file:
+            # Si otro worker lo tiene abierto, no es huérfano
+            if not self._try_lock(file):
+                return
+
+            offset = 0
+            for raw_line in file:
+                try:
+                    timestamp = json.loads(raw_line).get("timestamp")
+                except ValueError:
+                    timestamp = None
+                if timestamp:
+                    self._track_record(segment, timestamp, offset)
+                offset += len(raw_line)
+            segment["bytes"] = offset
+
+            if segment["records"]:
+                self._close_segment(segment)
+            else:
+                os.remove(self._path(f"{name}.jsonl"))
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+
+    def _new_segment_state(self, name: str) -> Dict[str, Any]:
+        return {
+            "name": name,
+            "start": None,
+            "end": None,
+            "records": 0,
+            "bytes": 0,
+            "hour": name.split("-")[1] if "-" in name else None,
+            "index": []
+        }
+
+    def _track_record(self, segment: Dict[str, Any], timestamp: str, offset: int):
+        """Actualiza rango temporal e índice disperso del segmento"""
+        if segment["records"] % self.index_every == 0:
+            segment["index"].append([timestamp, offset])
+        if segment["start"] is None or timestamp < segment["start"]:
+            segment["start"] = timestamp
+        if segment["end"] is None or timestamp > segment["end"]:
+            segment["end"] = timestamp
+        segment["records"] += 1
+
+    def _open_segment(self, hour_key: str):
+        sequence = 0
+        while True:
+            name = f"audit-{hour_key}-{os.getpid()}-{sequence:04d}"
+            if not os.path.exists(self._path(f"{name}.jsonl")) and \
+                    not os.path.exists(self._path(f"{name}.idx.json")):
+                break
+            sequence += 1
+
+        self._segment = self._new_segment_state(name)
+        self._file = open(self._path(f"{name}.jsonl"), "ab")
+        self._try_lock(self._file)
+
+    def _should_rotate(self, hour_key: str) -> bool:
+        if self._segment is None:
+            return False
+        if self._segment["bytes"] >= self.max_segment_bytes:
+            return True
+        return self.rotate_hourly and self._segment["hour"] != hour_key
+
+    def append(self, records: List[Dict[str, Any]]):
+        """Agrega un lote de registros al segmento actual, rotando si corresponde"""
+        with self._lock:
+            self._load()
+
+            for record in records:
+                timestamp = record.get("timestamp") or datetime.utcnow().isoformat()
+                record["timestamp"] = timestamp
+                hour_key = timestamp[:13].replace("-", "")
+
+                if self._should_rotate(hour_key):
+                    self._rotate()
+                if self._segment is None:
+                    self._open_segment(hour_key)
+
+                line = (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+                self._track_record(self._segment, timestamp, self._segment["bytes"])
+                self._file.write(line)
+                self._segment["bytes"] += len(line)
+
+            if self._file is not None:
+                self._file.flush()
+
+    def sync(self):
+        """Fuerza los datos del segmento actual a disco"""
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+
+    def rotate(self):
+        """Cierra el segmento actual"""
+        with self._lock:
+            self._rotate()
+
+    def _rotate(self):
+        if self._segment is None:
+            return
+        self._file.close()
+        self._file = None
+        segment, self._segment = self._segment, None
+
+        if segment["records"]:
+            self._close_segment(segment)
+        else:
+            os.remove(self._path(f"{segment['name']}.jsonl"))
+
+    def _close_segment(self, segment: Dict[str, Any]):
+        """Comprime el segmento por bloques y publica su índice en el manifest"""
+        name = segment["name"]
+        plain_path = self._path(f"{name}.jsonl")
+        entries = segment["index"]
+
+        if self.compress:
+            with open(plain_path, "rb") as source, open(self._path(f"{name}.jsonl.gz"), "wb") as target:
+                for position, (_, plain_offset) in enumerate(entries):
+                    next_offset = entries[position + 1][1] if position + 1 < len(entries) else None
+                    source.seek(plain_offset)
+                    block = source.read() if next_offset is None else source.read(next_offset - plain_offset)
+                    # Cada bloque es un miembro gzip independiente
+                    entries[position] = [entries[position][0], target.tell()]
+                    target.write(gzip.compress(block))
+            os.remove(plain_path)
+
+        with open(self._path(f"{name}.idx.json"), "w", encoding="utf-8") as file:
+            json.dump({"start": segment["start"], "end": segment["end"], "entries": entries}, file)
+
+        self._publish_segment({
+            "name": name,
+            "file": f"{name}.jsonl.gz" if self.compress else f"{name}.jsonl",
+            "index": f"{name}.idx.json",
+            "start": segment["start"],
+            "end": segment["end"],
+            "records": segment["records"],
+            "compressed": self.compress
+        })
+
+    def close(self):
+        """Cierra el segmento actual al apagar la aplicación"""
+        self.rotate()
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+
+    def _iter_segment(
+        self,
+        path: str,
+        compressed: bool,
+        entries: List[List[Any]],
+        date_from: Optional[str],
+        end_offset: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Lee un segmento desde el bloque que contiene date_from (sin comprimir: hasta end_offset)"""
+        offset = 0
+        if date_from:
+            for timestamp, entry_offset in entries:
+                if timestamp > date_from:
+                    break
+                offset = entry_offset
+
+        with open(path, "rb") as raw_file:
+            raw_file.seek(offset)
+            file = gzip.GzipFile(fileobj=raw_file) if compressed else raw_file
+            for raw_line in file:
+                if end_offset is not None:
+                    # Lo escrito después de la copia del segmento (o una línea a medias) no se lee
+                    offset += len(raw_line)
+                    if offset > end_offset:
+                        break
+                try:
+                    yield json.loads(raw_line)
+                except ValueError:
+                    continue
+
+    def query(
+        self,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        limit: int = 1000
+    ) -> List[Dict[str, Any]]:
+        """Retorna registros en la ventana de tiempo tocando solo los segmentos relevantes"""
+        start = date_from.isoformat() if date_from else None
+        end = date_to.isoformat() if date_to else None
+
+        # Copia del segmento actual y del manifest; los archivos se leen fuera del lock
+        with self._lock:
+            self._load()
+            current = None
+            if self._segment is not None:
+                current = {
+                    "name": self._segment["name"],
+                    "index": list(self._segment["index"]),
+                    "records": self._segment["records"],
+                    "bytes": self._segment["bytes"],
+                    "start": self._segment["start"],
+                    "end": self._segment["end"]
+                }
+            manifest = self._read_manifest()
+
+        candidates = [
+            {**segment, "path": self._path(segment["file"])}
+            for segment in manifest
+            if (start is None or segment["end"] >= start) and (end is None or segment["start"] <= end)
+        ]
+        if current is not None and current["records"] and \
+                (start is None or current["end"] >= start) and \
+                (end is None or current["start"] <= end):
+            candidates.append({
+                "path": self._path(f"{current['name']}.jsonl"),
+                "compressed": False,
+                "entries": current["index"],
+                "end_offset": current["bytes"]
+            })
+
+        results = []
+        for segment in candidates:
+            try:
+                entries = segment.get("entries")
+                if entries is None:
+                    with open(self._path(segment["index"]), "r", encoding="utf-8") as file:
+                        entries = json.load(file)["entries"]
+
+                records = self._iter_segment(
+                    segment["path"], segment["compressed"], entries, start, segment.get("end_offset")
+                )
+                for record in records:
+                    timestamp = record.get("timestamp", "")
+                    if start and timestamp < start:
+                        continue
+                    if end and timestamp > end:
+                        # Los registros de un segmento se escriben en orden temporal
+                        break
+                    results.append(record)
+                    if len(results) >= limit:
+                        return results
+            except FileNotFoundError:
+                # El segmento se rotó mientras se consultaba
+                continue
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna información de los segmentos"""
+        with self._lock:
+            segment = self._segment
+            return {
+                "directory": self.directory,
+                "closed_segments": len(self._read_manifest()) if self._loaded else 0,
+                "current_segment": segment["name"] if segment else None,
+                "current_segment_bytes": segment["bytes"] if segment else 0
+            }
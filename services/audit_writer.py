@@ -0,0 +1,217 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from config.settings import settings
+from services.audit_store import AuditSegmentStore
+from utils.collection_versions import collection_versions
+
+
+_STOP = object()
+
+
+class AuditLogWriter:
+    """Cola acotada en memoria y tarea en segundo plano que escribe el log de auditoría en lotes"""
+
+    def __init__(
+        self,
+        store: AuditSegmentStore,
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        fsync_policy: str = "interval",
+        fsync_interval: float = 5.0,
+        overflow_policy: str = "drop",
+        block_timeout: float = 0.05,
+        collection: Optional[str] = "audit_logs"
+    ):
+        self.store = store
+        self.collection = collection  # None desactiva la copia en MongoDB
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync_policy = fsync_policy  # "always", "interval" o "never"
+        self.fsync_interval = fsync_interval
+        self.overflow_policy = overflow_policy  # "drop" o "block"
+        self.block_timeout = block_timeout
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_fsync = 0.0
+
+        # Métricas
+        self._enqueued = 0
+        self._written = 0
+        self._dropped = 0
+        self._batches = 0
+        self._write_seconds_total = 0.0
+        self._write_seconds_max = 0.0
+        self._mongo_inserted = 0
+        self._mongo_errors = 0
+
+    async def get_database(self):
+        """Obtiene la base de datos - importación diferida para evitar circular imports"""
+        from config.database import get_database
+        return await get_database()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def write(self, record: Dict[str, Any]) -> bool:
+        """Encola un registro; retorna False si se descartó por cola llena"""
+        if not self.running:
+            # Sin tarea de escritura (scripts, tests): escribir directamente
+            self._write_batch([record])
+            await self._insert_batch([record])
+            return True
+
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            if self.overflow_policy != "block":
+                self._dropped += 1
+                return False
+            try:
+                await asyncio.wait_for(self._queue.put(record), timeout=self.block_timeout)
+            except asyncio.TimeoutError:
+                self._dropped += 1
+                return False
+
+        self._enqueued += 1
+        return True
+
+    def _write_batch(self, records: List[Dict[str, Any]]):
+        """Escribe un lote en el almacén y aplica la política de fsync"""
+        start_time = time.perf_counter()
+        try:
+            self.store.append(records)
+
+            now = time.monotonic()
+            if self.fsync_policy == "always" or (
+                self.fsync_policy == "interval" and now - self._last_fsync >= self.fsync_interval
+            ):
+                self.store.sync()
+                self._last_fsync = now
+
+            self._written += len(records)
+            self._batches += 1
+        except Exception as e:
+            print(f"Error escribiendo el log de auditoría: {e}")
+        finally:
+            elapsed = time.perf_counter() - start_time
+            self._write_seconds_total += elapsed
+            self._write_seconds_max = max(self._write_seconds_max, elapsed)
+
+    async def _insert_batch(self, records: List[Dict[str, Any]]):
+        """Inserta el lote en la colección de auditoría con un solo insert_many"""
+        if not self.collection or not records:
+            return
+        try:
+            db = await self.get_database()
+            if db is None:
+                return
+
+            documents = []
+            for record in records:
+                # Copia: insert_many agrega _id y el archivo guarda el timestamp como texto
+                document = dict(record)
+                if isinstance(document.get("timestamp"), str):
+                    document["timestamp"] = datetime.fromisoformat(document["timestamp"])
+                documents.append(document)
+
+            await db[self.collection].insert_many(documents, ordered=False)
+            collection_versions.bump(self.collection)
+            self._mongo_inserted += len(documents)
+        except Exception as e:
+            self._mongo_errors += 1
+            print(f"Error insertando el lote de auditoría en MongoDB: {e}")
+
+    async def _next_batch(self) -> tuple[List[Dict[str, Any]], bool]:
+        """Espera el primer registro y acumula hasta batch_size o flush_interval"""
+        loop = asyncio.get_running_loop()
+        item = await self._queue.get()
+        if item is _STOP:
+            return [], True
+
+        batch = [item]
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _run(self):
+        """Tarea en segundo plano que vacía la cola hacia el archivo y MongoDB"""
+        while True:
+            batch, stopping = await self._next_batch()
+            if batch:
+                await asyncio.to_thread(self._write_batch, batch)
+                await self._insert_batch(batch)
+            if stopping:
+                return
+
+    def start(self):
+        """Inicia la tarea de escritura"""
+        if not self.running:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Drena la cola, escribe lo pendiente y cierra el segmento actual"""
+        if self.running:
+            # El centinela se encola detrás de todos los registros pendientes
+            await self._queue.put(_STOP)
+            await self._task
+        self._task = None
+
+        await asyncio.to_thread(self.store.close)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna métricas de la cola y de las escrituras"""
+        return {
+            "running": self.running,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "overflow_policy": self.overflow_policy,
+            "fsync_policy": self.fsync_policy,
+            "enqueued": self._enqueued,
+            "written": self._written,
+            "dropped": self._dropped,
+            "batches": self._batches,
+            "avg_write_ms": round(self._write_seconds_total / self._batches * 1000, 3) if self._batches else 0.0,
+            "max_write_ms": round(self._write_seconds_max * 1000, 3),
+            "mongo_collection": self.collection,
+            "mongo_inserted": self._mongo_inserted,
+            "mongo_errors": self._mongo_errors,
+            "store": self.store.get_stats()
+        }
+
+
+# Instancia global del escritor del log de auditoría
+audit_writer = AuditLogWriter(
+    store=AuditSegmentStore(
+        directory=settings.audit_log_dir,
+        max_segment_bytes=settings.audit_segment_max_bytes,
+        rotate_hourly=settings.audit_segment_rotate_hourly,
+        compress=settings.audit_segment_compress
+    ),
+    max_queue=settings.audit_queue_max_size,
+    batch_size=settings.audit_batch_size,
+    flush_interval=settings.audit_flush_interval_seconds,
+    fsync_policy=settings.audit_fsync_policy,
+    fsync_interval=settings.audit_fsync_interval_seconds,
+    overflow_policy=settings.audit_overflow_policy,
+    collection="audit_logs" if settings.audit_mongo_enabled else None
+)
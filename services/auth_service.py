@@ -4,16 +4,27 @@ from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
 from models.user import User, UserRole, UserStatus
 from schemas.auth import LoginRequest, RegisterRequest, ChangePasswordRequest
-from utils.security import verify_password, get_password_hash, create_access_token
+from utils.security import create_access_token
 from utils.validators import validate_password_policy, validate_email
-from utils.exceptions import AuthenticationException, ValidationException, NotFoundException
+from utils.cache import TTLCache
+from utils.collection_versions import collection_versions
+from utils.exceptions import (
+    AuthenticationException, ValidationException, NotFoundException, ServiceUnavailableException
+)
 from services.encryption_service import encryption_service
+from services.hashing_service import hashing_service
 from config.settings import settings
 
 
 class AuthService:
     def __init__(self):
         self.collection = "users"
+        
+        # Caché de usuarios autenticados, indexada por user_id
+        self.principal_cache = TTLCache(
+            max_size=settings.principal_cache_max_size,
+            ttl_seconds=settings.principal_cache_ttl_seconds
+        )
     
     async def get_database(self):
         """Obtiene la base de datos - importación diferida para evitar circular imports"""
@@ -39,6 +50,10 @@ class AuthService:
         
         return User(**user_doc)
     
+    def invalidate_principal(self, user_id: str):
+        """Invalida el usuario cacheado tras un cambio en su documento"""
+        self.principal_cache.invalidate(str(user_id))
+    
     async def authenticate_user(
         self,
         login_data: LoginRequest,
@@ -80,7 +95,7 @@ class AuthService:
                 raise AuthenticationException(f"Usuario {user.status}")
             
             # Verificar contraseña
-            if not verify_password(login_data.password, user.hashed_password):
+            if not await hashing_service.verify_password(login_data.password, user.hashed_password):
                 # Incrementar intentos fallidos
                 await db[self.collection].update_one(
                     {"_id": ObjectId(user.id)},
@@ -119,6 +134,7 @@ class AuthService:
                     }
                 }
             )
+            self.invalidate_principal(user.id)
             
             # Crear token
             access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
@@ -134,7 +150,7 @@ class AuthService:
             
             return user, access_token
             
-        except AuthenticationException:
+        except (AuthenticationException, ServiceUnavailableException):
             raise
         except Exception as e:
             print(f"Error en authenticate_user: {e}")
@@ -169,6 +185,9 @@ class AuthService:
             if existing_username:
                 raise ValidationException("El nombre de usuario ya está en uso")
             
+            # Generar hash fuera del event loop
+            hashed_password = await hashing_service.hash_password(register_data.password)
+            
             # Crear usuario
             user = User(
                 email=register_data.email,
@@ -176,7 +195,7 @@ class AuthService:
                 full_name=register_data.full_name,
                 phone=register_data.phone,
                 address=register_data.address,
-                hashed_password=get_password_hash(register_data.password),
+                hashed_password=hashed_password,
                 role=UserRole.CLIENT  # Por defecto los nuevos usuarios son clientes
             )
             
@@ -190,6 +209,7 @@ class AuthService:
             # Insertar en base de datos
             result = await db[self.collection].insert_one(user_doc)
             user.id = str(result.inserted_id)
+            collection_versions.bump(self.collection)
             
             # Log de auditoría
             await audit_service.log_action(
@@ -204,7 +224,7 @@ class AuthService:
             
             return user
             
-        except (ValidationException, AuthenticationException):
+        except (ValidationException, AuthenticationException, ServiceUnavailableException):
             raise
         except Exception as e:
             print(f"Error en register_user: {e}")
@@ -231,7 +251,7 @@ class AuthService:
             user = self._prepare_user_from_doc(user_doc)
             
             # Verificar contraseña actual
-            if not verify_password(change_data.current_password, user.hashed_password):
+            if not await hashing_service.verify_password(change_data.current_password, user.hashed_password):
                 await audit_service.log_action(
                     user_id=user_id,
                     username=user.username,
@@ -248,7 +268,7 @@ class AuthService:
             validate_password_policy(change_data.new_password)
             
             # Actualizar contraseña
-            new_hashed_password = get_password_hash(change_data.new_password)
+            new_hashed_password = await hashing_service.hash_password(change_data.new_password)
             
             await db[self.collection].update_one(
                 {"_id": ObjectId(user_id)},
@@ -260,6 +280,7 @@ class AuthService:
                     }
                 }
             )
+            self.invalidate_principal(user_id)
             
             # Log de auditoría
             await audit_service.log_action(
@@ -274,7 +295,7 @@ class AuthService:
             
             return True
             
-        except (ValidationException, AuthenticationException, NotFoundException):
+        except (ValidationException, AuthenticationException, NotFoundException, ServiceUnavailableException):
             raise
         except Exception as e:
             print(f"Error en change_password: {e}")
@@ -285,13 +306,20 @@ class AuthService:
     async def get_current_user(self, user_id: str) -> User:
         """Obtiene el usuario actual por ID"""
         try:
+            # Servir desde caché para evitar la consulta y el descifrado
+            cached_user = self.principal_cache.get(user_id)
+            if cached_user is not None:
+                return cached_user
+            
             db: AsyncIOMotorDatabase = await self.get_database()
             
             user_doc = await db[self.collection].find_one({"_id": ObjectId(user_id)})
             if not user_doc:
                 raise NotFoundException("Usuario no encontrado")
             
-            return self._prepare_user_from_doc(user_doc)
+            user = self._prepare_user_from_doc(user_doc)
+            self.principal_cache.set(user_id, user)
+            return user
             
         except NotFoundException:
             raise
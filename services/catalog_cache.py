@@ -0,0 +1,312 @@
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, Optional, Set, Tuple
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from config.settings import settings
+from models.product import ProductStatus
+from services.product_search import ProductSearchIndex
+from services.low_stock_feed import low_stock_feed
+from utils.serializers import json_value, serialize_product, json_array
+from utils.http_cache import content_etag
+
+
+def is_low_stock(product_doc: dict) -> bool:
+    """Stock en o por debajo del mínimo (los descontinuados no cuentan)"""
+    return (
+        int(product_doc.get("stock", 0)) <= int(product_doc.get("min_stock", 0))
+        and json_value(product_doc.get("status", ProductStatus.ACTIVE)) != ProductStatus.DISCONTINUED.value
+    )
+
+
+class CatalogCache:
+    """Caché del catálogo de productos en memoria del proceso
+
+    Guarda cada producto ya serializado a JSON. Las mutaciones de ProductService
+    actualizan la entrada y suben `version`; la lista de activos se arma una sola
+    vez por versión (concatenando bytes) y se sirve tal cual. Un diccionario
+    código de barras -> producto (solo no descontinuados) resuelve los escaneos
+    de caja en O(1) y `search_index` permite buscar por nombre y marca. El
+    conjunto de productos con stock bajo se mantiene en cada cambio y los
+    cruces del umbral se publican en low_stock_feed. Una recarga periódica
+    desde MongoDB recoge los cambios hechos por otros procesos (solo se
+    reindexan los productos que cambiaron y `version` solo sube si hubo
+    cambios). `changed_at` y el ETag de la lista de activos alimentan las
+    cabeceras de caché HTTP.
+    """
+
+    def __init__(self, collection: str = "products", refresh_interval: float = 30.0):
+        self.collection = collection
+        self.refresh_interval = refresh_interval
+        self.version = 0
+        self.changed_at = datetime.utcnow()
+        self.loaded = False
+        # product_id -> (status, name, JSON serializado, barcode, stock bajo, updated_at)
+        self._entries: Dict[str, tuple] = {}
+        # barcode -> product_id
+        self._by_barcode: Dict[str, str] = {}
+        self.search_index = ProductSearchIndex()
+        self._low_stock: Set[str] = set()
+        self._active_json: Optional[bytes] = None
+        self._active_etag: Optional[str] = None
+        self._active_version = -1
+        self._low_stock_json: Optional[bytes] = None
+        self._low_stock_version = -1
+        # IDs modificados mientras corre una recarga (no deben pisarse con la foto vieja)
+        self._touched_during_load: Optional[Set[str]] = None
+        self._task: Optional[asyncio.Task] = None
+
+        # Métricas
+        self._hits = 0
+        self._rebuilds = 0
+        self._reloads = 0
+        self._errors = 0
+        self._barcode_hits = 0
+
+    async def get_database(self):
+        """Obtiene la base de datos - importación diferida para evitar circular imports"""
+        from config.database import get_database
+        return await get_database()
+
+    async def load(self):
+        """Carga el catálogo completo desde MongoDB
+
+        Durante la lectura solo se juntan los productos que cambiaron; el
+        índice de búsqueda, las entradas y los eventos de stock bajo se
+        aplican juntos al final, sin awaits de por medio, así una búsqueda
+        concurrente nunca ve IDs indexados sin entrada y una recarga que
+        falla no deja nada a medias.
+        """
+        self._touched_during_load = set()
+        try:
+            db: AsyncIOMotorDatabase = await self.get_database()
+            entries = {}
+            # product_id -> (documento, entrada nueva) de los que cambiaron
+            changed_docs: Dict[str, tuple] = {}
+            async for product_doc in db[self.collection].find({}):
+                product_id = str(product_doc["_id"])
+                entry = self._entry(product_doc)
+                entries[product_id] = entry
+                if self._entries.get(product_id) != entry:
+                    changed_docs[product_id] = (product_doc, entry)
+
+            # Conservar lo que se modificó localmente durante la lectura
+            for product_id in self._touched_during_load:
+                changed_docs.pop(product_id, None)
+                if product_id in self._entries:
+                    entries[product_id] = self._entries[product_id]
+                else:
+                    entries.pop(product_id, None)
+
+            removed = self._entries.keys() - entries.keys()
+            changed = not self.loaded or bool(changed_docs) or bool(removed)
+            crossings = []
+            for product_id, (product_doc, entry) in changed_docs.items():
+                self._index(product_id, product_doc, entry)
+                crossings.append((self._entries.get(product_id), entry, product_id, product_doc))
+            for product_id in removed:
+                self.search_index.remove(product_id)
+
+            self._entries = entries
+            self._by_barcode = {
+                entry[3]: product_id
+                for product_id, entry in entries.items()
+                if self._indexes_barcode(entry)
+            }
+            self._low_stock = {product_id for product_id, entry in entries.items() if entry[4]}
+            was_loaded = self.loaded
+            self.loaded = True
+            self._reloads += 1
+            if changed:
+                self._bump()
+
+            # Publicar solo con el nuevo estado ya aplicado (la primera carga no publica)
+            if was_loaded:
+                for crossing in crossings:
+                    self._publish_crossing(*crossing)
+        except Exception as e:
+            self._errors += 1
+            print(f"Error cargando caché del catálogo: {e}")
+        finally:
+            self._touched_during_load = None
+
+    def _entry(self, product_doc: dict) -> tuple:
+        return (
+            json_value(product_doc.get("status", ProductStatus.ACTIVE)),
+            product_doc["name"],
+            serialize_product(product_doc),
+            product_doc.get("barcode"),
+            is_low_stock(product_doc),
+            product_doc["updated_at"]
+        )
+
+    @staticmethod
+    def _indexes_barcode(entry: tuple) -> bool:
+        # Los descontinuados liberan su código de barras (igual que la validación de ProductService)
+        return bool(entry[3]) and entry[0] != ProductStatus.DISCONTINUED.value
+
+    def _unindex_barcode(self, product_id: str):
+        previous = self._entries.get(product_id)
+        if previous is not None and self._by_barcode.get(previous[3]) == product_id:
+            del self._by_barcode[previous[3]]
+
+    def _index(self, product_id: str, product_doc: dict, entry: tuple):
+        self.search_index.add(
+            product_id,
+            product_doc["name"],
+            product_doc.get("brand"),
+            entry[0] == ProductStatus.ACTIVE.value
+        )
+
+    @staticmethod
+    def _publish_crossing(previous: Optional[tuple], entry: tuple, product_id: str, product_doc: dict):
+        """Publica el evento si el producto entró o salió del conjunto de stock bajo"""
+        was_low = previous is not None and previous[4]
+        if entry[4] == was_low:
+            return
+        low_stock_feed.publish({
+            "type": "low_stock" if entry[4] else "restocked",
+            "product_id": product_id,
+            "name": product_doc["name"],
+            "stock": int(product_doc.get("stock", 0)),
+            "min_stock": int(product_doc.get("min_stock", 0)),
+            "timestamp": datetime.utcnow().isoformat()
+        })
+
+    def _bump(self):
+        self.version += 1
+        self.changed_at = datetime.utcnow()
+
+    def _touch(self, product_id: str):
+        if self._touched_during_load is not None:
+            self._touched_during_load.add(product_id)
+
+    def upsert(self, product_doc: dict):
+        """Agrega o reemplaza un producto (documento de MongoDB o Product.dict(by_alias=True))"""
+        product_id = str(product_doc.get("_id") or product_doc.get("id"))
+        entry = self._entry(product_doc)
+        previous = self._entries.get(product_id)
+        self._unindex_barcode(product_id)
+        self._entries[product_id] = entry
+        if self._indexes_barcode(entry):
+            self._by_barcode[entry[3]] = product_id
+        if entry[4]:
+            self._low_stock.add(product_id)
+        else:
+            self._low_stock.discard(product_id)
+        self._index(product_id, product_doc, entry)
+        if self.loaded:
+            self._publish_crossing(previous, entry, product_id, product_doc)
+        self._touch(product_id)
+        self._bump()
+
+    def remove(self, product_id: str):
+        """Quita un producto del catálogo"""
+        self._unindex_barcode(product_id)
+        self._entries.pop(product_id, None)
+        self._low_stock.discard(product_id)
+        self.search_index.remove(product_id)
+        self._touch(product_id)
+        self._bump()
+
+    def get_active_json(self) -> Optional[bytes]:
+        """Lista de productos activos ordenada por nombre, ya serializada; None si no está cargada"""
+        if not self.loaded:
+            return None
+
+        if self._active_version != self.version:
+            self._rebuild_active()
+        else:
+            self._hits += 1
+        return self._active_json
+
+    def get_active_etag(self) -> Optional[str]:
+        """ETag de la lista de activos (digest del JSON, calculado una vez por versión)"""
+        if not self.loaded:
+            return None
+
+        if self._active_version != self.version:
+            self._rebuild_active()
+        return self._active_etag
+
+    def _rebuild_active(self):
+        active = sorted(
+            (entry for entry in self._entries.values() if entry[0] == ProductStatus.ACTIVE.value),
+            key=lambda entry: entry[1]
+        )
+        self._active_json = json_array(entry[2] for entry in active)
+        self._active_etag = content_etag(self._active_json)
+        self._active_version = self.version
+        self._rebuilds += 1
+
+    def get_low_stock_json(self) -> Optional[bytes]:
+        """Productos con stock bajo ordenados por nombre; se arma recorriendo solo ese conjunto"""
+        if not self.loaded:
+            return None
+
+        if self._low_stock_version != self.version:
+            low = sorted((self._entries[product_id] for product_id in self._low_stock), key=lambda entry: entry[1])
+            self._low_stock_json = json_array(entry[2] for entry in low)
+            self._low_stock_version = self.version
+        return self._low_stock_json
+
+    def get_by_barcode(self, barcode: str) -> Optional[bytes]:
+        """JSON del producto con ese código de barras, o None si no está en la caché"""
+        product_id = self._by_barcode.get(barcode)
+        if product_id is None:
+            return None
+        self._barcode_hits += 1
+        return self._entries[product_id][2]
+
+    def get_by_id(self, product_id: str) -> Optional[Tuple[bytes, datetime]]:
+        """JSON y updated_at del producto, o None si no está en la caché"""
+        entry = self._entries.get(product_id)
+        if entry is None:
+            return None
+        return entry[2], entry[5]
+
+    def search_json(self, query: str, limit: int = 20, active_only: bool = True) -> bytes:
+        """Resultados de búsqueda ya serializados como lista JSON"""
+        product_ids = self.search_index.search(query, limit=limit, active_only=active_only)
+        entries = self._entries
+        return json_array(entries[product_id][2] for product_id in product_ids if product_id in entries)
+
+    async def _run(self):
+        """Tarea en segundo plano que recarga el catálogo periódicamente"""
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.load()
+
+    def start(self):
+        """Inicia la recarga periódica"""
+        if self.refresh_interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Detiene la recarga periódica"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna métricas de la caché"""
+        return {
+            "loaded": self.loaded,
+            "version": self.version,
+            "products": len(self._entries),
+            "barcodes": len(self._by_barcode),
+            "low_stock": len(self._low_stock),
+            "barcode_hits": self._barcode_hits,
+            "active_bytes": len(self._active_json) if self._active_json else 0,
+            "hits": self._hits,
+            "rebuilds": self._rebuilds,
+            "reloads": self._reloads,
+            "errors": self._errors
+        }
+
+
+# Instancia global de la caché del catálogo
+catalog_cache = CatalogCache(refresh_interval=settings.catalog_cache_refresh_seconds)
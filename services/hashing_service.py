@@ -0,0 +1,117 @@
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from config.settings import settings
+from utils.security import verify_password, get_password_hash
+from utils.exceptions import ServiceUnavailableException
+
+
+class HashingService:
+    """Ejecuta bcrypt en un pool acotado para no bloquear el event loop"""
+
+    def __init__(
+        self,
+        pool_type: str = "thread",
+        max_workers: int = 4,
+        max_queue: int = 64,
+        latency_window: int = 1024
+    ):
+        self.pool_type = pool_type
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor: Optional[Executor] = None
+
+        # Llamadas en curso (ejecutándose + esperando un worker)
+        self._pending = 0
+
+        # Métricas por operación
+        self._latencies = {
+            "hash": deque(maxlen=latency_window),
+            "verify": deque(maxlen=latency_window)
+        }
+        self._counts = {"hash": 0, "verify": 0}
+        self._rejected = 0
+
+    def _get_executor(self) -> Executor:
+        """Crea el pool de forma diferida en la primera llamada"""
+        if self._executor is None:
+            if self.pool_type == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="bcrypt"
+                )
+        return self._executor
+
+    async def _run(self, operation: str, func: Callable, *args) -> Any:
+        """Encola una llamada de bcrypt respetando el límite de cola"""
+        if self._pending >= self.max_workers + self.max_queue:
+            self._rejected += 1
+            raise ServiceUnavailableException(
+                "Servicio de autenticación saturado. Intenta de nuevo en unos segundos."
+            )
+
+        self._pending += 1
+        start_time = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self._pending -= 1
+            self._counts[operation] += 1
+            self._latencies[operation].append(time.perf_counter() - start_time)
+
+    async def hash_password(self, password: str) -> str:
+        """Genera el hash bcrypt de una contraseña"""
+        return await self._run("hash", get_password_hash, password)
+
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        """Verifica una contraseña contra su hash bcrypt"""
+        return await self._run("verify", verify_password, plain_password, hashed_password)
+
+    def _latency_summary(self, operation: str) -> Dict[str, Any]:
+        """Resume las latencias recientes de una operación en milisegundos"""
+        samples = sorted(self._latencies[operation])
+        if not samples:
+            return {"count": self._counts[operation], "avg_ms": 0.0, "p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+
+        def percentile(p: float) -> float:
+            index = min(len(samples) - 1, int(round(p * (len(samples) - 1))))
+            return round(samples[index] * 1000, 2)
+
+        return {
+            "count": self._counts[operation],
+            "avg_ms": round(sum(samples) / len(samples) * 1000, 2),
+            "p50_ms": percentile(0.50),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(samples[-1] * 1000, 2)
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna métricas del pool de hashing"""
+        return {
+            "pool_type": self.pool_type,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "pending": self._pending,
+            "rejected": self._rejected,
+            "hash": self._latency_summary("hash"),
+            "verify": self._latency_summary("verify")
+        }
+
+    def shutdown(self):
+        """Libera el pool de workers"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Instancia global del servicio de hashing
+hashing_service = HashingService(
+    pool_type=settings.hashing_pool_type,
+    max_workers=settings.hashing_max_workers,
+    max_queue=settings.hashing_max_queue
+)
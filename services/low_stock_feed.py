@@ -0,0 +1,60 @@
+import asyncio
+import json
+from typing import Any, Dict, Set
+from config.settings import settings
+
+
+def format_sse(event: str, data: bytes) -> bytes:
+    """Arma un mensaje server-sent events (data debe ser JSON de una sola línea)"""
+    return b"event: " + event.encode("utf-8") + b"\ndata: " + data + b"\n\n"
+
+
+class LowStockFeed:
+    """Difusión en memoria de los cruces del umbral de stock mínimo
+
+    CatalogCache publica un evento cuando un producto entra o sale del
+    conjunto de stock bajo; cada stream SSE tiene su propia cola acotada y,
+    si un cliente lento la llena, se descartan sus eventos más viejos en
+    lugar de frenar a quien publica.
+    """
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscribers: Set[asyncio.Queue] = set()
+
+        # Métricas
+        self._published = 0
+        self._dropped = 0
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def publish(self, event: Dict[str, Any]):
+        """Encola el evento (ya serializado) para todos los suscriptores"""
+        self._published += 1
+        if not self._subscribers:
+            return
+
+        message = format_sse(event["type"], json.dumps(event, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+                self._dropped += 1
+            queue.put_nowait(message)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna métricas del feed"""
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self._published,
+            "dropped": self._dropped
+        }
+
+
+# Instancia global del feed de stock bajo
+low_stock_feed = LowStockFeed(queue_size=settings.low_stock_feed_queue_size)
@@ -0,0 +1,110 @@
+import codecs
+import csv
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from pydantic import ValidationError
+from schemas.product import ProductCreate
+from utils.validators import sanitize_string, contains_blocked_pattern
+
+
+# Columnas reconocidas del CSV (el resto se ignora)
+IMPORT_FIELDS = ("name", "description", "price", "category", "brand", "barcode", "stock", "min_stock")
+_TEXT_FIELDS = ("name", "description", "brand", "barcode")
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Divide un stream de bytes UTF-8 en líneas sin cargarlo completo en memoria"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        lines = pending.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def iter_csv_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Any]]:
+    """Filas de un CSV con encabezado como (número de fila, dict)
+
+    Un registro puede ocupar varias líneas si tiene campos entre comillas; se
+    junta hasta que las comillas quedan balanceadas antes de parsearlo.
+    """
+    header: Optional[List[str]] = None
+    record = ""
+    quotes = 0
+    row_number = 0
+    async for line in iter_lines(chunks):
+        record = f"{record}\n{line}" if record else line
+        quotes += line.count('"')
+        if quotes % 2:
+            continue
+
+        text, record, quotes = record.rstrip("\r"), "", 0
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [column.strip().lower() for column in values]
+            continue
+
+        row_number += 1
+        yield row_number, dict(zip(header, values))
+
+    if record.strip():
+        row_number += 1
+        yield row_number, ValueError("Registro CSV incompleto (comillas sin cerrar)")
+
+
+async def iter_ndjson_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Any]]:
+    """Objetos de un stream NDJSON como (número de fila, dict o error)"""
+    row_number = 0
+    async for line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            yield row_number, json.loads(line)
+        except ValueError as e:
+            yield row_number, ValueError(f"JSON inválido: {e}")
+
+
+def parse_import_row(row: Any) -> ProductCreate:
+    """Valida una fila con ProductCreate aplicando el mismo filtro que SecurityMiddleware
+
+    Una fila con contenido bloqueado se rechaza (queda como error de la fila)
+    y los campos de texto se sanitizan.
+    """
+    if isinstance(row, Exception):
+        raise row
+    if not isinstance(row, dict):
+        raise ValueError("Cada fila debe ser un objeto")
+
+    data: Dict[str, Any] = {}
+    for field in IMPORT_FIELDS:
+        value = row.get(field)
+        if isinstance(value, str):
+            value = value.strip()
+            if value == "":
+                # Vacío en CSV = no informado (aplica el valor por defecto)
+                continue
+            if contains_blocked_pattern(value):
+                raise ValueError(f"{field}: contenido bloqueado por medidas de seguridad")
+            if field in _TEXT_FIELDS:
+                value = sanitize_string(value)
+        if value is not None:
+            data[field] = value
+    return ProductCreate(**data)
+
+
+def describe_error(error: Exception) -> str:
+    """Mensaje legible para el reporte de importación"""
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}"
+            for item in error.errors()
+        )
+    return str(error)
@@ -0,0 +1,139 @@
+import heapq
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Set
+
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def fold_text(text: Optional[str]) -> str:
+    """Normaliza a minúsculas y sin acentos ("Café Ñandú" -> "cafe nandu")"""
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Tokens normalizados de un texto"""
+    return _TOKEN_RE.findall(fold_text(text))
+
+
+class ProductSearchIndex:
+    """Índice invertido de tokens de nombre y marca con búsqueda por prefijo
+
+    Cada token normalizado apunta al conjunto de productos que lo contienen y
+    los tokens distintos se mantienen ordenados, así que un prefijo se resuelve
+    con bisect sobre un rango contiguo. Se actualiza producto por producto.
+
+    Ranking por cada término de la consulta: token exacto en el nombre (3),
+    prefijo en el nombre (2), token exacto en la marca (1.5), prefijo en la
+    marca (1); +1 si el nombre empieza con el primer término. Empates por nombre.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Set[str]] = {}
+        self._tokens: List[str] = []
+        # product_id -> (tokens del nombre, " " + tokens del nombre unidos, tokens de la marca,
+        #                nombre normalizado, activo)
+        self._docs: Dict[str, tuple] = {}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, product_id: str, name: str, brand: Optional[str], active: bool):
+        """Indexa (o reindexa) un producto"""
+        if product_id in self._docs:
+            self.remove(product_id)
+
+        name_tokens = tokenize(name)
+        brand_tokens = tokenize(brand)
+        self._docs[product_id] = (
+            frozenset(name_tokens),
+            " " + " ".join(name_tokens),
+            frozenset(brand_tokens),
+            fold_text(name),
+            active
+        )
+
+        for token in set(name_tokens) | set(brand_tokens):
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = set()
+                insort(self._tokens, token)
+            postings.add(product_id)
+
+    def remove(self, product_id: str):
+        """Quita un producto del índice"""
+        doc = self._docs.pop(product_id, None)
+        if doc is None:
+            return
+
+        for token in doc[0] | doc[2]:
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.discard(product_id)
+            if not postings:
+                del self._postings[token]
+                position = bisect_left(self._tokens, token)
+                if position < len(self._tokens) and self._tokens[position] == token:
+                    del self._tokens[position]
+
+    def clear(self):
+        self._postings.clear()
+        self._tokens.clear()
+        self._docs.clear()
+
+    def _prefix_matches(self, prefix: str) -> Set[str]:
+        """Productos con algún token que empieza con `prefix`"""
+        matches: Set[str] = set()
+        position = bisect_left(self._tokens, prefix)
+        while position < len(self._tokens) and self._tokens[position].startswith(prefix):
+            matches |= self._postings[self._tokens[position]]
+            position += 1
+        return matches
+
+    @staticmethod
+    def _score(doc: tuple, terms: List[str], first_prefix: str) -> float:
+        name_tokens, name_text, brand_tokens, _, _ = doc
+        score = 0.0
+        for term in terms:
+            if term in name_tokens:
+                score += 3
+            elif " " + term in name_text:
+                # Algún token del nombre empieza con el término
+                score += 2
+            elif term in brand_tokens:
+                score += 1.5
+            else:
+                score += 1
+        if name_text.startswith(first_prefix):
+            score += 1
+        return score
+
+    def search(self, query: str, limit: int = 20, active_only: bool = True) -> List[str]:
+        """IDs de los productos que contienen todos los términos (como token o prefijo), por relevancia"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        # Intersectar empezando por el término más selectivo
+        term_matches = sorted((self._prefix_matches(term) for term in terms), key=len)
+        candidates = term_matches[0]
+        for matches in term_matches[1:]:
+            if not candidates:
+                break
+            candidates = candidates & matches
+
+        ranked = []
+        first_prefix = " " + terms[0]
+        for product_id in candidates:
+            doc = self._docs[product_id]
+            if active_only and not doc[4]:
+                continue
+            ranked.append((-self._score(doc, terms, first_prefix), doc[3], product_id))
+
+        return [product_id for _, _, product_id in heapq.nsmallest(limit, ranked)]
@@ -1,11 +1,35 @@
-from datetime import datetime
-from typing import List, Optional, Dict, Any
+import asyncio
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Optional, Dict, Any, Set, Tuple
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
 from bson import ObjectId
 from models.product import Product, ProductStatus, ProductCategory
-from schemas.product import ProductCreate, ProductUpdate, ProductResponse, ProductSearchFilters
+from schemas.product import ProductCreate, ProductUpdate, ProductSearchFilters
 from utils.validators import validate_positive_number
 from utils.exceptions import ValidationException, NotFoundException
+from utils.pagination import apply_keyset, keyset_sort, next_cursor
+from utils.count_cache import count_cache
+from utils.collection_versions import collection_versions
+from utils.serializers import serialize_product, json_array
+from utils.http_cache import content_etag
+from services.catalog_cache import catalog_cache, is_low_stock
+from services.product_import import iter_csv_rows, iter_ndjson_rows, parse_import_row, describe_error
+
+
+# Misma condición que catalog_cache.is_low_stock, evaluada por MongoDB
+_LOW_STOCK_EXPR = {
+    "$and": [
+        {"$lte": ["$stock", "$min_stock"]},
+        {"$ne": ["$status", ProductStatus.DISCONTINUED.value]}
+    ]
+}
+
+
+def _to_mongo_precision(value: datetime) -> datetime:
+    """Trunca una fecha a milisegundos, la precisión con que la guarda MongoDB"""
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
 
 
 class ProductService:
@@ -22,6 +46,67 @@ class ProductService:
         from services.audit_service import audit_service
         return audit_service
     
+    async def ensure_indexes(self):
+        """Crea los índices de paginación, el único parcial de códigos de barras y el de stock bajo"""
+        db: AsyncIOMotorDatabase = await self.get_database()
+        await db[self.collection].create_index([("created_at", -1), ("_id", -1)])
+        # is_low_stock solo existe (true) en productos con stock bajo: el índice sparse contiene solo esos
+        await db[self.collection].create_index("is_low_stock", sparse=True)
+        await self._sync_low_stock_flags(db)
+        await self._clear_stale_stock_ops(db)
+        # Único entre productos no descontinuados, igual que la validación de create/update
+        await db[self.collection].create_index(
+            "barcode",
+            name="barcode_unique_not_discontinued",
+            unique=True,
+            partialFilterExpression={
+                "barcode": {"$type": "string"},
+                "status": {"$in": [ProductStatus.ACTIVE.value, ProductStatus.INACTIVE.value]}
+            }
+        )
+    
+    async def _sync_low_stock_flags(self, db: AsyncIOMotorDatabase, product_ids: Optional[List[ObjectId]] = None):
+        """Ajusta el flag is_low_stock al stock actual (de los IDs dados o de toda la colección)
+
+        Las condiciones se evalúan sobre el documento al momento de escribir,
+        así que ajustes concurrentes convergen al estado final en cualquier orden.
+        """
+        scope = {"_id": {"$in": product_ids}} if product_ids is not None else {}
+        await db[self.collection].update_many(
+            {**scope, "is_low_stock": {"$ne": True}, "$expr": _LOW_STOCK_EXPR},
+            {"$set": {"is_low_stock": True}}
+        )
+        await db[self.collection].update_many(
+            {**scope, "is_low_stock": True, "$expr": {"$not": [_LOW_STOCK_EXPR]}},
+            {"$unset": {"is_low_stock": ""}}
+        )
+    
+    async def _sync_stale_low_stock_flags(self, db: AsyncIOMotorDatabase, product_docs: List[dict]):
+        """Sincroniza el flag solo si algún documento actualizado cruzó el umbral"""
+        stale = [
+            product_doc["_id"] for product_doc in product_docs
+            if is_low_stock(product_doc) != bool(product_doc.get("is_low_stock"))
+        ]
+        if stale:
+            await self._sync_low_stock_flags(db, stale)
+    
+    @staticmethod
+    def _with_low_stock_flag(product_doc: dict) -> dict:
+        """Agrega is_low_stock a un documento nuevo (el campo no existe si es false)"""
+        if is_low_stock(product_doc):
+            product_doc["is_low_stock"] = True
+        return product_doc
+    
+    def _new_product_doc(self, product: Product) -> dict:
+        """Documento a insertar, igual a como MongoDB lo devuelve al leerlo
+
+        MongoDB guarda fechas con precisión de milisegundos: se truncan antes de
+        insertar para que la caché del catálogo y las lecturas coincidan.
+        """
+        product.created_at = _to_mongo_precision(product.created_at)
+        product.updated_at = _to_mongo_precision(product.updated_at)
+        return self._with_low_stock_flag(product.dict(by_alias=True, exclude={"id"}))
+    
     def _prepare_product_from_doc(self, product_doc: dict) -> Product:
         """Prepara un objeto Product desde un documento de MongoDB"""
         # Crear una copia del documento
@@ -70,12 +155,14 @@ class ProductService:
             )
             
             # Insertar en base de datos
-            product_doc = product.dict(by_alias=True, exclude={"id"})
+            product_doc = self._new_product_doc(product)
             result = await db[self.collection].insert_one(product_doc)
             product.id = str(result.inserted_id)
+            collection_versions.bump(self.collection)
+            catalog_cache.upsert(product_doc)
             
             # Log de auditoría
-            audit_service.log_action(
+            await audit_service.log_action(
                 user_id=created_by_id,
                 username="admin",
                 action="create",
@@ -101,6 +188,137 @@ class ProductService:
             traceback.print_exc()
             raise ValidationException("Error interno al crear producto")
     
+    async def import_products(
+        self,
+        chunks: AsyncIterator[bytes],
+        file_format: str,
+        imported_by_id: str,
+        ip_address: str,
+        batch_size: int = 1000,
+        max_reported_errors: int = 1000
+    ) -> Dict[str, Any]:
+        """Importa productos desde un stream CSV o NDJSON por lotes
+
+        Cada lote se valida con ProductCreate, verifica sus códigos de barras con
+        una sola consulta $in y se inserta con un insert_many no ordenado. Se
+        registra un evento de auditoría por lote y se retorna un reporte por fila.
+        """
+        rows = iter_csv_rows(chunks) if file_format == "csv" else iter_ndjson_rows(chunks)
+        report = {"total_rows": 0, "inserted": 0, "failed": 0, "errors": [], "errors_truncated": False}
+        seen_barcodes = set()
+        batch = []
+        batch_number = 0
+        
+        def add_error(row_number: int, barcode: Optional[str], message: str):
+            report["failed"] += 1
+            if len(report["errors"]) < max_reported_errors:
+                report["errors"].append({"row": row_number, "barcode": barcode, "error": message})
+            else:
+                report["errors_truncated"] = True
+        
+        async def flush():
+            nonlocal batch, batch_number
+            if batch:
+                batch_number += 1
+                await self._import_batch(batch, batch_number, seen_barcodes, imported_by_id, ip_address, report, add_error)
+                batch = []
+        
+        async for row_number, row in rows:
+            report["total_rows"] += 1
+            try:
+                batch.append((row_number, parse_import_row(row)))
+            except Exception as e:
+                add_error(row_number, row.get("barcode") if isinstance(row, dict) else None, describe_error(e))
+            if len(batch) >= batch_size:
+                await flush()
+        await flush()
+        
+        return report
+    
+    async def _import_batch(
+        self,
+        batch: list,
+        batch_number: int,
+        seen_barcodes: set,
+        imported_by_id: str,
+        ip_address: str,
+        report: Dict[str, Any],
+        add_error
+    ):
+        """Verifica códigos de barras, inserta y audita un lote de la importación"""
+        db: AsyncIOMotorDatabase = await self.get_database()
+        audit_service = await self.get_audit_service()
+        
+        # Códigos de barras ya usados por productos no descontinuados: una consulta por lote
+        barcodes = [product_data.barcode for _, product_data in batch if product_data.barcode]
+        taken = set()
+        if barcodes:
+            cursor = db[self.collection].find(
+                {"barcode": {"$in": barcodes}, "status": {"$ne": ProductStatus.DISCONTINUED}},
+                {"barcode": 1}
+            )
+            taken = {product_doc["barcode"] async for product_doc in cursor}
+        
+        rows = []
+        documents = []
+        for row_number, product_data in batch:
+            barcode = product_data.barcode
+            if barcode and (barcode in taken or barcode in seen_barcodes):
+                add_error(row_number, barcode, "El código de barras ya está en uso")
+                continue
+            if barcode:
+                seen_barcodes.add(barcode)
+            
+            product = Product(
+                name=product_data.name,
+                description=product_data.description,
+                price=product_data.price,
+                category=product_data.category,
+                brand=product_data.brand,
+                barcode=barcode,
+                stock=product_data.stock,
+                min_stock=product_data.min_stock,
+                created_by=imported_by_id
+            )
+            rows.append(row_number)
+            documents.append(self._new_product_doc(product))
+        
+        failed_indexes = set()
+        if documents:
+            try:
+                await db[self.collection].insert_many(documents, ordered=False)
+            except BulkWriteError as e:
+                # Con ordered=False el resto del lote se inserta igual
+                for write_error in e.details.get("writeErrors", []):
+                    index = write_error["index"]
+                    failed_indexes.add(index)
+                    add_error(rows[index], documents[index].get("barcode"), write_error.get("errmsg", "Error de escritura"))
+            
+            collection_versions.bump(self.collection)
+            for index, product_doc in enumerate(documents):
+                if index not in failed_indexes:
+                    catalog_cache.upsert(product_doc)
+        
+        inserted = len(documents) - len(failed_indexes)
+        report["inserted"] += inserted
+        
+        # Un solo registro de auditoría por lote
+        await audit_service.log_action(
+            user_id=imported_by_id,
+            username="admin",
+            action="create",
+            resource="product",
+            details={
+                "operation": "import",
+                "batch": batch_number,
+                "valid_rows": len(batch),
+                "inserted": inserted,
+                "first_row": batch[0][0],
+                "last_row": batch[-1][0]
+            },
+            ip_address=ip_address
+        )
+    
     async def get_product_by_id(self, product_id: str) -> Product:
         """Obtiene un producto por ID"""
         try:
@@ -123,6 +341,27 @@ class ProductService:
             traceback.print_exc()
             raise NotFoundException("Error interno al obtener producto")
     
+    async def get_products_by_ids(self, product_ids: List[str]) -> Dict[str, Product]:
+        """Obtiene varios productos por ID con una sola consulta $in
+
+        Lanza las mismas excepciones que get_product_by_id si algún ID es
+        inválido o no existe.
+        """
+        db: AsyncIOMotorDatabase = await self.get_database()
+        
+        unique_ids = list(dict.fromkeys(product_ids))
+        if not all(ObjectId.is_valid(product_id) for product_id in unique_ids):
+            raise ValidationException("ID de producto inválido")
+        
+        products = {}
+        async for product_doc in db[self.collection].find({"_id": {"$in": [ObjectId(product_id) for product_id in unique_ids]}}):
+            product = self._prepare_product_from_doc(product_doc)
+            products[product.id] = product
+        
+        if len(products) != len(unique_ids):
+            raise NotFoundException("Producto no encontrado")
+        return products
+    
     async def update_product(
         self,
         product_id: str,
@@ -202,9 +441,12 @@ class ProductService:
                 {"_id": ObjectId(product_id)},
                 {"$set": update_data}
             )
+            collection_versions.bump(self.collection)
+            if update_data.keys() & {"stock", "min_stock", "status"}:
+                await self._sync_low_stock_flags(db, [ObjectId(product_id)])
             
             # Log de auditoría
-            audit_service.log_action(
+            await audit_service.log_action(
                 user_id=updated_by_id,
                 username="admin",
                 action="update",
@@ -219,7 +461,9 @@ class ProductService:
             )
             
             # Obtener producto actualizado
-            return await self.get_product_by_id(product_id)
+            product = await self.get_product_by_id(product_id)
+            catalog_cache.upsert(product.dict(by_alias=True))
+            return product
             
         except (ValidationException, NotFoundException):
             raise
@@ -247,9 +491,11 @@ class ProductService:
 
             # Eliminar el producto físicamente de la base de datos
             await db[self.collection].delete_one({"_id": ObjectId(product_id)})
+            collection_versions.bump(self.collection)
+            catalog_cache.remove(product_id)
 
             # Log de auditoría
-            audit_service.log_action(
+            await audit_service.log_action(
                 user_id=deleted_by_id,
                 username="admin",
                 action="delete",
@@ -276,9 +522,16 @@ class ProductService:
         self,
         page: int = 1,
         size: int = 50,
-        filters: Optional[ProductSearchFilters] = None
+        filters: Optional[ProductSearchFilters] = None,
+        cursor: Optional[str] = None,
+        estimated: bool = False
     ) -> Dict[str, Any]:
-        """Obtiene lista de productos con paginación y filtros"""
+        """Obtiene lista de productos con paginación y filtros
+
+        Con `cursor` continúa después del último producto de la página anterior
+        sin recorrer los documentos saltados. Con `estimated` el total es aproximado.
+        Los productos se retornan ya serializados.
+        """
         try:
             db: AsyncIOMotorDatabase = await self.get_database()
             
@@ -306,40 +559,27 @@ class ProductService:
                         price_query["$lte"] = filters.max_price
                     query["price"] = price_query
             
-            # Contar total
-            total = await db[self.collection].count_documents(query)
-            
-            # Obtener productos paginados
-            skip = (page - 1) * size
-            cursor = db[self.collection].find(query).sort("created_at", -1).skip(skip).limit(size)
-            products_docs = await cursor.to_list(length=size)
-            
-            # Convertir a response usando la función helper
-            products = []
-            for product_doc in products_docs:
-                product = self._prepare_product_from_doc(product_doc)
-                products.append(ProductResponse(
-                    id=str(product.id),
-                    name=product.name,
-                    description=product.description,
-                    price=product.price,
-                    category=product.category,
-                    brand=product.brand,
-                    barcode=product.barcode,
-                    stock=product.stock,
-                    min_stock=product.min_stock,
-                    status=product.status,
-                    created_at=product.created_at,
-                    updated_at=product.updated_at
-                ))
+            # Obtener productos paginados y el total (en caché) en paralelo
+            results = db[self.collection].find(apply_keyset(query, "created_at", cursor)).sort(keyset_sort("created_at"))
+            if not cursor:
+                results = results.skip((page - 1) * size)
+            (total, total_estimated), products_docs = await asyncio.gather(
+                count_cache.count(db[self.collection], query, estimated=estimated),
+                results.limit(size).to_list(length=size)
+            )
             
+            # Documentos de confianza: directo a JSON (forma de ProductResponse) sin modelos intermedios
             return {
-                "products": products,
+                "products": [serialize_product(product_doc) for product_doc in products_docs],
                 "total": total,
+                "total_estimated": total_estimated,
                 "page": page,
-                "size": size
+                "size": size,
+                "next_cursor": next_cursor(products_docs, "created_at", size)
             }
             
+        except ValidationException:
+            raise
         except Exception as e:
             print(f"Error en get_products: {e}")
             import traceback
@@ -347,12 +587,14 @@ class ProductService:
             return {
                 "products": [],
                 "total": 0,
+                "total_estimated": False,
                 "page": page,
-                "size": size
+                "size": size,
+                "next_cursor": None
             }
     
-    async def get_active_products(self) -> List[ProductResponse]:
-        """Obtiene todos los productos activos"""
+    async def get_active_products(self) -> List[bytes]:
+        """Obtiene todos los productos activos, ya serializados (JSON de ProductResponse)"""
         try:
             db: AsyncIOMotorDatabase = await self.get_database()
             
@@ -360,27 +602,7 @@ class ProductService:
                 {"status": ProductStatus.ACTIVE}
             ).sort("name", 1)
             
-            products_docs = await cursor.to_list(length=None)
-            
-            products = []
-            for product_doc in products_docs:
-                product = self._prepare_product_from_doc(product_doc)
-                products.append(ProductResponse(
-                    id=str(product.id),
-                    name=product.name,
-                    description=product.description,
-                    price=product.price,
-                    category=product.category,
-                    brand=product.brand,
-                    barcode=product.barcode,
-                    stock=product.stock,
-                    min_stock=product.min_stock,
-                    status=product.status,
-                    created_at=product.created_at,
-                    updated_at=product.updated_at
-                ))
-            
-            return products
+            return [serialize_product(product_doc) async for product_doc in cursor]
             
         except Exception as e:
             print(f"Error en get_active_products: {e}")
@@ -388,6 +610,116 @@ class ProductService:
             traceback.print_exc()
             return []
     
+    async def get_active_products_json(self) -> bytes:
+        """Lista de productos activos ya serializada, servida desde la caché del catálogo"""
+        active_json = catalog_cache.get_active_json()
+        if active_json is None:
+            # Caché aún no cargada: cargarla una vez y reintentar
+            await catalog_cache.load()
+            active_json = catalog_cache.get_active_json()
+        if active_json is None:
+            active_json = json_array(await self.get_active_products())
+        return active_json
+    
+    async def get_active_products_tagged(self) -> Tuple[bytes, str, datetime]:
+        """Lista de productos activos con su ETag y la fecha del último cambio del catálogo
+
+        Con la caché cargada el ETag se calcula una vez por versión: un
+        If-None-Match que coincide no toca MongoDB ni vuelve a serializar.
+        """
+        active_json = await self.get_active_products_json()
+        if catalog_cache.loaded:
+            return active_json, catalog_cache.get_active_etag(), catalog_cache.changed_at
+        return active_json, content_etag(active_json), datetime.utcnow()
+    
+    async def get_product_json(self, product_id: str) -> Tuple[bytes, datetime]:
+        """JSON de un producto y su updated_at
+
+        El documento se lee siempre de MongoDB (la caché del catálogo puede
+        tener hasta un intervalo de recarga de atraso); el JSON de la caché solo
+        se reutiliza si corresponde al mismo updated_at.
+        """
+        if not ObjectId.is_valid(product_id):
+            raise ValidationException("ID de producto inválido")
+        
+        db: AsyncIOMotorDatabase = await self.get_database()
+        product_doc = await db[self.collection].find_one({"_id": ObjectId(product_id)})
+        if not product_doc:
+            raise NotFoundException("Producto no encontrado")
+        
+        cached = catalog_cache.get_by_id(product_id)
+        if cached is not None and _to_mongo_precision(cached[1]) == product_doc["updated_at"]:
+            return cached
+        return serialize_product(product_doc), product_doc["updated_at"]
+    
+    async def get_product_updated_at(self, product_id: str) -> datetime:
+        """updated_at de un producto, con una lectura de solo ese campo (para validar ETags)"""
+        if not ObjectId.is_valid(product_id):
+            raise ValidationException("ID de producto inválido")
+        
+        db: AsyncIOMotorDatabase = await self.get_database()
+        product_doc = await db[self.collection].find_one({"_id": ObjectId(product_id)}, {"updated_at": 1})
+        if not product_doc:
+            raise NotFoundException("Producto no encontrado")
+        return product_doc["updated_at"]
+    
+    async def get_low_stock_products_json(self) -> bytes:
+        """Productos con stock en o por debajo del mínimo, desde el conjunto que mantiene la caché
+
+        Si la caché no está disponible se consulta el índice sparse de is_low_stock.
+        """
+        low_stock_json = catalog_cache.get_low_stock_json()
+        if low_stock_json is None:
+            await catalog_cache.load()
+            low_stock_json = catalog_cache.get_low_stock_json()
+        if low_stock_json is None:
+            db: AsyncIOMotorDatabase = await self.get_database()
+            cursor = db[self.collection].find({"is_low_stock": True}).sort("name", 1)
+            low_stock_json = json_array([serialize_product(product_doc) async for product_doc in cursor])
+        return low_stock_json
+    
+    async def search_products_json(self, query: str, limit: int = 20, include_inactive: bool = False) -> bytes:
+        """Busca productos por nombre y marca en el índice en memoria (tokens sin acentos, con prefijo)"""
+        if not catalog_cache.loaded:
+            await catalog_cache.load()
+        return catalog_cache.search_json(query, limit=limit, active_only=not include_inactive)
+    
+    async def get_products_by_barcodes_json(self, barcodes: List[str]) -> tuple:
+        """Busca productos por código de barras en la caché; los que faltan se consultan en MongoDB
+
+        Retorna (JSON de cada producto encontrado, códigos no encontrados), en el orden pedido.
+        """
+        by_barcode = {}
+        missing = []
+        for barcode in barcodes:
+            product_json = catalog_cache.get_by_barcode(barcode)
+            if product_json is not None:
+                by_barcode[barcode] = product_json
+            else:
+                missing.append(barcode)
+        
+        if missing:
+            # Respaldo: productos creados por otro proceso desde la última recarga
+            db: AsyncIOMotorDatabase = await self.get_database()
+            cursor = db[self.collection].find({
+                "barcode": {"$in": missing},
+                "status": {"$in": [ProductStatus.ACTIVE.value, ProductStatus.INACTIVE.value]}
+            })
+            async for product_doc in cursor:
+                catalog_cache.upsert(product_doc)
+                by_barcode[product_doc["barcode"]] = catalog_cache.get_by_barcode(product_doc["barcode"])
+        
+        found = [by_barcode[barcode] for barcode in barcodes if barcode in by_barcode]
+        not_found = [barcode for barcode in barcodes if barcode not in by_barcode]
+        return found, not_found
+    
+    async def get_product_by_barcode_json(self, barcode: str) -> bytes:
+        """JSON del producto con ese código de barras"""
+        found, _ = await self.get_products_by_barcodes_json([barcode])
+        if not found:
+            raise NotFoundException("Producto no encontrado")
+        return found[0]
+    
     async def update_stock(
         self,
         product_id: str,
@@ -396,7 +728,11 @@ class ProductService:
         ip_address: str,
         operation: str = "manual"
     ) -> Product:
-        """Actualiza el stock de un producto"""
+        """Actualiza el stock de un producto
+
+        Un solo find_one_and_update con $inc condicionado a que el stock no
+        quede negativo: los ajustes concurrentes no se pisan.
+        """
         try:
             db: AsyncIOMotorDatabase = await self.get_database()
             audit_service = await self.get_audit_service()
@@ -404,31 +740,28 @@ class ProductService:
             if not ObjectId.is_valid(product_id):
                 raise ValidationException("ID de producto inválido")
             
-            # Obtener producto actual
-            product_doc = await db[self.collection].find_one({"_id": ObjectId(product_id)})
-            if not product_doc:
-                raise NotFoundException("Producto no encontrado")
-            
-            product = self._prepare_product_from_doc(product_doc)
-            new_stock = product.stock + quantity_change
+            product_doc = await db[self.collection].find_one_and_update(
+                {"_id": ObjectId(product_id), "stock": {"$gte": -quantity_change}},
+                {
+                    "$inc": {"stock": quantity_change},
+                    "$set": {"updated_at": datetime.utcnow()}
+                },
+                return_document=ReturnDocument.AFTER
+            )
+            # El stock no forma parte de ningún filtro de listado: los totales siguen válidos
             
-            # Validar que el stock no sea negativo
-            if new_stock < 0:
+            if not product_doc:
+                # Solo en el caso de error: distinguir inexistente de stock insuficiente
+                if not await db[self.collection].find_one({"_id": ObjectId(product_id)}, {"_id": 1}):
+                    raise NotFoundException("Producto no encontrado")
                 raise ValidationException("El stock no puede ser negativo")
             
-            # Actualizar stock
-            await db[self.collection].update_one(
-                {"_id": ObjectId(product_id)},
-                {
-                    "$set": {
-                        "stock": new_stock,
-                        "updated_at": datetime.utcnow()
-                    }
-                }
-            )
+            await self._sync_stale_low_stock_flags(db, [product_doc])
+            catalog_cache.upsert(product_doc)
+            product = self._prepare_product_from_doc(product_doc)
             
             # Log de auditoría
-            audit_service.log_action(
+            await audit_service.log_action(
                 user_id=updated_by_id,
                 username="system",
                 action="update",
@@ -436,17 +769,16 @@ class ProductService:
                 resource_id=product_id,
                 details={
                     "product_name": product.name,
-                    "previous_stock": product.stock,
+                    "previous_stock": product.stock - quantity_change,
                     "quantity_change": quantity_change,
-                    "new_stock": new_stock,
+                    "new_stock": product.stock,
                     "operation": operation,
                     "updated_by": updated_by_id
                 },
                 ip_address=ip_address
             )
             
-            # Obtener producto actualizado
-            return await self.get_product_by_id(product_id)
+            return product
             
         except (ValidationException, NotFoundException):
             raise
@@ -455,6 +787,167 @@ class ProductService:
             import traceback
             traceback.print_exc()
             raise ValidationException("Error interno al actualizar stock")
+    
+    async def apply_stock_deltas(
+        self,
+        deltas: Dict[str, int]
+    ) -> Tuple[Dict[str, dict], Set[str], Dict[str, str]]:
+        """Aplica ajustes de stock (product_id -> delta) con un solo bulk_write no ordenado
+
+        Cada ajuste es un $inc condicionado a que el stock no quede negativo.
+        bulk_write solo informa totales, así que cada operación agrega un token
+        de la llamada a `stock_ops`: una lectura posterior indica qué ajustes se
+        aplicaron y el stock resultante, y un update_many retira el token. Son
+        tres round-trips sin importar la cantidad de productos.
+
+        Si bulk_write falla (BulkWriteError u otro error de MongoDB) el resto de
+        las operaciones pudo haberse aplicado igual: la lectura del token se hace
+        de todos modos para informar exactamente qué cambió. Los tokens que
+        quedan si el proceso cae entre el bulk_write y el $pull se limpian al
+        iniciar (ver _clear_stale_stock_ops).
+
+        Retorna (documentos actualizados por ID, IDs con stock insuficiente,
+        ID -> error de escritura); los IDs que no están en ninguno no existen.
+        """
+        db: AsyncIOMotorDatabase = await self.get_database()
+        if not deltas:
+            return {}, set(), {}
+        
+        token = str(ObjectId())
+        now = datetime.utcnow()
+        ordered_ids = list(deltas)
+        product_ids = [ObjectId(product_id) for product_id in ordered_ids]
+        write_errors: Dict[str, str] = {}
+        try:
+            await db[self.collection].bulk_write(
+                [
+                    UpdateOne(
+                        {"_id": ObjectId(product_id), "stock": {"$gte": -delta}},
+                        {
+                            "$inc": {"stock": delta},
+                            "$set": {"updated_at": now},
+                            "$push": {"stock_ops": token}
+                        }
+                    )
+                    for product_id, delta in deltas.items()
+                ],
+                ordered=False
+            )
+        except BulkWriteError as e:
+            for write_error in e.details.get("writeErrors", []):
+                write_errors[ordered_ids[write_error["index"]]] = write_error.get("errmsg", "Error de escritura")
+            print(f"Error parcial en apply_stock_deltas: {len(write_errors)} de {len(deltas)} ajustes fallaron")
+        except PyMongoError as e:
+            # No se sabe qué llegó a aplicarse: lo decide la lectura del token
+            write_errors = {product_id: "Error al aplicar el ajuste" for product_id in ordered_ids}
+            print(f"Error en bulk_write de apply_stock_deltas: {e}")
+        
+        applied: Dict[str, dict] = {}
+        insufficient: Set[str] = set()
+        async for product_doc in db[self.collection].find({"_id": {"$in": product_ids}}):
+            product_id = str(product_doc["_id"])
+            if token in product_doc.get("stock_ops", ()):
+                applied[product_id] = product_doc
+                catalog_cache.upsert(product_doc)
+            elif product_id not in write_errors:
+                insufficient.add(product_id)
+        failed = {product_id: error for product_id, error in write_errors.items() if product_id not in applied}
+        
+        if applied:
+            await db[self.collection].update_many(
+                {"_id": {"$in": product_ids}, "stock_ops": token},
+                {"$pull": {"stock_ops": token}}
+            )
+            await self._sync_stale_low_stock_flags(db, list(applied.values()))
+        
+        return applied, insufficient, failed
+    
+    async def _clear_stale_stock_ops(self, db: AsyncIOMotorDatabase, max_age_seconds: float = 3600):
+        """Retira tokens de apply_stock_deltas que quedaron por una caída entre el bulk_write y el $pull
+
+        Los tokens son ObjectIds en hexadecimal: comparados como strings se
+        ordenan por fecha de creación.
+        """
+        cutoff = str(ObjectId.from_datetime(datetime.utcnow() - timedelta(seconds=max_age_seconds)))
+        result = await db[self.collection].update_many(
+            {"stock_ops": {"$lt": cutoff}},
+            {"$pull": {"stock_ops": {"$lt": cutoff}}}
+        )
+        if result.modified_count:
+            print(f"Tokens de stock_ops huérfanos retirados de {result.modified_count} productos")
+    
+    async def bulk_update_stock(
+        self,
+        adjustments: List[Dict[str, Any]],
+        updated_by_id: str,
+        ip_address: str,
+        operation: str = "bulk_adjustment"
+    ) -> Dict[str, Any]:
+        """Aplica muchos ajustes de stock en una sola operación (ver apply_stock_deltas)
+
+        Los ajustes inválidos, repetidos, inexistentes o que dejarían el stock
+        negativo se informan por ítem sin afectar al resto.
+        """
+        try:
+            audit_service = await self.get_audit_service()
+            
+            results: List[Dict[str, Any]] = []
+            pending: Dict[str, Dict[str, Any]] = {}
+            
+            for adjustment in adjustments:
+                product_id = adjustment["product_id"]
+                delta = adjustment["delta"]
+                result = {"product_id": product_id, "delta": delta, "success": False, "new_stock": None, "error": None}
+                results.append(result)
+                
+                if not ObjectId.is_valid(product_id):
+                    result["error"] = "ID de producto inválido"
+                elif product_id in pending:
+                    result["error"] = "Producto repetido en la solicitud"
+                else:
+                    pending[product_id] = result
+            
+            applied, insufficient, failed = await self.apply_stock_deltas(
+                {product_id: result["delta"] for product_id, result in pending.items()}
+            )
+            
+            for product_id, result in pending.items():
+                product_doc = applied.get(product_id)
+                if product_doc is None:
+                    if product_id in failed:
+                        result["error"] = "Error al aplicar el ajuste, reintentar"
+                    elif product_id in insufficient:
+                        result["error"] = "El stock no puede ser negativo"
+                    else:
+                        result["error"] = "Producto no encontrado"
+                    continue
+                
+                result["success"] = True
+                result["new_stock"] = product_doc["stock"]
+                await audit_service.log_action(
+                    user_id=updated_by_id,
+                    username="system",
+                    action="update",
+                    resource="product",
+                    resource_id=product_id,
+                    details={
+                        "product_name": product_doc.get("name"),
+                        "quantity_change": result["delta"],
+                        "new_stock": product_doc["stock"],
+                        "operation": operation,
+                        "updated_by": updated_by_id
+                    },
+                    ip_address=ip_address
+                )
+            
+            updated = sum(1 for result in results if result["success"])
+            return {"updated": updated, "failed": len(results) - updated, "results": results}
+            
+        except Exception as e:
+            print(f"Error en bulk_update_stock: {e}")
+            import traceback
+            traceback.print_exc()
+            raise ValidationException("Error interno al actualizar stock")
 
 
 # Instancia global del servicio de productos
@@ -0,0 +1,105 @@
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, Optional
+from pymongo import UpdateOne
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from config.settings import settings
+
+
+class SessionActivityTracker:
+    """Acumula la última actividad de cada sesión en memoria y la persiste en lotes"""
+
+    def __init__(self, collection: str = "session_logs", flush_interval: float = 5.0):
+        self.collection = collection
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+
+        # Métricas
+        self._touches = 0
+        self._flushes = 0
+        self._sessions_written = 0
+        self._errors = 0
+
+    async def get_database(self):
+        """Obtiene la base de datos - importación diferida para evitar circular imports"""
+        from config.database import get_database
+        return await get_database()
+
+    def touch(self, session_id: str):
+        """Registra actividad; las repeticiones se coalescen hasta el siguiente flush"""
+        self._pending[session_id] = datetime.utcnow()
+        self._touches += 1
+
+    async def flush(self):
+        """Escribe todas las actividades pendientes con un único bulk_write"""
+        if not self._pending:
+            return
+
+        pending, self._pending = self._pending, {}
+        operations = [
+            UpdateOne(
+                {"session_id": session_id, "is_active": True},
+                {"$set": {"last_activity": last_activity}}
+            )
+            for session_id, last_activity in pending.items()
+        ]
+
+        try:
+            db: AsyncIOMotorDatabase = await self.get_database()
+            await db[self.collection].bulk_write(operations, ordered=False)
+            self._flushes += 1
+            self._sessions_written += len(operations)
+        except asyncio.CancelledError:
+            # El lote ya salió de _pending: devolverlo antes de propagar la cancelación
+            self._requeue(pending)
+            raise
+        except Exception as e:
+            self._errors += 1
+            print(f"Error persistiendo actividad de sesiones: {e}")
+            self._requeue(pending)
+
+    def _requeue(self, pending: Dict[str, datetime]):
+        """Reintentar en el siguiente flush sin pisar actividad más reciente"""
+        for session_id, last_activity in pending.items():
+            if self._pending.get(session_id, last_activity) <= last_activity:
+                self._pending[session_id] = last_activity
+
+    async def _run(self):
+        """Tarea en segundo plano que hace flush periódicamente hasta que se pide detenerla"""
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    def start(self):
+        """Inicia la tarea de flush periódico"""
+        if self._task is None or self._task.done():
+            self._stopping = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Detiene la tarea sin cortar un flush en curso y persiste lo pendiente"""
+        if self._task is not None:
+            self._stopping.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna métricas del tracker"""
+        return {
+            "flush_interval_seconds": self.flush_interval,
+            "pending_sessions": len(self._pending),
+            "touches": self._touches,
+            "flushes": self._flushes,
+            "sessions_written": self._sessions_written,
+            "errors": self._errors
+        }
+
+
+# Instancia global del tracker de actividad de sesiones
+session_tracker = SessionActivityTracker(flush_interval=settings.session_flush_interval_seconds)
@@ -0,0 +1,280 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from config.settings import settings
+from utils.exceptions import ValidationException
+
+
+class ReservationStatus:
+    HELD = "held"
+    CONSUMED = "consumed"
+    RELEASED = "released"
+
+
+class StockReservationService:
+    """Reservas de stock por cuenta
+
+    Cada cuenta tiene un único documento en `stock_reservations` con sus
+    cantidades por producto. Reservar descuenta el stock en el momento (un
+    bulk_write condicionado para toda la cuenta, ver
+    ProductService.apply_stock_deltas); el pago convierte la reserva en
+    definitiva y la cancelación o el vencimiento devuelven el stock.
+
+    Un índice TTL no puede devolver stock al borrar, así que el vencimiento
+    lo aplica una tarea periódica sobre `expires_at`; el índice TTL sobre
+    `closed_at` solo purga las reservas ya consumidas o liberadas.
+    """
+
+    def __init__(
+        self,
+        collection: str = "stock_reservations",
+        hold_seconds: float = 86400,
+        retention_seconds: float = 7 * 86400,
+        sweep_interval: float = 60.0
+    ):
+        self.collection = collection
+        self.hold_seconds = hold_seconds
+        self.retention_seconds = retention_seconds
+        self.sweep_interval = sweep_interval
+        self._task: Optional[asyncio.Task] = None
+
+        # Métricas
+        self._reserved = 0
+        self._rejected = 0
+        self._consumed = 0
+        self._released = 0
+        self._expired = 0
+        self._errors = 0
+
+    async def get_database(self):
+        """Obtiene la base de datos - importación diferida para evitar circular imports"""
+        from config.database import get_database
+        return await get_database()
+
+    async def get_product_service(self):
+        """Obtiene el servicio de productos - importación diferida"""
+        from services.product_service import product_service
+        return product_service
+
+    async def ensure_indexes(self):
+        """Crea el índice único por cuenta, el de vencimiento y el TTL de purga"""
+        db: AsyncIOMotorDatabase = await self.get_database()
+        await db[self.collection].create_index("account_id", unique=True)
+        await db[self.collection].create_index([("status", 1), ("expires_at", 1)])
+        await db[self.collection].create_index("closed_at", expireAfterSeconds=int(self.retention_seconds))
+
+    @staticmethod
+    def _quantities(items: List[Tuple[str, int]]) -> Dict[str, int]:
+        """Cantidades por producto (un producto puede repetirse en la cuenta)"""
+        quantities: Dict[str, int] = {}
+        for product_id, quantity in items:
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        return quantities
+
+    async def _take(self, quantities: Dict[str, int], labels: Optional[Dict[str, str]] = None):
+        """Descuenta todas las cantidades o ninguna
+
+        apply_stock_deltas informa exactamente qué se aplicó aun si el
+        bulk_write falla a medias, así que la compensación devuelve solo eso.
+        """
+        product_service = await self.get_product_service()
+        applied, _, failed = await product_service.apply_stock_deltas(
+            {product_id: -quantity for product_id, quantity in quantities.items()}
+        )
+        if len(applied) == len(quantities):
+            return
+
+        # Compensar lo que sí se descontó
+        await self._give_back({product_id: quantities[product_id] for product_id in applied})
+        if failed:
+            raise ValidationException("Error al reservar stock, reintentar")
+        self._rejected += 1
+        labels = labels or {}
+        missing = [labels.get(product_id, product_id) for product_id in quantities if product_id not in applied]
+        raise ValidationException(f"Stock insuficiente para los productos: {', '.join(missing)}")
+
+    async def _give_back(self, quantities: Dict[str, int]):
+        """Devuelve cantidades al stock"""
+        product_service = await self.get_product_service()
+        _, _, failed = await product_service.apply_stock_deltas(quantities)
+        for product_id, error in failed.items():
+            print(f"Stock no devuelto al producto {product_id} ({quantities[product_id]} unidades): {error}")
+
+    async def reserve(self, account_id: str, items: List[Tuple[str, int]], labels: Optional[Dict[str, str]] = None):
+        """Reserva el stock de una cuenta; lanza ValidationException si no alcanza
+
+        `labels` (product_id -> nombre) solo se usa en el mensaje de error.
+        """
+        db: AsyncIOMotorDatabase = await self.get_database()
+        quantities = self._quantities(items)
+        await self._take(quantities, labels)
+
+        now = datetime.utcnow()
+        try:
+            await db[self.collection].update_one(
+                {"account_id": account_id},
+                {
+                    "$set": {
+                        "items": [{"product_id": product_id, "quantity": quantity} for product_id, quantity in quantities.items()],
+                        "status": ReservationStatus.HELD,
+                        "expires_at": now + timedelta(seconds=self.hold_seconds),
+                        "updated_at": now
+                    },
+                    "$setOnInsert": {"created_at": now},
+                    "$unset": {"closed_at": "", "close_reason": ""}
+                },
+                upsert=True
+            )
+        except Exception:
+            await self._give_back(quantities)
+            raise
+        self._reserved += 1
+
+    async def _close(self, account_id: str, status: str, reason: str) -> Optional[dict]:
+        """Cierra la reserva activa de una cuenta; solo un llamador la obtiene"""
+        db: AsyncIOMotorDatabase = await self.get_database()
+        now = datetime.utcnow()
+        return await db[self.collection].find_one_and_update(
+            {"account_id": account_id, "status": ReservationStatus.HELD},
+            {"$set": {"status": status, "close_reason": reason, "closed_at": now, "updated_at": now}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    @staticmethod
+    def _items_of(reservation: dict) -> Dict[str, int]:
+        return {item["product_id"]: item["quantity"] for item in reservation.get("items", [])}
+
+    async def release(self, account_id: str, reason: str = "cancelled") -> bool:
+        """Libera la reserva de una cuenta y devuelve el stock"""
+        reservation = await self._close(account_id, ReservationStatus.RELEASED, reason)
+        if reservation is None:
+            return False
+        await self._give_back(self._items_of(reservation))
+        if reason == "expired":
+            self._expired += 1
+        else:
+            self._released += 1
+        return True
+
+    async def replace(self, account_id: str, items: List[Tuple[str, int]], labels: Optional[Dict[str, str]] = None):
+        """Cambia las cantidades reservadas de una cuenta (ítems editados)
+
+        Si el nuevo pedido no alcanza se intenta restaurar la reserva anterior
+        y se propaga la ValidationException.
+        """
+        db: AsyncIOMotorDatabase = await self.get_database()
+        previous = await db[self.collection].find_one({"account_id": account_id, "status": ReservationStatus.HELD})
+        await self.release(account_id, reason="replaced")
+        try:
+            await self.reserve(account_id, items, labels)
+        except ValidationException:
+            if previous is not None:
+                try:
+                    await self.reserve(account_id, list(self._items_of(previous).items()))
+                except ValidationException:
+                    print(f"Reserva de la cuenta {account_id} no restaurada: stock insuficiente")
+            raise
+
+    async def consume(self, account_id: str, items: List[Tuple[str, int]]) -> List[str]:
+        """Convierte la reserva de una cuenta pagada en descuento definitivo
+
+        Si la reserva ya había vencido se descuenta el stock en ese momento; el
+        pago no se rechaza por falta de stock y se retornan los productos que no
+        se pudieron descontar.
+        """
+        reservation = await self._close(account_id, ReservationStatus.CONSUMED, "paid")
+        if reservation is not None:
+            self._consumed += 1
+            return []
+
+        product_service = await self.get_product_service()
+        quantities = self._quantities(items)
+        applied, _, _ = await product_service.apply_stock_deltas(
+            {product_id: -quantity for product_id, quantity in quantities.items()}
+        )
+
+        db: AsyncIOMotorDatabase = await self.get_database()
+        now = datetime.utcnow()
+        await db[self.collection].update_one(
+            {"account_id": account_id},
+            {
+                "$set": {
+                    "items": [{"product_id": product_id, "quantity": quantities[product_id]} for product_id in applied],
+                    "status": ReservationStatus.CONSUMED,
+                    "close_reason": "paid",
+                    "closed_at": now,
+                    "updated_at": now
+                },
+                "$setOnInsert": {"created_at": now}
+            },
+            upsert=True
+        )
+        self._consumed += 1
+        return [product_id for product_id in quantities if product_id not in applied]
+
+    async def extend(self, account_id: str):
+        """Renueva el vencimiento de la reserva (ej. después de un pago parcial)"""
+        db: AsyncIOMotorDatabase = await self.get_database()
+        await db[self.collection].update_one(
+            {"account_id": account_id, "status": ReservationStatus.HELD},
+            {"$set": {"expires_at": datetime.utcnow() + timedelta(seconds=self.hold_seconds)}}
+        )
+
+    async def release_expired(self, limit: int = 500) -> int:
+        """Libera las reservas vencidas de cuentas que no se pagaron"""
+        db: AsyncIOMotorDatabase = await self.get_database()
+        cursor = db[self.collection].find(
+            {"status": ReservationStatus.HELD, "expires_at": {"$lt": datetime.utcnow()}},
+            {"account_id": 1}
+        ).limit(limit)
+        released = 0
+        async for reservation in cursor:
+            if await self.release(reservation["account_id"], reason="expired"):
+                released += 1
+        return released
+
+    async def _run(self):
+        """Tarea en segundo plano que libera reservas vencidas"""
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.release_expired()
+            except Exception as e:
+                self._errors += 1
+                print(f"Error liberando reservas vencidas: {e}")
+
+    def start(self):
+        """Inicia la liberación periódica de reservas vencidas"""
+        if self.sweep_interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Detiene la tarea periódica"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna métricas de reservas"""
+        return {
+            "reserved": self._reserved,
+            "rejected": self._rejected,
+            "consumed": self._consumed,
+            "released": self._released,
+            "expired": self._expired,
+            "errors": self._errors
+        }
+
+
+# Instancia global del servicio de reservas
+stock_reservation_service = StockReservationService(
+    hold_seconds=settings.stock_reservation_hold_seconds,
+    retention_seconds=settings.stock_reservation_retention_seconds,
+    sweep_interval=settings.stock_reservation_sweep_seconds
+)
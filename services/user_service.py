@@ -1,13 +1,17 @@
+import asyncio
 from datetime import datetime
 from typing import List, Optional, Dict, Any
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
 from models.user import User, UserRole, UserStatus
 from schemas.user import UserCreate, UserUpdate, UserResponse
-from utils.security import get_password_hash
 from utils.validators import validate_password_policy, validate_email
-from utils.exceptions import ValidationException, NotFoundException
+from utils.exceptions import ValidationException, NotFoundException, ServiceUnavailableException
+from utils.pagination import apply_keyset, keyset_sort, next_cursor
+from utils.count_cache import count_cache
+from utils.collection_versions import collection_versions
 from services.encryption_service import encryption_service
+from services.hashing_service import hashing_service
 
 
 class UserService:
@@ -24,6 +28,16 @@ class UserService:
         from services.audit_service import audit_service
         return audit_service
     
+    async def ensure_indexes(self):
+        """Crea el índice de paginación por fecha de creación"""
+        db: AsyncIOMotorDatabase = await self.get_database()
+        await db[self.collection].create_index([("created_at", -1), ("_id", -1)])
+    
+    async def get_auth_service(self):
+        """Obtiene el servicio de autenticación - importación diferida"""
+        from services.auth_service import auth_service
+        return auth_service
+    
     def _prepare_user_from_doc(self, user_doc: dict, include_password: bool = False) -> User:
         """Prepara un objeto User desde un documento de MongoDB"""
         # Crear una copia del documento
@@ -69,6 +83,9 @@ class UserService:
             if existing_username:
                 raise ValidationException("El nombre de usuario ya está en uso")
             
+            # Generar hash fuera del event loop
+            hashed_password = await hashing_service.hash_password(user_data.password)
+            
             # Crear usuario
             user = User(
                 email=user_data.email,
@@ -77,7 +94,7 @@ class UserService:
                 phone=user_data.phone,
                 address=user_data.address,
                 role=user_data.role,
-                hashed_password=get_password_hash(user_data.password)
+                hashed_password=hashed_password
             )
             
             # Cifrar campos sensibles
@@ -90,6 +107,7 @@ class UserService:
             # Insertar en base de datos
             result = await db[self.collection].insert_one(user_doc)
             user.id = str(result.inserted_id)
+            collection_versions.bump(self.collection)
             
             # Log de auditoría con acción válida
             await audit_service.log_action(
@@ -109,7 +127,7 @@ class UserService:
             
             return user
             
-        except ValidationException:
+        except (ValidationException, ServiceUnavailableException):
             raise
         except Exception as e:
             print(f"Error en create_user: {e}")
@@ -217,6 +235,11 @@ class UserService:
                 {"_id": ObjectId(user_id)},
                 {"$set": update_data}
             )
+            collection_versions.bump(self.collection)
+            
+            # Invalidar el usuario cacheado para las siguientes peticiones
+            auth_service = await self.get_auth_service()
+            auth_service.invalidate_principal(user_id)
             
             # Log de auditoría con acción válida
             await audit_service.log_action(
@@ -273,6 +296,11 @@ class UserService:
                     }
                 }
             )
+            collection_versions.bump(self.collection)
+            
+            # Invalidar el usuario cacheado para cortar el acceso de inmediato
+            auth_service = await self.get_auth_service()
+            auth_service.invalidate_principal(user_id)
             
             # Log de auditoría con acción válida
             await audit_service.log_action(
@@ -305,9 +333,15 @@ class UserService:
         size: int = 50,
         role: Optional[UserRole] = None,
         status: Optional[UserStatus] = None,
-        search: Optional[str] = None
+        search: Optional[str] = None,
+        cursor: Optional[str] = None,
+        estimated: bool = False
     ) -> Dict[str, Any]:
-        """Obtiene lista de usuarios con paginación y filtros"""
+        """Obtiene lista de usuarios con paginación y filtros
+
+        Con `cursor` continúa después del último usuario de la página anterior
+        sin recorrer los documentos saltados. Con `estimated` el total es aproximado.
+        """
         try:
             db: AsyncIOMotorDatabase = await self.get_database()
             
@@ -327,14 +361,15 @@ class UserService:
                     {"username": {"$regex": search, "$options": "i"}}
                 ]
             
-            # Contar total
-            total = await db[self.collection].count_documents(query)
-            
-            # Obtener usuarios paginados - INCLUYENDO hashed_password
-            skip = (page - 1) * size
-            cursor = db[self.collection].find(query).sort("created_at", -1).skip(skip).limit(size)
+            # Obtener usuarios paginados - INCLUYENDO hashed_password - y el total en paralelo
+            results = db[self.collection].find(apply_keyset(query, "created_at", cursor)).sort(keyset_sort("created_at"))
+            if not cursor:
+                results = results.skip((page - 1) * size)
             
-            users_docs = await cursor.to_list(length=size)
+            (total, total_estimated), users_docs = await asyncio.gather(
+                count_cache.count(db[self.collection], query, estimated=estimated),
+                results.limit(size).to_list(length=size)
+            )
             
             # Convertir a response SIN incluir password
             users = []
@@ -358,10 +393,14 @@ class UserService:
             return {
                 "users": users,
                 "total": total,
+                "total_estimated": total_estimated,
                 "page": page,
-                "size": size
+                "size": size,
+                "next_cursor": next_cursor(users_docs, "created_at", size)
             }
             
+        except ValidationException:
+            raise
         except Exception as e:
             print(f"Error en get_users: {e}")
             import traceback
@@ -369,8 +408,10 @@ class UserService:
             return {
                 "users": [],
                 "total": 0,
+                "total_estimated": False,
                 "page": page,
-                "size": size
+                "size": size,
+                "next_cursor": None
             }
     
     async def get_clients(self) -> List[UserResponse]:
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from middleware.admission_middleware import AdmissionControlMiddleware
+from utils.admission import AdmissionController
+
+
+def make_controller(max_in_flight: int = 2) -> AdmissionController:
+    return AdmissionController(
+        {
+            "critical": {"priority": 0, "limit": 2, "queue": 5, "timeout": 1.0},
+            "bulk": {"priority": 1, "limit": 2, "queue": 1, "timeout": 0.05}
+        },
+        [
+            {"prefix": "/accounts", "class": "critical"},
+            {"prefix": "/health", "exempt": True}
+        ],
+        "bulk",
+        max_in_flight=max_in_flight
+    )
+
+
+def test_classify_uses_prefix_default_and_exempt():
+    controller = make_controller()
+    assert controller.classify("/accounts/123/pay").name == "critical"
+    assert controller.classify("/products/").name == "bulk"
+    assert controller.classify("/health") is None
+
+    with pytest.raises(ValueError):
+        AdmissionController({}, [], "bulk")
+
+
+@pytest.mark.asyncio
+async def test_higher_priority_waiters_get_freed_slots_first():
+    controller = make_controller()
+    critical, bulk = controller.classes["critical"], controller.classes["bulk"]
+    assert await controller.acquire(bulk)
+    assert await controller.acquire(bulk)
+
+    # Cupo global lleno: ambos esperan, pero el primer cupo liberado es del crítico
+    bulk_waiter = asyncio.create_task(controller.acquire(bulk))
+    await asyncio.sleep(0)
+    critical_waiter = asyncio.create_task(controller.acquire(critical))
+    await asyncio.sleep(0)
+
+    controller.release(bulk)
+    assert await critical_waiter
+    assert not bulk_waiter.done()
+
+    # La cola de bulk admite uno solo y su plazo es corto
+    assert not await controller.acquire(bulk)
+    assert not await bulk_waiter
+    stats = controller.get_stats()["classes"]["bulk"]
+    assert stats["shed_queue_full"] == 1 and stats["shed_timeout"] == 1
+    assert controller.in_flight == 2
+
+
+@pytest.mark.asyncio
+async def test_middleware_sheds_with_retry_after_and_releases_slot():
+    controller = make_controller(max_in_flight=1)
+    gate = asyncio.Event()
+
+    async def app(scope, receive, send):
+        await gate.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    middleware = AdmissionControlMiddleware(app, controller)
+
+    async def request(path: str) -> list:
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        await middleware({"type": "http", "path": path, "method": "GET", "headers": []}, receive, send)
+        return messages
+
+    first = asyncio.create_task(request("/products/"))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(request("/products/"))
+    await asyncio.sleep(0)
+    shed = await request("/products/")
+    assert shed[0]["status"] == 503
+    assert (b"retry-after", b"1") in shed[0]["headers"]
+
+    gate.set()
+    assert (await first)[0]["status"] == 200
+    assert (await second)[0]["status"] == 200
+    assert controller.in_flight == 0
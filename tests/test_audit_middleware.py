@@ -0,0 +1,66 @@
+import pytest
+
+from middleware.audit_middleware import AuditMiddleware
+from services.audit_service import audit_service
+from utils.audit_context import get_audit_context
+
+
+@pytest.fixture
+def logged(monkeypatch):
+    records = []
+
+    async def log_to_file(record):
+        records.append(record)
+
+    monkeypatch.setattr(audit_service, "log_to_file", log_to_file)
+    return records
+
+
+async def call(middleware, path: str = "/products/1", method: str = "PUT"):
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    scope = {
+        "type": "http", "method": method, "path": path, "headers": [],
+        "query_string": b"", "client": ("10.0.0.1", 1234)
+    }
+    await middleware(scope, receive, send)
+
+
+@pytest.mark.asyncio
+async def test_failed_request_keeps_collected_domain_events(logged):
+    async def app(scope, receive, send):
+        get_audit_context().add({
+            "action": "update", "resource": "product", "resource_id": "1",
+            "details": {"stock": 3}, "success": True
+        })
+        raise RuntimeError("fallo después de actualizar")
+
+    with pytest.raises(RuntimeError):
+        await call(AuditMiddleware(app))
+
+    assert len(logged) == 1
+    record = logged[0]
+    assert record["resource_id"] == "1"
+    assert record["details"]["status_code"] == 500
+    assert record["details"]["stock"] == 3
+    assert record["success"] is False
+    assert get_audit_context() is None
+
+
+@pytest.mark.asyncio
+async def test_successful_request_merges_events_into_one_record(logged):
+    async def app(scope, receive, send):
+        get_audit_context().add({"action": "update", "resource": "product", "details": {}, "success": True})
+        get_audit_context().add({"action": "update", "resource": "account", "details": {}, "success": True})
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    await call(AuditMiddleware(app))
+
+    assert len(logged) == 1
+    assert logged[0]["details"]["status_code"] == 200
+    assert logged[0]["details"]["related"][0]["resource"] == "account"
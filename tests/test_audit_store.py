@@ -0,0 +1,56 @@
+import threading
+from datetime import datetime, timedelta
+
+from services.audit_store import AuditSegmentStore
+
+
+def make_records(start: datetime, count: int) -> list:
+    return [
+        {"timestamp": (start + timedelta(seconds=i)).isoformat(), "action": "read", "sequence": i}
+        for i in range(count)
+    ]
+
+
+def test_query_returns_records_from_closed_and_open_segments(tmp_path):
+    store = AuditSegmentStore(str(tmp_path), index_every=4)
+    start = datetime(2026, 1, 1, 10, 0, 0)
+    store.append(make_records(start, 10))
+    store.rotate()
+    store.append(make_records(start + timedelta(seconds=10), 5))
+
+    records = store.query(date_from=start + timedelta(seconds=8), date_to=start + timedelta(seconds=12))
+    assert [record["sequence"] for record in records] == [8, 9, 0, 1, 2]
+    store.close()
+
+
+def test_query_while_another_thread_appends_and_rotates(tmp_path):
+    store = AuditSegmentStore(str(tmp_path), index_every=8)
+    start = datetime(2026, 1, 1, 10, 0, 0)
+    errors = []
+    done = threading.Event()
+
+    def writer():
+        try:
+            for batch in range(200):
+                store.append(make_records(start + timedelta(seconds=batch * 5), 5))
+                if batch % 3 == 0:
+                    store.rotate()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            done.set()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    while not done.is_set():
+        try:
+            for record in store.query(limit=10000):
+                assert record["action"] == "read"
+        except Exception as e:
+            errors.append(e)
+            break
+    thread.join()
+
+    assert errors == []
+    store.close()
+    assert len(store.query(limit=10000)) == 1000
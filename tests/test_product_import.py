@@ -0,0 +1,35 @@
+import pytest
+
+from services.product_import import iter_csv_rows, parse_import_row
+from utils.validators import contains_blocked_pattern
+
+
+async def chunks(data: bytes, size: int = 7):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def test_blocked_content_is_rejected_like_security_middleware():
+    row = {"name": "javascript:alert(1) onerror=x", "description": "document.cookie eval(1)", "price": "10"}
+    with pytest.raises(ValueError, match="contenido bloqueado"):
+        parse_import_row(row)
+
+    assert contains_blocked_pattern("<SCRIPT>alert(1)</SCRIPT>")
+    assert not contains_blocked_pattern("Galletitas de agua")
+
+
+def test_text_fields_are_sanitized_and_blanks_use_defaults():
+    product = parse_import_row({"name": "  Café <b>", "price": "12.5", "brand": "", "stock": "3"})
+    assert product.name == "Café b"
+    assert product.brand is None
+    assert product.stock == 3
+
+
+@pytest.mark.asyncio
+async def test_csv_rows_with_quoted_newlines_across_chunks():
+    data = 'name,description,price\nLeche,"Entera, 1 L\nsachet",10\nPan,,5\n'.encode()
+    rows = [row async for row in iter_csv_rows(chunks(data))]
+    assert rows == [
+        (1, {"name": "Leche", "description": "Entera, 1 L\nsachet", "price": "10"}),
+        (2, {"name": "Pan", "description": "", "price": "5"})
+    ]
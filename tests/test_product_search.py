@@ -0,0 +1,137 @@
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from services.catalog_cache import CatalogCache
+from services.low_stock_feed import low_stock_feed
+from services.product_search import ProductSearchIndex, fold_text
+
+
+def make_doc(name: str, brand: str = "Marca", stock: int = 10, min_stock: int = 1) -> dict:
+    now = datetime(2026, 1, 1, 12, 0, 0, 123000)
+    return {
+        "_id": ObjectId(), "name": name, "price": 10.0, "category": "food", "brand": brand,
+        "stock": stock, "min_stock": min_stock, "status": "active", "created_at": now, "updated_at": now
+    }
+
+
+class SlowCursor:
+    """Cursor asíncrono que cede el control entre documentos (como un cursor de Motor por lotes)"""
+
+    def __init__(self, docs: list, fail_after: int = None):
+        self.docs = list(docs)
+        self.fail_after = fail_after
+        self.read = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await asyncio.sleep(0)
+        if self.fail_after is not None and self.read == self.fail_after:
+            raise ConnectionError("cursor cortado")
+        if self.read == len(self.docs):
+            raise StopAsyncIteration
+        self.read += 1
+        return dict(self.docs[self.read - 1])
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.docs = []
+        self.fail_after = None
+
+    def __getitem__(self, name):
+        return self
+
+    def find(self, query):
+        return SlowCursor(self.docs, self.fail_after)
+
+
+@pytest.fixture
+def catalog():
+    database = FakeDatabase()
+    cache = CatalogCache(refresh_interval=0)
+
+    async def get_database():
+        return database
+
+    cache.get_database = get_database
+    return cache, database
+
+
+def test_search_index_prefix_ranking_and_remove():
+    index = ProductSearchIndex()
+    index.add("1", "Leche entera", "La Serenísima", True)
+    index.add("2", "Dulce de leche", "Sancor", True)
+    index.add("3", "Lechuga", None, False)
+
+    assert index.search("lech") == ["1", "2"]
+    assert index.search("lech", active_only=False) == ["1", "3", "2"]
+    assert index.search("leche seren") == ["1"]
+    assert fold_text("Serenísima") == "serenisima"
+
+    index.remove("1")
+    assert index.search("leche") == ["2"]
+    assert len(index) == 2
+
+
+@pytest.mark.asyncio
+async def test_search_during_reload_never_sees_uncommitted_products(catalog):
+    cache, database = catalog
+    database.docs = [make_doc(f"Galletitas {i}") for i in range(5)]
+    await cache.load()
+
+    database.docs = database.docs + [make_doc(f"Galletitas nuevas {i}") for i in range(50)]
+    reload = asyncio.create_task(cache.load())
+    while not reload.done():
+        # Mientras corre la recarga solo aparecen productos con entrada
+        assert len(json.loads(cache.search_json("galletitas", limit=100))) == 5
+        await asyncio.sleep(0)
+    await reload
+
+    assert len(json.loads(cache.search_json("galletitas", limit=100))) == 55
+
+
+@pytest.mark.asyncio
+async def test_failed_reload_leaves_index_and_feed_untouched(catalog):
+    cache, database = catalog
+    product = make_doc("Yerba", stock=10, min_stock=5)
+    database.docs = [product]
+    await cache.load()
+    version = cache.version
+
+    queue = low_stock_feed.subscribe()
+    try:
+        # El producto cruza el umbral, pero la recarga falla antes de terminar
+        database.docs = [{**product, "stock": 2}] + [make_doc(f"Yerba nueva {i}") for i in range(10)]
+        database.fail_after = 5
+        await cache.load()
+
+        assert cache.version == version
+        assert len(cache.search_index) == 1
+        assert queue.empty()
+
+        # La recarga siguiente aplica el cambio y publica el cruce una sola vez
+        database.fail_after = None
+        await cache.load()
+        assert len(cache.search_index) == 11
+        assert queue.qsize() == 1
+        assert b"event: low_stock" in queue.get_nowait()
+    finally:
+        low_stock_feed.unsubscribe(queue)
+
+
+@pytest.mark.asyncio
+async def test_unchanged_reload_keeps_version(catalog):
+    cache, database = catalog
+    database.docs = [make_doc("Arroz"), make_doc("Fideos")]
+    await cache.load()
+    version, etag = cache.version, cache.get_active_etag()
+
+    await cache.load()
+    assert cache.version == version
+    assert cache.get_active_etag() == etag
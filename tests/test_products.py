@@ -0,0 +1,77 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+import services.product_service as product_service_module
+from models.product import Product
+from services.catalog_cache import CatalogCache
+from services.product_service import ProductService
+
+
+def as_stored(product_doc: dict) -> dict:
+    """Copia del documento como lo devuelve MongoDB (fechas con milisegundos)"""
+    return {
+        key: value.replace(microsecond=value.microsecond // 1000 * 1000) if isinstance(value, datetime) else value
+        for key, value in product_doc.items()
+    }
+
+
+class FakeProducts:
+    def __init__(self):
+        self.docs = {}
+
+    def __getitem__(self, name):
+        return self
+
+    async def insert_one(self, product_doc):
+        product_doc["_id"] = ObjectId()
+        self.docs[product_doc["_id"]] = as_stored(product_doc)
+
+    async def find_one(self, query, projection=None):
+        product_doc = self.docs.get(query["_id"])
+        return dict(product_doc) if product_doc else None
+
+    def find(self, query):
+        async def cursor():
+            for product_doc in list(self.docs.values()):
+                yield dict(product_doc)
+        return cursor()
+
+
+@pytest.fixture
+def products(monkeypatch):
+    database = FakeProducts()
+    cache = CatalogCache(refresh_interval=0)
+
+    async def get_database():
+        return database
+
+    cache.get_database = get_database
+    service = ProductService()
+    service.get_database = get_database
+    monkeypatch.setattr(product_service_module, "catalog_cache", cache)
+    return service, cache, database
+
+
+@pytest.mark.asyncio
+async def test_created_product_matches_what_mongo_stores(products):
+    service, cache, database = products
+    await cache.load()
+
+    product = Product(name="Yerba", price=10.0, stock=5, created_at=datetime(2026, 1, 1, 12, 0, 0, 123456))
+    product_doc = service._new_product_doc(product)
+    await database.insert_one(product_doc)
+    cache.upsert(product_doc)
+    product_id = str(product_doc["_id"])
+    version, etag = cache.version, cache.get_active_etag()
+
+    # El JSON de la caché se reutiliza porque updated_at coincide con MongoDB
+    content, updated_at = await service.get_product_json(product_id)
+    assert content is cache.get_by_id(product_id)[0]
+    assert product.created_at.microsecond == 123000
+
+    # Una recarga no ve cambios: la versión y el ETag de /products/active se mantienen
+    await cache.load()
+    assert cache.version == version
+    assert cache.get_active_etag() == etag
@@ -0,0 +1,164 @@
+import uuid
+from multiprocessing import resource_tracker
+
+import pytest
+
+import utils.rate_limiter as rate_limiter_module
+from utils.rate_limiter import LeasedWindowLimiter, SharedMemoryRateLimiter, TokenBucketLimiter
+
+
+class FakeStoreLimiter(LeasedWindowLimiter):
+    """Limitador con almacén en un diccionario (compartible entre "workers")"""
+
+    def __init__(self, store: dict, **kwargs):
+        super().__init__(**kwargs)
+        self.store = store
+        self.fail = False
+
+    async def _lease(self, key, window_end, amount, capacity, returned=0):
+        if self.fail:
+            raise ConnectionError("almacén caído")
+        previous = max(0, self.store.get((key, window_end), 0) - returned)
+        granted = self._granted(capacity, previous, amount)
+        self.store[(key, window_end)] = previous + granted
+        return granted
+
+
+class Clock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Inicio exacto de una ventana de 60 s
+    clock = Clock(6000.0)
+    monkeypatch.setattr(rate_limiter_module.time, "time", clock)
+    return clock
+
+
+def test_token_bucket_limits_and_refills():
+    limiter = TokenBucketLimiter(capacity=3, period=3.0)
+    assert [limiter.try_acquire("ip", now=0.0)[0] for _ in range(4)] == [True, True, True, False]
+
+    allowed, retry_after = limiter.try_acquire("ip", now=0.0)
+    assert not allowed and retry_after == pytest.approx(1.0)
+    assert limiter.try_acquire("ip", now=1.0)[0]
+
+
+def test_token_bucket_bounds_tracked_keys():
+    limiter = TokenBucketLimiter(capacity=5, period=60.0, max_keys=10)
+    for i in range(50):
+        limiter.try_acquire(f"ip-{i}", now=0.0)
+    assert len(limiter) == 10
+    assert limiter.evictions == 40
+
+
+@pytest.mark.asyncio
+async def test_spaced_requests_do_not_waste_leased_tokens(clock):
+    store = {}
+    limiter = FakeStoreLimiter(store, capacity=100, period=60.0, lease_size=10, lease_seconds=1.0)
+
+    # Una request cada 2 s: cada arriendo vence antes de la siguiente request
+    allowed = 0
+    for i in range(30):
+        clock.now = 6000.0 + 2 * i
+        allowed += (await limiter.acquire("client"))[0]
+
+    assert allowed == 30
+    # El almacén cuenta lo usado más el arriendo vigente, no lease_size por request
+    assert store[("client", 6060)] <= 30 + limiter.lease_size
+
+
+@pytest.mark.asyncio
+async def test_spaced_requests_still_respect_capacity(clock):
+    store = {}
+    limiter = FakeStoreLimiter(store, capacity=20, period=60.0, lease_size=10, lease_seconds=1.0)
+
+    results = []
+    for i in range(30):
+        clock.now = 6000.0 + 2 * i
+        results.append((await limiter.acquire("client"))[0])
+
+    assert results.count(True) == 20
+    assert not any(results[20:])
+
+
+@pytest.mark.asyncio
+async def test_workers_share_window_with_bounded_drift(clock):
+    store = {}
+    first = FakeStoreLimiter(store, capacity=20, period=60.0, lease_size=10, lease_seconds=1.0)
+    second = FakeStoreLimiter(store, capacity=20, period=60.0, lease_size=10, lease_seconds=1.0)
+
+    # Al vencer el arriendo, la siguiente request devuelve el saldo y arrienda de nuevo
+    assert (await first.acquire("client"))[0]
+    clock.now += 2
+    assert (await first.acquire("client"))[0]
+    assert store[("client", 6060)] == 2 + 9
+
+    # El otro worker usa todo salvo el saldo vigente del primero (menos de lease_size)
+    allowed = 0
+    for _ in range(30):
+        allowed += (await second.acquire("client"))[0]
+    assert allowed == 20 - 11
+
+
+@pytest.mark.asyncio
+async def test_window_exhaustion_is_cached_until_lease_expires(clock):
+    store = {}
+    limiter = FakeStoreLimiter(store, capacity=5, period=60.0, lease_size=5, lease_seconds=1.0)
+
+    for _ in range(5):
+        assert (await limiter.acquire("client"))[0]
+    calls = limiter.store_calls
+    allowed, retry_after = await limiter.acquire("client")
+    assert not allowed and retry_after == pytest.approx(60.0)
+    assert not (await limiter.acquire("client"))[0]
+    assert limiter.store_calls == calls + 1
+
+    # Nueva ventana: vuelve a haber tokens
+    clock.now = 6060.0
+    assert (await limiter.acquire("client"))[0]
+
+
+@pytest.mark.asyncio
+async def test_store_failure_does_not_block_traffic(clock):
+    limiter = FakeStoreLimiter({}, capacity=5, period=60.0, lease_size=5)
+    limiter.fail = True
+    assert all([(await limiter.acquire("client"))[0] for _ in range(10)])
+    assert limiter.store_errors == 10
+
+
+@pytest.mark.asyncio
+async def test_shared_memory_returns_lapsed_lease(clock):
+    limiter = SharedMemoryRateLimiter(
+        name=f"test_rate_limit_{uuid.uuid4().hex[:8]}", slots=64,
+        capacity=100, period=60.0, lease_size=10, lease_seconds=1.0
+    )
+    try:
+        allowed = 0
+        for i in range(30):
+            clock.now = 6000.0 + 2 * i
+            allowed += (await limiter.acquire("client"))[0]
+        assert allowed == 30
+
+        # Lo entregado en el almacén es lo usado más el arriendo vigente
+        limiter._open()
+        key_hash = limiter._hash("client")
+        slots = [limiter.SLOT.unpack_from(limiter._memory.buf, i * limiter.SLOT.size) for i in range(limiter.slots)]
+        count = next(slot_count for slot_hash, _, slot_count in slots if slot_hash == key_hash)
+        assert count <= 30 + limiter.lease_size
+    finally:
+        if limiter._memory is not None:
+            # El limitador se desregistra del resource_tracker; registrarlo de nuevo para poder borrarlo
+            resource_tracker.register(limiter._memory._name, "shared_memory")
+            limiter._memory.unlink()
+        limiter.close()
+
+
+def test_leased_limiter_requires_store():
+    with pytest.raises(TypeError):
+        LeasedWindowLimiter()
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from services.session_tracker import SessionActivityTracker
+
+
+class SlowSessions:
+    """Colección cuyo bulk_write tarda hasta que se abre la compuerta"""
+
+    def __init__(self):
+        self.gate = asyncio.Event()
+        self.started = asyncio.Event()
+        self.written = []
+
+    def __getitem__(self, name):
+        return self
+
+    async def bulk_write(self, operations, ordered=True):
+        self.started.set()
+        await self.gate.wait()
+        self.written.extend(operation._filter["session_id"] for operation in operations)
+
+
+@pytest.fixture
+def tracker():
+    database = SlowSessions()
+    tracker = SessionActivityTracker(flush_interval=0.01)
+
+    async def get_database():
+        return database
+
+    tracker.get_database = get_database
+    return tracker, database
+
+
+@pytest.mark.asyncio
+async def test_stop_during_flush_writes_every_session(tracker):
+    tracker, database = tracker
+    tracker.start()
+    tracker.touch("a")
+    tracker.touch("b")
+    await database.started.wait()
+
+    # Llega más actividad mientras el lote anterior se está escribiendo
+    tracker.touch("c")
+    stop = asyncio.create_task(tracker.stop())
+    await asyncio.sleep(0.05)
+    database.gate.set()
+    await stop
+
+    assert sorted(database.written) == ["a", "b", "c"]
+    assert tracker.get_stats()["pending_sessions"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_flush_keeps_its_batch(tracker):
+    tracker, database = tracker
+    tracker.touch("a")
+    flush = asyncio.create_task(tracker.flush())
+    await database.started.wait()
+    flush.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await flush
+
+    assert tracker.get_stats()["pending_sessions"] == 1
+    database.gate.set()
+    await tracker.flush()
+    assert database.written == ["a"]
@@ -0,0 +1,87 @@
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+import services.product_service as product_service_module
+from services.product_service import ProductService
+
+
+class Cursor:
+    def __init__(self, docs: list):
+        self.docs = iter(docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return dict(next(self.docs))
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeProducts:
+    """Colección de productos cuyo bulk_write puede fallar después de aplicar algunas operaciones"""
+
+    def __init__(self, docs: list, fail_ids=()):
+        self.docs = {doc["_id"]: doc for doc in docs}
+        self.fail_ids = set(fail_ids)
+
+    def __getitem__(self, name):
+        return self
+
+    async def bulk_write(self, operations, ordered=True):
+        write_errors = []
+        for index, operation in enumerate(operations):
+            query, update = operation._filter, operation._doc
+            doc = self.docs.get(query["_id"])
+            if query["_id"] in self.fail_ids:
+                write_errors.append({"index": index, "code": 11000, "errmsg": "E11000 duplicate key"})
+                continue
+            if doc is None or doc["stock"] < query["stock"]["$gte"]:
+                continue
+            doc["stock"] += update["$inc"]["stock"]
+            doc.setdefault("stock_ops", []).append(update["$push"]["stock_ops"])
+        if write_errors:
+            raise BulkWriteError({"writeErrors": write_errors, "nModified": len(operations) - len(write_errors)})
+
+    def find(self, query):
+        return Cursor([doc for doc in self.docs.values() if doc["_id"] in query["_id"]["$in"]])
+
+    async def update_many(self, query, update):
+        if "$pull" in update:
+            token = update["$pull"]["stock_ops"]
+            for doc in self.docs.values():
+                if token in doc.get("stock_ops", ()):
+                    doc["stock_ops"].remove(token)
+
+
+def make_doc(stock: int) -> dict:
+    return {"_id": ObjectId(), "name": "Producto", "stock": stock, "min_stock": 0, "status": "active"}
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(product_service_module.catalog_cache, "upsert", lambda doc: None)
+    return ProductService()
+
+
+@pytest.mark.asyncio
+async def test_partial_bulk_write_failure_reports_each_item(service):
+    ok, short, broken = make_doc(10), make_doc(1), make_doc(10)
+    database = FakeProducts([ok, short, broken], fail_ids=[broken["_id"]])
+
+    async def get_database():
+        return database
+
+    service.get_database = get_database
+    applied, insufficient, failed = await service.apply_stock_deltas(
+        {str(ok["_id"]): -3, str(short["_id"]): -3, str(broken["_id"]): -3}
+    )
+
+    assert list(applied) == [str(ok["_id"])]
+    assert insufficient == {str(short["_id"])}
+    assert list(failed) == [str(broken["_id"])]
+    # El ajuste aplicado queda y su token se retira igual
+    assert ok["stock"] == 7 and ok["stock_ops"] == []
+    assert broken["stock"] == 10
@@ -0,0 +1,196 @@
+import asyncio
+import math
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Optional
+from config.settings import settings
+from config.admission_policies import ADMISSION_CLASSES, ADMISSION_DEFAULT_CLASS, ADMISSION_ROUTES
+from utils.routing import PathPrefixTrie
+
+
+_CLASS_FIELDS = {"priority", "limit", "queue", "timeout"}
+_ROUTE_FIELDS = {"prefix", "class", "exempt"}
+
+
+class AdmissionClass:
+    """Estado de una clase de admisión: cupo, cola de espera y contadores"""
+
+    def __init__(self, name: str, priority: int, limit: int, queue: int, timeout: float):
+        self.name = name
+        self.priority = priority
+        self.limit = limit
+        self.queue_size = queue
+        self.timeout = timeout
+        self.in_flight = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+
+        # Contadores
+        self.admitted = 0
+        self.queued = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+        self.max_queue_depth = 0
+
+    @property
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.timeout))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "priority": self.priority,
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queue_depth": len(self.waiters),
+            "max_queue_depth": self.max_queue_depth,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_timeout": self.shed_timeout
+        }
+
+
+class AdmissionController:
+    """Control de admisión con límites de concurrencia por clase de ruta
+
+    Cada clase tiene su propio cupo de requests simultáneos y una cola acotada
+    con tiempo máximo de espera; además hay un cupo global (`max_in_flight`,
+    por debajo del pool de conexiones a MongoDB). Cuando se libera un cupo se
+    despierta primero a las clases de mayor prioridad. Lo que no entra en la
+    cola o no obtiene cupo a tiempo se descarta de inmediato.
+    """
+
+    def __init__(
+        self,
+        classes: Dict[str, dict],
+        routes: Iterable[dict],
+        default_class: str,
+        max_in_flight: int = 64
+    ):
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.classes: Dict[str, AdmissionClass] = {}
+        for name, config in classes.items():
+            unknown = set(config) - _CLASS_FIELDS
+            if unknown:
+                raise ValueError(f"Campos desconocidos en clase de admisión '{name}': {sorted(unknown)}")
+            self.classes[name] = AdmissionClass(name, **config)
+        self._by_priority = sorted(self.classes.values(), key=lambda item: item.priority)
+
+        if default_class not in self.classes:
+            raise ValueError(f"Clase de admisión por defecto desconocida: {default_class}")
+        self.default_class = self.classes[default_class]
+
+        # Las rutas exentas se marcan con un centinela para distinguirlas de "sin política"
+        self._routes = PathPrefixTrie()
+        self._exempt = object()
+        for route in routes:
+            unknown = set(route) - _ROUTE_FIELDS
+            if unknown:
+                raise ValueError(f"Campos desconocidos en ruta de admisión: {sorted(unknown)}")
+            if route.get("exempt"):
+                self._routes.insert(route["prefix"], self._exempt)
+            elif route.get("class") in self.classes:
+                self._routes.insert(route["prefix"], self.classes[route["class"]])
+            else:
+                raise ValueError(f"Ruta de admisión con clase desconocida: {route}")
+
+    def classify(self, path: str) -> Optional[AdmissionClass]:
+        """Retorna la clase del path, o None si está exento"""
+        matched = self._routes.match(path)
+        if matched is self._exempt:
+            return None
+        return matched or self.default_class
+
+    def _has_capacity(self, admission_class: AdmissionClass) -> bool:
+        return admission_class.in_flight < admission_class.limit and self.in_flight < self.max_in_flight
+
+    def _must_wait(self, admission_class: AdmissionClass) -> bool:
+        """Un request nuevo espera si no hay cupo o si alguien con igual o más prioridad ya espera"""
+        if not self._has_capacity(admission_class) or admission_class.waiters:
+            return True
+        for other in self._by_priority:
+            if other.priority >= admission_class.priority:
+                break
+            # Solo cuentan quienes esperan por el cupo global, no por el de su clase
+            if other.waiters and other.in_flight < other.limit:
+                return True
+        return False
+
+    def _start(self, admission_class: AdmissionClass):
+        admission_class.in_flight += 1
+        admission_class.admitted += 1
+        self.in_flight += 1
+
+    async def acquire(self, admission_class: AdmissionClass) -> bool:
+        """Obtiene un cupo para la clase; False si el request debe descartarse"""
+        if not self._must_wait(admission_class):
+            self._start(admission_class)
+            return True
+
+        if len(admission_class.waiters) >= admission_class.queue_size:
+            admission_class.shed_queue_full += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        admission_class.waiters.append(waiter)
+        admission_class.queued += 1
+        admission_class.max_queue_depth = max(admission_class.max_queue_depth, len(admission_class.waiters))
+
+        try:
+            await asyncio.wait_for(waiter, admission_class.timeout)
+            return True
+        except asyncio.TimeoutError:
+            # El cupo pudo concederse en el mismo ciclo en que venció el plazo
+            if waiter.done() and not waiter.cancelled():
+                return True
+            admission_class.shed_timeout += 1
+            self._discard(admission_class, waiter)
+            return False
+        except asyncio.CancelledError:
+            # Si el cupo se concedió justo antes de cancelar, devolverlo
+            if waiter.done() and not waiter.cancelled():
+                self.release(admission_class)
+            else:
+                self._discard(admission_class, waiter)
+            raise
+
+    def _discard(self, admission_class: AdmissionClass, waiter: asyncio.Future):
+        try:
+            admission_class.waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self, admission_class: AdmissionClass):
+        """Libera el cupo y despierta a los siguientes en orden de prioridad"""
+        admission_class.in_flight -= 1
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        for admission_class in self._by_priority:
+            while admission_class.waiters and self._has_capacity(admission_class):
+                waiter = admission_class.waiters.popleft()
+                if waiter.done():
+                    continue
+                self._start(admission_class)
+                waiter.set_result(None)
+            if self.in_flight >= self.max_in_flight:
+                return
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna el estado y los contadores de admisión"""
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "queue_depth": sum(len(item.waiters) for item in self.classes.values()),
+            "shed": sum(item.shed_queue_full + item.shed_timeout for item in self.classes.values()),
+            "classes": {name: item.get_stats() for name, item in self.classes.items()}
+        }
+
+
+# Instancia global del control de admisión
+admission_controller = AdmissionController(
+    ADMISSION_CLASSES,
+    ADMISSION_ROUTES,
+    ADMISSION_DEFAULT_CLASS,
+    max_in_flight=settings.admission_max_in_flight
+)
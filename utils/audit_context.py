@@ -0,0 +1,33 @@
+from contextvars import ContextVar, Token
+from typing import Any, Dict, List, Optional
+
+
+class AuditContext:
+    """Eventos de auditoría de dominio acumulados durante un request"""
+
+    __slots__ = ("events",)
+
+    def __init__(self):
+        self.events: List[Dict[str, Any]] = []
+
+    def add(self, record: Dict[str, Any]):
+        self.events.append(record)
+
+
+_audit_context: ContextVar[Optional[AuditContext]] = ContextVar("audit_context", default=None)
+
+
+def begin_audit_context() -> tuple[AuditContext, Token]:
+    """Abre un contexto de auditoría para el request actual"""
+    context = AuditContext()
+    return context, _audit_context.set(context)
+
+
+def end_audit_context(token: Token):
+    """Cierra el contexto de auditoría del request"""
+    _audit_context.reset(token)
+
+
+def get_audit_context() -> Optional[AuditContext]:
+    """Retorna el contexto del request en curso, o None fuera de un request auditado"""
+    return _audit_context.get()
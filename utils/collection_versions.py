@@ -0,0 +1,23 @@
+from typing import Dict
+
+
+class CollectionVersions:
+    """Contador de versión por colección, incrementado en cada escritura del proceso
+
+    Las cachés derivadas de una colección incluyen la versión en su clave: al
+    escribir, las entradas anteriores dejan de coincidir sin tener que buscarlas.
+    """
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+
+    def bump(self, collection: str):
+        """Marca la colección como modificada"""
+        self._versions[collection] = self._versions.get(collection, 0) + 1
+
+    def get(self, collection: str) -> int:
+        return self._versions.get(collection, 0)
+
+
+# Instancia global de versiones de colecciones
+collection_versions = CollectionVersions()
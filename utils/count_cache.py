@@ -0,0 +1,83 @@
+import json
+from typing import Any, Dict, Tuple
+from motor.motor_asyncio import AsyncIOMotorCollection
+from config.settings import settings
+from utils.cache import TTLCache
+from utils.collection_versions import collection_versions
+
+
+def normalize_filter(query: Dict[str, Any]) -> str:
+    """Clave canónica de un filtro (independiente del orden de los campos)"""
+    return json.dumps(query, sort_keys=True, default=str, separators=(",", ":"))
+
+
+class CountCache:
+    """Caché de totales de listados por colección y filtro normalizado
+
+    La clave incluye la versión de la colección (utils.collection_versions), así
+    que cualquier escritura del proceso invalida sus totales; el TTL acota lo
+    desactualizado que puede quedar un total frente a escrituras de otros procesos.
+
+    En modo estimado no se recorre el filtro completo: sin filtro se usa
+    estimated_document_count (metadatos de la colección) y con filtro se cuenta
+    sobre una muestra aleatoria de `sample_size` documentos y se escala.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 30.0, sample_size: int = 1000):
+        self.sample_size = sample_size
+        self._cache = TTLCache(max_size=max_size, ttl_seconds=ttl_seconds)
+
+    async def count(
+        self,
+        collection: AsyncIOMotorCollection,
+        query: Dict[str, Any],
+        estimated: bool = False
+    ) -> Tuple[int, bool]:
+        """Retorna (total, es_estimado)"""
+        key = (
+            collection.name,
+            collection_versions.get(collection.name),
+            estimated,
+            normalize_filter(query)
+        )
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        if not estimated:
+            result = (await collection.count_documents(query), False)
+        elif not query:
+            result = (await collection.estimated_document_count(), True)
+        else:
+            result = await self._sampled_count(collection, query)
+
+        self._cache.set(key, result)
+        return result
+
+    async def _sampled_count(self, collection: AsyncIOMotorCollection, query: Dict[str, Any]) -> Tuple[int, bool]:
+        """Estima cuántos documentos cumplen el filtro a partir de una muestra"""
+        collection_size = await collection.estimated_document_count()
+        if collection_size <= self.sample_size:
+            # Colección chica: el conteo exacto cuesta lo mismo que la muestra
+            return await collection.count_documents(query), False
+
+        pipeline = [
+            {"$sample": {"size": self.sample_size}},
+            {"$match": query},
+            {"$count": "matches"}
+        ]
+        result = await collection.aggregate(pipeline).to_list(length=1)
+        matches = result[0]["matches"] if result else 0
+        return round(matches / self.sample_size * collection_size), True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna contadores de uso de la caché"""
+        return self._cache.get_stats()
+
+
+# Instancia global de la caché de totales
+count_cache = CountCache(
+    max_size=settings.count_cache_max_size,
+    ttl_seconds=settings.count_cache_ttl_seconds,
+    sample_size=settings.count_sample_size
+)
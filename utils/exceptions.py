@@ -35,4 +35,10 @@ class DatabaseException(CustomException):
 
 class PasswordPolicyException(CustomException):
     def __init__(self, message: str = "Password does not meet policy requirements"):
-        super().__init__(message, status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        super().__init__(message, status.HTTP_400_BAD_REQUEST)
+
+
+class ServiceUnavailableException(CustomException):
+    def __init__(self, message: str = "Service temporarily unavailable", retry_after: int = 1):
+        self.retry_after = retry_after
+        super().__init__(message, status.HTTP_503_SERVICE_UNAVAILABLE)
\ No newline at end of file
@@ -0,0 +1,48 @@
+import hashlib
+from datetime import datetime
+from typing import Dict
+from fastapi import Request, Response
+from config.settings import settings
+
+
+def content_etag(body: bytes) -> str:
+    """ETag fuerte a partir del contenido (igual en todos los procesos)"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def document_etag(document_id: str, updated_at: datetime) -> str:
+    """ETag fuerte de un documento: toda escritura actualiza updated_at"""
+    return f'"{document_id}-{updated_at.strftime("%Y%m%d%H%M%S%f")}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True si If-None-Match incluye el ETag (comparación débil, como indica RFC 9110)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def cache_headers(etag: str, changed_at: datetime) -> Dict[str, str]:
+    """ETag y Cache-Control; max-age crece con el tiempo sin cambios (10%) hasta el tope configurado"""
+    max_age = min(
+        settings.http_cache_max_age_seconds,
+        int((datetime.utcnow() - changed_at).total_seconds() / 10)
+    )
+    if max_age <= 0:
+        cache_control = "private, no-cache"
+    else:
+        cache_control = f"private, max-age={max_age}, must-revalidate"
+    return {"ETag": etag, "Cache-Control": cache_control}
+
+
+def not_modified(etag: str, changed_at: datetime) -> Response:
+    """304 sin cuerpo"""
+    return Response(status_code=304, headers=cache_headers(etag, changed_at))
+
+
+def cached_json(content: bytes, etag: str, changed_at: datetime) -> Response:
+    """JSON ya serializado con sus cabeceras de caché"""
+    return Response(content=content, media_type="application/json", headers=cache_headers(etag, changed_at))
@@ -0,0 +1,50 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from bson import ObjectId
+from utils.exceptions import ValidationException
+
+
+def encode_cursor(sort_value: datetime, document_id: Any) -> str:
+    """Codifica la posición (valor de orden, _id) como token opaco"""
+    payload = json.dumps([sort_value.isoformat(), str(document_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """Decodifica un token de paginación"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, document_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(sort_value), ObjectId(document_id)
+    except Exception:
+        raise ValidationException("Cursor de paginación inválido")
+
+
+def apply_keyset(query: Dict[str, Any], field: str, cursor: Optional[str]) -> Dict[str, Any]:
+    """Agrega a la consulta la condición para continuar después del cursor (orden descendente)"""
+    if not cursor:
+        return query
+
+    sort_value, document_id = decode_cursor(cursor)
+    condition = {
+        "$or": [
+            {field: {"$lt": sort_value}},
+            {field: sort_value, "_id": {"$lt": document_id}}
+        ]
+    }
+    return {"$and": [query, condition]} if query else condition
+
+
+def keyset_sort(field: str) -> List[Tuple[str, int]]:
+    """Orden estable descendente por campo y _id"""
+    return [(field, -1), ("_id", -1)]
+
+
+def next_cursor(documents: List[Dict[str, Any]], field: str, size: int) -> Optional[str]:
+    """Cursor de la siguiente página, o None si no hay más resultados"""
+    if len(documents) < size or not documents:
+        return None
+    last = documents[-1]
+    return encode_cursor(last[field], last["_id"])
@@ -0,0 +1,111 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from config.settings import settings
+from config.rate_limit_policies import RATE_LIMIT_POLICIES
+from utils.routing import PathPrefixTrie
+
+
+# (clave del bucket, costo, capacidad, ventana en segundos)
+RateLimitCheck = Tuple[str, float, int, float]
+
+_ROUTE_FIELDS = {"prefix", "cost", "limit", "window", "exempt"}
+_PRINCIPAL_FIELDS = {"role", "user_id", "limit", "window"}
+
+
+class RateLimitPolicyTable:
+    """Tabla de políticas compilada para resolver los límites de un request
+
+    Las políticas de ruta se compilan en un PathPrefixTrie, así que resolver un
+    request cuesta O(segmentos) sin importar cuántas políticas haya. Los
+    presupuestos por usuario y por rol son búsquedas en diccionario.
+    """
+
+    def __init__(self, policies: Iterable[dict], default_limit: int, default_window: float):
+        self.default_limit = default_limit
+        self.default_window = default_window
+        self._routes = PathPrefixTrie()
+        self._by_user: Dict[str, Tuple[int, float]] = {}
+        self._by_role: Dict[str, Tuple[int, float]] = {}
+
+        for policy in policies:
+            self._compile(policy)
+
+    def _compile(self, policy: dict):
+        """Valida una política y la agrega a la estructura de búsqueda"""
+        if "prefix" in policy:
+            self._check_fields(policy, _ROUTE_FIELDS)
+            compiled = {
+                "prefix": policy["prefix"].rstrip("/") or "/",
+                "cost": float(policy.get("cost", 1)),
+                "limit": policy.get("limit"),
+                "window": float(policy.get("window", self.default_window)),
+                "exempt": bool(policy.get("exempt", False))
+            }
+            if compiled["cost"] <= 0:
+                raise ValueError(f"Costo inválido en política de rate limit: {policy}")
+
+            self._routes.insert(compiled["prefix"], compiled)
+        elif "user_id" in policy or "role" in policy:
+            self._check_fields(policy, _PRINCIPAL_FIELDS)
+            if "limit" not in policy:
+                raise ValueError(f"Política de rate limit sin 'limit': {policy}")
+            budget = (int(policy["limit"]), float(policy.get("window", self.default_window)))
+            if "user_id" in policy:
+                self._by_user[str(policy["user_id"])] = budget
+            else:
+                self._by_role[str(policy["role"])] = budget
+        else:
+            raise ValueError(f"Política de rate limit sin 'prefix', 'role' ni 'user_id': {policy}")
+
+    @staticmethod
+    def _check_fields(policy: dict, allowed: set):
+        unknown = set(policy) - allowed
+        if unknown:
+            raise ValueError(f"Campos desconocidos en política de rate limit: {sorted(unknown)}")
+
+    def match_route(self, path: str) -> Optional[dict]:
+        """Retorna la política de ruta más específica para el path"""
+        return self._routes.match(path)
+
+    def principal_budget(self, user_info: Optional[dict]) -> Tuple[str, int, float]:
+        """Retorna (alcance, límite, ventana) del presupuesto del principal"""
+        if user_info:
+            user_id = user_info.get("user_id")
+            if user_id is not None and str(user_id) in self._by_user:
+                return "user", *self._by_user[str(user_id)]
+            role = user_info.get("role")
+            if role in self._by_role:
+                return f"role:{role}", *self._by_role[role]
+        return "default", self.default_limit, self.default_window
+
+    def resolve(self, path: str, user_info: Optional[dict], client_host: str) -> List[RateLimitCheck]:
+        """Retorna los buckets que debe consumir el request (vacío si está exento)"""
+        return self.checks_for(self.match_route(path), user_info, client_host)
+
+    def checks_for(self, route: Optional[dict], user_info: Optional[dict], client_host: str) -> List[RateLimitCheck]:
+        """Como resolve, para una política de ruta ya resuelta con match_route"""
+        if route is not None and route["exempt"]:
+            return []
+
+        # Usuario del token si está autenticado; si no, la IP del cliente
+        if user_info and user_info.get("user_id"):
+            principal = f"user:{user_info['user_id']}"
+        else:
+            principal = f"ip:{client_host}"
+
+        scope, limit, window = self.principal_budget(user_info)
+        cost = route["cost"] if route is not None else 1
+        checks = []
+
+        # El bucket propio de la ruta va primero: es el más chico y el que suele rechazar
+        if route is not None and route["limit"] is not None:
+            checks.append((f"route:{route['prefix']}|{principal}", 1, int(route["limit"]), route["window"]))
+        checks.append((f"{scope}|{principal}", cost, limit, window))
+        return checks
+
+
+# Instancia global compilada al importar
+rate_limit_policies = RateLimitPolicyTable(
+    RATE_LIMIT_POLICIES,
+    default_limit=settings.rate_limit_max_requests,
+    default_window=settings.rate_limit_time_window
+)
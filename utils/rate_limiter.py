@@ -0,0 +1,441 @@
+import hashlib
+import os
+import struct
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, Hashable, Optional, Tuple
+from config.settings import settings
+from utils.cache import TTLCache
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+
+class TokenBucketLimiter:
+    """Rate limiter de token bucket con costo O(1) por request y memoria acotada
+
+    Cada clave tiene un bucket de `capacity` tokens que se recarga a razón de
+    `capacity / period` tokens por segundo. Los buckets se guardan en orden de
+    último uso: al superar `max_keys` se desaloja el menos reciente, y los
+    buckets que ya se recargaron por completo se expiran de a pocos en cada
+    llamada (un bucket lleno equivale a uno nuevo, así que no se pierde estado).
+    Cada llamada puede indicar su propio presupuesto (capacity/period).
+    """
+
+    def __init__(
+        self,
+        capacity: int = 100,
+        period: float = 60.0,
+        max_keys: int = 100_000,
+        expire_batch: int = 32
+    ):
+        self.capacity = capacity
+        self.period = period
+        self.rate = capacity / period
+        self.max_keys = max_keys
+        self.expire_batch = expire_batch
+
+        # clave -> [tokens, último instante de recarga, periodo del bucket]
+        self._buckets: "OrderedDict[Hashable, list]" = OrderedDict()
+
+        # Métricas
+        self.allowed = 0
+        self.limited = 0
+        self.evictions = 0
+        self.expired = 0
+
+    def _expire_idle(self, now: float):
+        """Quita del frente hasta expire_batch buckets que ya están llenos"""
+        buckets = self._buckets
+        for _ in range(self.expire_batch):
+            if not buckets:
+                return
+            key, bucket = next(iter(buckets.items()))
+            if bucket[1] + bucket[2] > now:
+                # El menos reciente aún no se recarga por completo
+                return
+            del buckets[key]
+            self.expired += 1
+
+    async def acquire(
+        self,
+        key: Hashable,
+        cost: float = 1,
+        capacity: Optional[int] = None,
+        period: Optional[float] = None
+    ) -> Tuple[bool, float]:
+        """Interfaz común de los backends"""
+        return self.try_acquire(key, cost, capacity=capacity, period=period)
+
+    async def ensure_indexes(self):
+        """Sin índices en memoria"""
+
+    def close(self):
+        """Sin recursos que liberar en memoria"""
+
+    def try_acquire(
+        self,
+        key: Hashable,
+        cost: float = 1,
+        now: Optional[float] = None,
+        capacity: Optional[int] = None,
+        period: Optional[float] = None
+    ) -> Tuple[bool, float]:
+        """Consume `cost` tokens de la clave
+
+        Retorna (permitido, segundos hasta que haya tokens suficientes).
+        """
+        if now is None:
+            now = time.monotonic()
+        capacity = capacity or self.capacity
+        period = period or self.period
+        rate = capacity / period
+        self._expire_idle(now)
+
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [float(capacity), now, period]
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+        else:
+            bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            bucket[2] = period
+            self._buckets.move_to_end(key)
+
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            self.allowed += 1
+            return True, 0.0
+
+        self.limited += 1
+        return False, (cost - bucket[0]) / rate
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna contadores del limitador"""
+        return {
+            "backend": "memory",
+            "algorithm": "token_bucket",
+            "capacity": self.capacity,
+            "period_seconds": self.period,
+            "tracked_keys": len(self._buckets),
+            "max_keys": self.max_keys,
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "evictions": self.evictions,
+            "expired": self.expired
+        }
+
+
+class LeasedWindowLimiter(ABC):
+    """Ventana fija compartida entre workers con arriendo local de tokens
+
+    Cada worker toma del almacén compartido lotes de `lease_size` tokens de la
+    ventana actual y los consume localmente, de modo que solo una de cada
+    `lease_size` requests toca el almacén. Un arriendo dura `lease_seconds`:
+    al vencer, la siguiente request de la clave devuelve al almacén los tokens
+    no usados y arrienda de nuevo en la misma operación, así el almacén solo
+    cuenta lo consumido más lo arrendado vigente. Si la clave deja de recibir
+    tráfico, su saldo (menos de `lease_size` por worker) queda tomado hasta
+    que termina la ventana. Un rechazo del almacén (ventana agotada) se
+    recuerda localmente hasta que vence el arriendo.
+    """
+
+    backend = "shared"
+
+    def __init__(
+        self,
+        capacity: int = 100,
+        period: float = 60.0,
+        lease_size: int = 10,
+        lease_seconds: float = 1.0,
+        max_keys: int = 100_000
+    ):
+        self.capacity = capacity
+        self.period = period
+        self.lease_size = max(1, min(lease_size, capacity))
+        self.lease_seconds = lease_seconds
+
+        # clave -> [tokens arrendados disponibles, fin de la ventana, ventana agotada, vencimiento del arriendo]
+        self._leases = TTLCache(max_size=max_keys, ttl_seconds=period)
+
+        # Métricas
+        self.allowed = 0
+        self.limited = 0
+        self.store_calls = 0
+        self.store_errors = 0
+
+    @abstractmethod
+    async def _lease(self, key: str, window_end: int, amount: int, capacity: int, returned: int = 0) -> int:
+        """Devuelve `returned` tokens y toma hasta `amount` de la ventana que termina en `window_end` (epoch)
+
+        Retorna los tokens entregados; el almacén debe quedar con
+        entregados anteriores - returned + entregados ahora.
+        """
+
+    async def acquire(
+        self,
+        key: Hashable,
+        cost: float = 1,
+        capacity: Optional[int] = None,
+        period: Optional[float] = None
+    ) -> Tuple[bool, float]:
+        """Consume `cost` tokens de la clave
+
+        Retorna (permitido, segundos hasta la próxima ventana si se rechazó).
+        """
+        capacity = capacity or self.capacity
+        period = period or self.period
+        now = time.time()
+        window_end = int((now // period + 1) * period)
+        window_remaining = window_end - now
+
+        lease = self._leases.get(key)
+        if lease is None or lease[1] != window_end:
+            lease = [0, window_end, False, 0.0]
+            # Registrarlo antes de esperar al almacén: las requests concurrentes comparten el arriendo
+            self._leases.set(key, lease, ttl_seconds=window_remaining)
+
+        if lease[3] <= now or (lease[0] < cost and not lease[2]):
+            self.store_calls += 1
+            amount = max(min(self.lease_size, capacity), int(cost))
+            # El saldo sale del arriendo antes del await para no devolverlo dos veces
+            returned = int(lease[0]) if lease[3] <= now else 0
+            lease[0] -= returned
+            try:
+                lease[0] += await self._lease(str(key), window_end, amount, capacity, returned)
+            except Exception as e:
+                # Si el almacén falla no se bloquea el tráfico
+                lease[0] += returned
+                self.store_errors += 1
+                print(f"Error en el backend de rate limiting: {e}")
+                self.allowed += 1
+                return True, 0.0
+            lease[2] = lease[0] < cost
+            lease[3] = now + self.lease_seconds
+
+        if lease[0] >= cost:
+            lease[0] -= cost
+            self.allowed += 1
+            return True, 0.0
+
+        self.limited += 1
+        return False, window_remaining
+
+    @staticmethod
+    def _granted(capacity: int, previous: int, amount: int) -> int:
+        """Tokens que quedan para entregar de la ventana"""
+        return max(0, min(amount, capacity - previous))
+
+    async def ensure_indexes(self):
+        """Crea los índices que necesite el almacén"""
+
+    def close(self):
+        """Libera los recursos del almacén"""
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna contadores del limitador"""
+        return {
+            "backend": self.backend,
+            "algorithm": "fixed_window_leased",
+            "capacity": self.capacity,
+            "period_seconds": self.period,
+            "lease_size": self.lease_size,
+            "lease_seconds": self.lease_seconds,
+            "leased_keys": len(self._leases),
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "store_calls": self.store_calls,
+            "store_errors": self.store_errors
+        }
+
+
+class SharedMemoryRateLimiter(LeasedWindowLimiter):
+    """Tabla de contadores en memoria compartida para varios workers de un mismo host
+
+    Tabla hash de direccionamiento abierto con slots (hash de clave, fin de la
+    ventana, tokens entregados). Las actualizaciones se serializan con flock sobre un
+    archivo de bloqueo; la sección crítica son unas pocas lecturas y escrituras.
+    """
+
+    backend = "shared_memory"
+    SLOT = struct.Struct("<QqQ")
+    PROBES = 8
+
+    def __init__(self, name: str = "supermarket_rate_limit", slots: int = 65536, **kwargs):
+        super().__init__(**kwargs)
+        self.name = name
+        self.slots = slots
+        self._memory: Optional[shared_memory.SharedMemory] = None
+        self._lock_file = None
+        self.overwrites = 0
+
+    def _open(self):
+        """Crea o se adjunta al segmento compartido en el primer uso"""
+        if self._memory is not None:
+            return
+        self._lock_file = open(os.path.join(tempfile.gettempdir(), f"{self.name}.lock"), "a")
+        with self._locked():
+            try:
+                self._memory = shared_memory.SharedMemory(
+                    name=self.name, create=True, size=self.slots * self.SLOT.size
+                )
+                self._memory.buf[:] = bytes(len(self._memory.buf))
+            except FileExistsError:
+                self._memory = shared_memory.SharedMemory(name=self.name)
+        # El segmento debe sobrevivir al worker que lo creó
+        try:
+            resource_tracker.unregister(self._memory._name, "shared_memory")
+        except Exception:
+            pass
+
+    @contextmanager
+    def _locked(self):
+        """Bloqueo exclusivo entre procesos sobre el archivo de bloqueo"""
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        value = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+        return value or 1  # 0 marca un slot vacío
+
+    async def _lease(self, key: str, window_end: int, amount: int, capacity: int, returned: int = 0) -> int:
+        self._open()
+        key_hash = self._hash(key)
+        start = key_hash % self.slots
+        now = time.time()
+        buffer = self._memory.buf
+
+        with self._locked():
+            candidate = None
+            for probe in range(self.PROBES):
+                offset = ((start + probe) % self.slots) * self.SLOT.size
+                slot_hash, slot_window_end, slot_count = self.SLOT.unpack_from(buffer, offset)
+                if slot_hash == key_hash:
+                    previous = max(0, slot_count - returned) if slot_window_end == window_end else 0
+                    granted = self._granted(capacity, previous, amount)
+                    self.SLOT.pack_into(buffer, offset, key_hash, window_end, previous + granted)
+                    return granted
+                if candidate is None and (slot_hash == 0 or slot_window_end <= now):
+                    candidate = offset
+
+            if candidate is None:
+                # Tabla llena en la ventana actual: se reutiliza el slot inicial
+                candidate = start * self.SLOT.size
+                self.overwrites += 1
+
+            granted = self._granted(capacity, 0, amount)
+            self.SLOT.pack_into(buffer, candidate, key_hash, window_end, granted)
+            return granted
+
+    def close(self):
+        if self._memory is not None:
+            self._memory.close()
+            self._memory = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        stats.update({"name": self.name, "slots": self.slots, "overwrites": self.overwrites})
+        return stats
+
+
+class MongoRateLimiter(LeasedWindowLimiter):
+    """Contadores por ventana en MongoDB para varios hosts
+
+    Cada arriendo es un único find_one_and_update con un pipeline que descuenta
+    lo devuelto, entrega lo que queda de la ventana y guarda solo lo entregado
+    (`count` nunca supera la capacidad). Los documentos expiran por el índice
+    TTL sobre `expires_at` al terminar su ventana.
+    """
+
+    backend = "mongo"
+
+    def __init__(self, collection: str = "rate_limits", **kwargs):
+        super().__init__(**kwargs)
+        self.collection = collection
+
+    async def get_database(self):
+        """Obtiene la base de datos - importación diferida para evitar circular imports"""
+        from config.database import get_database
+        return await get_database()
+
+    async def _lease(self, key: str, window_end: int, amount: int, capacity: int, returned: int = 0) -> int:
+        from pymongo import ReturnDocument
+
+        db = await self.get_database()
+        document = await db[self.collection].find_one_and_update(
+            {"_id": f"{key}:{window_end}"},
+            [
+                {"$set": {
+                    "previous": {"$max": [0, {"$subtract": [{"$ifNull": ["$count", 0]}, returned]}]},
+                    "expires_at": {"$ifNull": ["$expires_at", datetime.utcfromtimestamp(window_end)]}
+                }},
+                {"$set": {"granted": {"$max": [0, {"$min": [amount, {"$subtract": [capacity, "$previous"]}]}]}}},
+                {"$set": {"count": {"$add": ["$previous", "$granted"]}}},
+                {"$unset": "previous"}
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return document["granted"]
+
+    async def ensure_indexes(self):
+        db = await self.get_database()
+        if db is not None:
+            await db[self.collection].create_index("expires_at", expireAfterSeconds=0)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        stats["collection"] = self.collection
+        return stats
+
+
+def create_rate_limiter():
+    """Crea el backend de rate limiting configurado en settings"""
+    backend = settings.rate_limit_backend
+    common = {
+        "capacity": settings.rate_limit_max_requests,
+        "period": settings.rate_limit_time_window,
+        "max_keys": settings.rate_limit_max_keys
+    }
+    leased = {
+        **common,
+        "lease_size": settings.rate_limit_lease_size,
+        "lease_seconds": settings.rate_limit_lease_seconds
+    }
+
+    if backend == "shared_memory":
+        return SharedMemoryRateLimiter(
+            name=settings.rate_limit_shared_name,
+            slots=settings.rate_limit_shared_slots,
+            **leased
+        )
+    if backend == "mongo":
+        return MongoRateLimiter(**leased)
+    return TokenBucketLimiter(**common)
+
+
+# Instancia global del rate limiter de la aplicación
+rate_limiter = create_rate_limiter()
@@ -0,0 +1,72 @@
+from typing import Any, Callable, Coroutine, Dict, List, Optional
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+
+# Clave en request.state donde SecurityMiddleware deja el body JSON ya parseado
+SANITIZED_BODY_STATE_KEY = "sanitized_json_body"
+
+
+class SanitizedJSONRoute(APIRoute):
+    """Ruta que reutiliza el JSON parseado y sanitizado por SecurityMiddleware
+
+    Evita que FastAPI vuelva a leer y decodificar el body del request.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        original_route_handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            parsed = getattr(request.state, SANITIZED_BODY_STATE_KEY, None)
+            if parsed is not None:
+                raw_body, data = parsed
+                # FastAPI usa request.body() para saber si hay body y request.json() para decodificarlo
+                request._body = raw_body
+                request._json = data
+            return await original_route_handler(request)
+
+        return route_handler
+
+
+class _PathNode:
+    """Nodo del trie de segmentos de path"""
+
+    __slots__ = ("children", "value")
+
+    def __init__(self):
+        self.children: Dict[str, "_PathNode"] = {}
+        self.value: Any = None
+
+
+class PathPrefixTrie:
+    """Trie de prefijos de path por segmentos con comodín "*"
+
+    match() cuesta O(segmentos) sin importar cuántos prefijos haya: en cada
+    nivel se prefiere el segmento exacto sobre "*" (sin backtracking) y se
+    retorna el valor del prefijo más profundo encontrado.
+    """
+
+    def __init__(self):
+        self._root = _PathNode()
+
+    @staticmethod
+    def segments(path: str) -> List[str]:
+        return [segment for segment in path.split("/") if segment]
+
+    def insert(self, prefix: str, value: Any):
+        node = self._root
+        for segment in self.segments(prefix):
+            node = node.children.setdefault(segment, _PathNode())
+        node.value = value
+
+    def match(self, path: str) -> Optional[Any]:
+        node = self._root
+        matched = node.value
+        for segment in self.segments(path):
+            child = node.children.get(segment) or node.children.get("*")
+            if child is None:
+                break
+            node = child
+            if node.value is not None:
+                matched = node.value
+        return matched
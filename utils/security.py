@@ -1,12 +1,17 @@
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from config.settings import settings
+from utils.cache import TTLCache
 
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Tokens ya verificados; cada entrada vive hasta el exp de su token
+token_cache = TTLCache(max_size=settings.token_cache_max_size)
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -28,11 +33,20 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 
 
 def verify_token(token: str):
+    cached_payload = token_cache.get(token)
+    if cached_payload is not None:
+        return cached_payload
+    
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        return payload
     except JWTError:
         return None
+    
+    # Memorizar solo tokens con expiración, y nunca más allá de ella
+    exp = payload.get("exp")
+    if exp is not None:
+        token_cache.set(token, payload, ttl_seconds=exp - time.time())
+    return payload
 
 
 def get_client_ip(request) -> str:
@@ -0,0 +1,115 @@
+import json
+from datetime import datetime
+from typing import Any, Iterable, Optional
+from bson import ObjectId
+
+
+def json_value(value: Any) -> Any:
+    """Convierte un valor de MongoDB al mismo JSON que produce pydantic (datetime, ObjectId, Enum)"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    return getattr(value, "value", value)
+
+
+# Mismo formato que JSONResponse de Starlette; json.dumps con argumentos crea un encoder por llamada
+_encoder = json.JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+
+def dumps(data: Any) -> bytes:
+    return _encoder.encode(data).encode("utf-8")
+
+
+def product_dict(product_doc: dict) -> dict:
+    """Documento de producto con la forma de ProductResponse, sin construir modelos"""
+    return {
+        "id": str(product_doc.get("_id") or product_doc.get("id")),
+        "name": product_doc["name"],
+        "description": product_doc.get("description"),
+        "price": float(product_doc["price"]),
+        "category": json_value(product_doc.get("category", "other")),
+        "brand": product_doc.get("brand"),
+        "barcode": product_doc.get("barcode"),
+        "stock": int(product_doc.get("stock", 0)),
+        "min_stock": int(product_doc.get("min_stock", 0)),
+        "status": json_value(product_doc.get("status", "active")),
+        "created_at": json_value(product_doc["created_at"]),
+        "updated_at": json_value(product_doc["updated_at"])
+    }
+
+
+def serialize_product(product_doc: dict) -> bytes:
+    """JSON de un producto idéntico al de ProductResponse"""
+    return dumps(product_dict(product_doc))
+
+
+def account_dict(account_doc: dict) -> dict:
+    """Documento de cuenta con la forma de AccountResponse, sin construir modelos"""
+    return {
+        "id": str(account_doc.get("_id") or account_doc.get("id")),
+        "account_number": account_doc["account_number"],
+        "client_id": account_doc["client_id"],
+        "client_name": account_doc["client_name"],
+        "client_email": account_doc["client_email"],
+        "items": [
+            {
+                "product_id": item["product_id"],
+                "product_name": item["product_name"],
+                "quantity": int(item["quantity"]),
+                "unit_price": float(item["unit_price"]),
+                "total_price": float(item["total_price"])
+            }
+            for item in account_doc.get("items", [])
+        ],
+        "subtotal": float(account_doc.get("subtotal", 0.0)),
+        "tax": float(account_doc.get("tax", 0.0)),
+        "discount": float(account_doc.get("discount", 0.0)),
+        "total_amount": float(account_doc.get("total_amount", 0.0)),
+        "status": json_value(account_doc.get("status", "pending")),
+        "due_date": json_value(account_doc["due_date"]),
+        "created_at": json_value(account_doc["created_at"]),
+        "updated_at": json_value(account_doc["updated_at"]),
+        "payments": [
+            {
+                "payment_date": json_value(payment["payment_date"]),
+                "amount": float(payment["amount"]),
+                "payment_method": json_value(payment["payment_method"]),
+                "reference": payment.get("reference"),
+                "processed_by": payment["processed_by"]
+            }
+            for payment in account_doc.get("payments", [])
+        ],
+        "notes": account_doc.get("notes")
+    }
+
+
+def serialize_account(account_doc: dict) -> bytes:
+    """JSON de una cuenta idéntico al de AccountResponse"""
+    return dumps(account_dict(account_doc))
+
+
+def json_array(fragments: Iterable[bytes]) -> bytes:
+    """Une objetos ya serializados en una lista JSON"""
+    return b"[" + b",".join(fragments) + b"]"
+
+
+def page_json(
+    items_key: str,
+    fragments: Iterable[bytes],
+    total: int,
+    total_estimated: bool,
+    page: int,
+    size: int,
+    next_cursor: Optional[str]
+) -> bytes:
+    """Respuesta paginada (forma de ProductListResponse / AccountListResponse) con los ítems ya serializados"""
+    return (
+        b'{"' + items_key.encode("utf-8") + b'":' + json_array(fragments)
+        + b',"total":' + dumps(total)
+        + b',"total_estimated":' + dumps(total_estimated)
+        + b',"page":' + dumps(page)
+        + b',"size":' + dumps(size)
+        + b',"next_cursor":' + dumps(next_cursor)
+        + b"}"
+    )
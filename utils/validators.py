@@ -51,17 +51,30 @@ def validate_phone(phone: str) -> bool:
     return True
 
 
+# Caracteres potencialmente peligrosos, eliminados en una sola pasada con str.translate
+DANGEROUS_CHARS_TABLE = str.maketrans("", "", "<>\"'&$`|;")
+
+# Contenido bloqueado (scripts y manejadores de eventos), comparado en minúsculas
+BLOCKED_PATTERNS = (
+    "script>", "<script", "javascript:", "vbscript:",
+    "onload=", "onerror=", "onclick=", "eval(",
+    "document.cookie", "document.write"
+)
+_BLOCKED_RE = re.compile("|".join(re.escape(pattern) for pattern in BLOCKED_PATTERNS))
+
+
+def contains_blocked_pattern(value: str) -> bool:
+    """True si el texto contiene alguno de los patrones bloqueados (sin distinguir mayúsculas)"""
+    return bool(_BLOCKED_RE.search(value.lower()))
+
+
 def sanitize_string(value: str) -> str:
     """Sanitiza strings para prevenir inyecciones"""
     if not isinstance(value, str):
         return value
     
     # Remover caracteres potencialmente peligrosos
-    dangerous_chars = ['<', '>', '"', "'", '&', '$', '`', '|', ';']
-    for char in dangerous_chars:
-        value = value.replace(char, '')
-    
-    return value.strip()
+    return value.translate(DANGEROUS_CHARS_TABLE).strip()
 
 
 def validate_positive_number(value: float, field_name: str = "value") -> bool: